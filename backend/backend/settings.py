@@ -29,6 +29,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'exams.middleware.AdmissionControlMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -83,13 +84,85 @@ elif DB_ENGINE == 'mysql':
         }
     }
 else:
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)))
+    sqlite_options = {
+        'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+    }
+    if os.getenv('SQLITE_TUNING', '1') == '1':
+        # WAL позволяет читать параллельно с записью, а IMMEDIATE берет блокировку
+        # на запись в начале транзакции, а не на первом UPDATE/INSERT.
+        sqlite_options.update(
+            {
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};'
+                    f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+                'transaction_mode': 'IMMEDIATE',
+            }
+        )
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': sqlite_options,
+            # Тестовая БД — файл, а не память: блокировки между процессами как в проде.
+            'TEST': {'NAME': os.getenv('SQLITE_TEST_PATH', str(BASE_DIR / 'test_db.sqlite3'))},
         }
     }
 
+SQLITE_WRITE_RETRIES = int(os.getenv('SQLITE_WRITE_RETRIES', '5'))
+SQLITE_WRITE_RETRY_DELAY_MS = int(os.getenv('SQLITE_WRITE_RETRY_DELAY_MS', '50'))
+
+# Как часто воркер сверяет версию кэша каталога экзаменов с БД.
+CATALOG_VERSION_CHECK_SEC = float(os.getenv('CATALOG_VERSION_CHECK_SEC', '2'))
+# Файл каталога, общий для всех воркеров через mmap (пусто — кэш в памяти каждого воркера).
+CATALOG_FILE = os.getenv('CATALOG_FILE', '')
+
+# rows — строка AttemptAnswer на каждый ответ; packed — ответы попытки в одной колонке Attempt.
+ATTEMPT_ANSWER_STORAGE = os.getenv('ATTEMPT_ANSWER_STORAGE', 'rows').lower()
+
+# Сколько секунд ответ на отправку с submission_key хранится в кэше для повторов.
+SUBMISSION_CACHE_TTL_SEC = int(os.getenv('SUBMISSION_CACHE_TTL_SEC', '900'))
+# Пакетная загрузка попыток /api/attempts/batch/: предел попыток в одном запросе.
+BATCH_SUBMIT_MAX_ITEMS = int(os.getenv('BATCH_SUBMIT_MAX_ITEMS', '20000'))
+# Адаптивный режим: сколько секунд действителен токен сессии (состояние попытки хранится в нем).
+ADAPTIVE_SESSION_MAX_AGE_SEC = int(os.getenv('ADAPTIVE_SESSION_MAX_AGE_SEC', '10800'))
+# Спринт: сколько секунд после старта засчитываются ответы.
+SPRINT_DURATION_SEC = int(os.getenv('SPRINT_DURATION_SEC', '60'))
+
+# Рейтинг: memory (в каждом воркере, догоняет новые попытки по id) или redis (общий sorted set).
+LEADERBOARD_BACKEND = os.getenv('LEADERBOARD_BACKEND', 'memory').lower()
+LEADERBOARD_REDIS_URL = os.getenv('LEADERBOARD_REDIS_URL', '')
+LEADERBOARD_REDIS_PREFIX = os.getenv('LEADERBOARD_REDIS_PREFIX', 'pet-exam:leaderboard')
+LEADERBOARD_SYNC_SEC = float(os.getenv('LEADERBOARD_SYNC_SEC', '1'))
+LEADERBOARD_SYNC_OVERLAP = int(os.getenv('LEADERBOARD_SYNC_OVERLAP', '500'))
+
+# SSE /api/events/: один опрос БД на процесс раз в EVENTS_POLL_SEC, события раздаются всем подписчикам.
+EVENTS_POLL_SEC = float(os.getenv('EVENTS_POLL_SEC', '1'))
+EVENTS_KEEPALIVE_SEC = float(os.getenv('EVENTS_KEEPALIVE_SEC', '15'))
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', '256'))
+EVENTS_RETRY_MS = int(os.getenv('EVENTS_RETRY_MS', '3000'))
+
+# Token bucket на IP клиента и на пользователя (учетная запись или user_name): RATE_LIMIT_RATE токенов в секунду, запас RATE_LIMIT_BURST.
+# Стоимость запроса — throttle_cost у view. memory — лимиты в каждом воркере, redis — общие.
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory').lower()
+RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', LEADERBOARD_REDIS_URL)
+RATE_LIMIT_REDIS_PREFIX = os.getenv('RATE_LIMIT_REDIS_PREFIX', 'pet-exam:ratelimit')
+RATE_LIMIT_RATE = float(os.getenv('RATE_LIMIT_RATE', '10'))
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', '120'))
+
+# Admission control: суммарная стоимость одновременных API-запросов в процессе (0 — выключено).
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '32'))
+ADMISSION_RETRY_AFTER_SEC = int(os.getenv('ADMISSION_RETRY_AFTER_SEC', '1'))
+
+ATTEMPT_RETENTION_DAYS = int(os.getenv('ATTEMPT_RETENTION_DAYS', '365'))
+ATTEMPT_ARCHIVE_DIR = Path(os.getenv('ATTEMPT_ARCHIVE_DIR', str(BASE_DIR / 'archive')))
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -141,6 +214,12 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'exams.throttling.TokenBucketThrottle',
+    ],
+    # Сколько nginx стоит перед backend: IP клиента берется из X-Forwarded-For с этой глубины.
+    # Развертывание из README (host nginx + nginx контейнера frontend) — 2.
+    'NUM_PROXIES': int(os.getenv('TRUSTED_PROXY_COUNT', '0')),
 }
 
 JAZZMIN_SETTINGS = {
@@ -1,22 +1,18 @@
 #!/bin/sh
 set -e
 
-python manage.py migrate --noinput
-
+set --
 if [ "${AUTO_SEED_EXAMS:-1}" = "1" ]; then
-  if ! python manage.py seed_exams; then
-    echo "WARNING: seed_exams failed, continuing startup." >&2
-  fi
+  set -- "$@" --seed
 fi
-
 if [ "${DJANGO_COLLECTSTATIC:-1}" = "1" ]; then
-  if ! python manage.py collectstatic --noinput; then
-    if [ "${COLLECTSTATIC_STRICT:-0}" = "1" ]; then
-      echo "collectstatic failed and COLLECTSTATIC_STRICT=1, exiting." >&2
-      exit 1
-    fi
-    echo "WARNING: collectstatic failed, continuing startup." >&2
-  fi
+  set -- "$@" --collectstatic
 fi
+if [ "${COLLECTSTATIC_STRICT:-0}" = "1" ]; then
+  set -- "$@" --strict-static
+fi
+
+# migrate / seed_exams / collectstatic выполняются только при изменениях, каждый шаг логируется со временем.
+python manage.py prepare_runtime "$@"
 
-exec gunicorn backend.wsgi:application --bind 0.0.0.0:8000 --workers ${GUNICORN_WORKERS:-3} --timeout ${GUNICORN_TIMEOUT:-60}
+exec gunicorn -c gunicorn.conf.py
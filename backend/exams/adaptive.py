@@ -0,0 +1,312 @@
+import json
+import math
+import secrets
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from operator import add, mul
+from statistics import NormalDist
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .attempts import build_attempt, save_attempts
+from .catalog import catalog
+from .models import Exam, Question
+from .similarity import load_sheets
+
+# Адаптивный режим: вопросы выдаются по одному, следующий — с максимальной информацией
+# (модель 2PL) при текущей оценке уровня участника. Все, что зависит только от параметров
+# вопросов, считается один раз на версию каталога на сетке значений тета: логарифмы
+# вероятностей ответа и порядок вопросов по информации в каждой точке. На ответ остается
+# сложить строки таблицы и пройти по готовому порядку до первого невыданного вопроса.
+THETA_MIN = -4.0
+THETA_MAX = 4.0
+GRID_POINTS = 41
+GRID_STEP = (THETA_MAX - THETA_MIN) / (GRID_POINTS - 1)
+GRID = tuple(THETA_MIN + GRID_STEP * point for point in range(GRID_POINTS))
+# Априорное распределение уровня — стандартное нормальное.
+LOG_PRIOR = tuple(-theta * theta / 2 for theta in GRID)
+NORMAL = NormalDist()
+
+# Раньше этого числа ответов попытка не заканчивается, даже если ошибка оценки уже мала.
+MIN_QUESTIONS = 5
+# Некалиброванный вопрос: a = 1, b — по полю difficulty.
+DEFAULT_DISCRIMINATION = 1.0
+DEFAULT_DIFFICULTY = {'easy': -1.0, 'medium': 0.0, 'hard': 1.0}
+
+MIN_RESPONSES = 30
+DISCRIMINATION_RANGE = (0.2, 3.0)
+DIFFICULTY_RANGE = (-4.0, 4.0)
+
+SESSION_TOKEN_SALT = 'exams.adaptive'
+
+
+@dataclass(frozen=True)
+class ItemBank:
+    version: tuple
+    snapshot_id: int
+    max_questions: int
+    target_se: float
+    # Вопрос в порядке экзамена — строка таблиц log_right / log_wrong.
+    question_ids: tuple[int, ...]
+    index_by_id: dict[int, int]
+    payload_by_id: dict[int, dict]
+    correct_by_id: dict[int, int | None]
+    log_right: tuple[tuple[float, ...], ...]
+    log_wrong: tuple[tuple[float, ...], ...]
+    # Для каждой точки сетки — индексы вопросов по убыванию информации.
+    order: tuple[tuple[int, ...], ...]
+
+    @property
+    def length(self) -> int:
+        return min(self.max_questions, len(self.question_ids))
+
+    def is_correct(self, question_id: int, option_id) -> bool:
+        correct_option_id = self.correct_by_id.get(question_id)
+        return bool(correct_option_id and option_id == correct_option_id)
+
+    def estimate(self, responses) -> tuple[float, float]:
+        """responses — [question_id, option_id]; EAP-оценка уровня и ее стандартная ошибка."""
+        log_posterior = LOG_PRIOR
+        for question_id, option_id in responses:
+            table = self.log_right if self.is_correct(question_id, option_id) else self.log_wrong
+            log_posterior = list(map(add, log_posterior, table[self.index_by_id[question_id]]))
+        top = max(log_posterior)
+        weights = [math.exp(value - top) for value in log_posterior]
+        total = sum(weights)
+        mean = sum(map(mul, weights, GRID)) / total
+        variance = sum(weight * (theta - mean) ** 2 for weight, theta in zip(weights, GRID)) / total
+        return mean, math.sqrt(variance)
+
+    def next_question(self, theta: float, answered) -> int | None:
+        point = min(max(round((theta - THETA_MIN) / GRID_STEP), 0), GRID_POINTS - 1)
+        for index in self.order[point]:
+            question_id = self.question_ids[index]
+            if question_id not in answered:
+                return question_id
+        return None
+
+    def is_done(self, answered_count: int, se: float) -> bool:
+        return answered_count >= self.length or (answered_count >= MIN_QUESTIONS and se <= self.target_se)
+
+
+def _item_tables(discrimination: float, difficulty: float) -> tuple[tuple, tuple, list]:
+    # log P и log(1 - P) через log1p: без переполнения на краях сетки.
+    log_right = []
+    log_wrong = []
+    information = []
+    for theta in GRID:
+        z = discrimination * (theta - difficulty)
+        log_right.append(-math.log1p(math.exp(-z)))
+        log_wrong.append(-math.log1p(math.exp(z)))
+        probability = math.exp(log_right[-1])
+        information.append(discrimination * discrimination * probability * (1 - probability))
+    return tuple(log_right), tuple(log_wrong), information
+
+
+def build_bank(entry, version) -> ItemBank | None:
+    """None — экзамен не в адаптивном режиме."""
+    exam = (
+        Exam.objects.filter(id=entry.exam.id, is_adaptive=True)
+        .values('adaptive_max_questions', 'adaptive_target_se')
+        .first()
+    )
+    if exam is None:
+        return None
+
+    # Вопросы и варианты — из снимка, параметры — из строк вопросов: калибровка не создает новый снимок.
+    questions = json.loads(bytes(entry.detail))['questions']
+    parameters = {
+        question_id: (discrimination, difficulty)
+        for question_id, discrimination, difficulty in Question.objects.filter(
+            id__in=[question['id'] for question in questions]
+        ).values_list('id', 'irt_discrimination', 'irt_difficulty')
+    }
+    log_right = []
+    log_wrong = []
+    information = []
+    for question in questions:
+        discrimination, difficulty = parameters.get(question['id'], (None, None))
+        if discrimination is None:
+            discrimination = DEFAULT_DISCRIMINATION
+        if difficulty is None:
+            difficulty = DEFAULT_DIFFICULTY.get(question['difficulty'], 0.0)
+        right, wrong, item_information = _item_tables(discrimination, difficulty)
+        log_right.append(right)
+        log_wrong.append(wrong)
+        information.append(item_information)
+
+    indexes = range(len(questions))
+    return ItemBank(
+        version=version,
+        snapshot_id=entry.snapshot_id,
+        max_questions=exam['adaptive_max_questions'],
+        target_se=exam['adaptive_target_se'],
+        question_ids=tuple(question['id'] for question in questions),
+        index_by_id={question['id']: index for index, question in enumerate(questions)},
+        payload_by_id={question['id']: question for question in questions},
+        correct_by_id={question_id: correct_option_id for question_id, _, correct_option_id in entry.key},
+        log_right=tuple(log_right),
+        log_wrong=tuple(log_wrong),
+        order=tuple(
+            tuple(sorted(indexes, key=lambda index: -information[index][point])) for point in range(GRID_POINTS)
+        ),
+    )
+
+
+class ItemBankCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._banks: dict[int, ItemBank] = {}
+
+    def get(self, entry) -> ItemBank | None:
+        version = catalog.ensure_fresh()
+        bank = self._banks.get(entry.exam.id)
+        if bank is not None and bank.version == version and bank.snapshot_id == entry.snapshot_id:
+            return bank
+        with self._lock:
+            bank = self._banks.get(entry.exam.id)
+            if bank is None or bank.version != version or bank.snapshot_id != entry.snapshot_id:
+                bank = build_bank(entry, version)
+                if bank is None:
+                    self._banks.pop(entry.exam.id, None)
+                else:
+                    self._banks[entry.exam.id] = bank
+            return bank
+
+
+item_banks = ItemBankCache()
+
+
+def session_token(session: dict) -> str:
+    # Состояние попытки — в подписанном токене: ни таблицы сессий, ни общего кэша между воркерами.
+    # В токене только выданные вопросы и выбранные варианты, правильность ответов клиент не видит.
+    return signing.TimestampSigner(salt=SESSION_TOKEN_SALT).sign_object(session, compress=True)
+
+
+def read_session_token(token: str) -> dict | None:
+    try:
+        return signing.TimestampSigner(salt=SESSION_TOKEN_SALT).unsign_object(
+            token, max_age=settings.ADAPTIVE_SESSION_MAX_AGE_SEC
+        )
+    except signing.BadSignature:
+        return None
+
+
+def start_session(bank: ItemBank, exam_id: int, user_name: str) -> dict:
+    return {
+        'exam': exam_id,
+        'snapshot': bank.snapshot_id,
+        'user_name': user_name,
+        # Становится submission_key попытки: повторное завершение сессии не создает вторую попытку.
+        'key': secrets.token_urlsafe(16),
+        'started_at': timezone.now().isoformat(),
+        'responses': [],
+        'next': None,
+    }
+
+
+def advance(bank: ItemBank, session: dict) -> dict:
+    """Выбирает следующий вопрос сессии; ответ API с новым токеном."""
+    responses = session['responses']
+    theta, se = bank.estimate(responses)
+    next_id = None
+    if not bank.is_done(len(responses), se):
+        next_id = bank.next_question(theta, {question_id for question_id, _ in responses})
+    session['next'] = next_id
+    return {
+        'token': session_token(session),
+        'question': bank.payload_by_id[next_id] if next_id is not None else None,
+        'answered': len(responses),
+        'max_questions': bank.length,
+        'done': next_id is None,
+    }
+
+
+def ability_score(theta: float) -> int:
+    """Процентиль уровня среди участников (стандартное нормальное распределение), 0..100."""
+    return round(NORMAL.cdf(theta) * 100)
+
+
+def create_attempt(entry, bank: ItemBank, session: dict, participant_id: int):
+    """Вызывается внутри run_write; попытка хранится как обычная, только из выданных вопросов."""
+    responses = session['responses']
+    theta, _ = bank.estimate(responses)
+    started_at = datetime.fromisoformat(session['started_at'])
+    attempt, attempt_answers, results = build_attempt(
+        entry,
+        {question_id: option_id for question_id, option_id in responses},
+        question_ids={question_id for question_id, _ in responses},
+        participant_id=participant_id,
+        user_name=session['user_name'],
+        started_at=started_at,
+        duration_seconds=max(0, int((timezone.now() - started_at).total_seconds())),
+        submission_key=session['key'],
+        ability=round(theta, 4),
+    )
+    attempt.score = ability_score(theta)
+    save_attempts([(attempt, attempt_answers)], {entry.exam.id: entry.exam.passing_score})
+    return attempt, results
+
+
+def _clamp(value: float, bounds: tuple[float, float]) -> float:
+    return min(max(value, bounds[0]), bounds[1])
+
+
+def calibrate_exam(exam_id: int, min_responses: int = MIN_RESPONSES, date_from=None, date_to=None) -> tuple[dict, int]:
+    """Параметры (a, b) вопросов по попыткам с общим набором вопросов и число использованных листов.
+
+    Точечно-бисериальная корреляция ответа с суммой остальных верных ответов переводится
+    в бисериальную r, откуда a = 1.702 r / sqrt(1 - r^2) и b = -Ф^-1(p) / r (p — доля верных).
+    """
+    sheets = load_sheets(exam_id, date_from, date_to, fixed_form_only=True)
+    # question_id -> [n, сумма x, сумма rest, сумма rest^2, сумма x * rest]
+    sums: dict[int, list] = {}
+    for _, _, answers in sheets:
+        total = sum(1 for _, _, is_correct in answers if is_correct)
+        for question_id, _, is_correct in answers:
+            correct = 1 if is_correct else 0
+            rest = total - correct
+            item = sums.get(question_id)
+            if item is None:
+                item = sums[question_id] = [0, 0, 0, 0, 0]
+            item[0] += 1
+            item[1] += correct
+            item[2] += rest
+            item[3] += rest * rest
+            item[4] += correct * rest
+
+    parameters = {}
+    for question_id, (count, correct, rest, rest_squares, products) in sums.items():
+        if count < min_responses:
+            continue
+        p = correct / count
+        mean_rest = rest / count
+        rest_variance = rest_squares / count - mean_rest * mean_rest
+        covariance = products / count - p * mean_rest
+        spread = math.sqrt(p * (1 - p) * rest_variance)
+        point_biserial = covariance / spread if spread > 0 else 0.0
+
+        p = _clamp(p, (0.01, 0.99))
+        z = NORMAL.inv_cdf(p)
+        biserial = _clamp(point_biserial * math.sqrt(p * (1 - p)) / NORMAL.pdf(z), (0.05, 0.95))
+        discrimination = _clamp(1.702 * biserial / math.sqrt(1 - biserial * biserial), DISCRIMINATION_RANGE)
+        difficulty = _clamp(-z / biserial, DIFFICULTY_RANGE)
+        parameters[question_id] = (round(discrimination, 3), round(difficulty, 3))
+    return parameters, len(sheets)
+
+
+def save_parameters(exam_id: int, parameters: dict) -> None:
+    """Вызывается внутри run_write."""
+    Question.objects.bulk_update(
+        [
+            Question(id=question_id, irt_discrimination=discrimination, irt_difficulty=difficulty)
+            for question_id, (discrimination, difficulty) in parameters.items()
+        ],
+        ['irt_discrimination', 'irt_difficulty'],
+        batch_size=500,
+    )
+    # Без сигналов и сброса снимка: новая версия каталога пересоберет банки вопросов во всех воркерах.
+    Exam.objects.filter(id=exam_id).update(updated_at=timezone.now())
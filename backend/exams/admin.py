@@ -5,11 +5,29 @@ from django.contrib import admin
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models import Max
+from django.db.models.functions import Length
 from django.forms.models import BaseInlineFormSet
 from django.http import HttpResponseRedirect
 from django.urls import reverse
-
-from .models import Attempt, AttemptAnswer, Exam, Option, Question
+from django.utils.html import format_html, format_html_join
+
+from . import cloning, duplicates, rescoring, search, similarity, snapshots
+from .models import (
+    ArchivedAttemptStat,
+    Attempt,
+    AttemptAnswer,
+    DuplicateQuestion,
+    Exam,
+    ExamDailyStat,
+    ExamSnapshot,
+    Option,
+    Participant,
+    Question,
+    RescoreRun,
+    ReviewItem,
+    SimilarPair,
+    SprintResult,
+)
 
 
 def exam_publication_errors(exam: Exam) -> list[str]:
@@ -80,6 +98,7 @@ class QuestionAdmin(admin.ModelAdmin):
     list_display = ('id', 'exam', 'topic', 'difficulty', 'score_value', 'time_limit_sec', 'order')
     list_filter = ('exam', 'difficulty', 'topic')
     search_fields = ('prompt', 'topic', 'exam__title')
+    search_limit = 1000
     ordering = ('exam', 'order')
     fieldsets = (
         (
@@ -98,7 +117,16 @@ class QuestionAdmin(admin.ModelAdmin):
                 'classes': ('wide',),
             },
         ),
+        (
+            'Адаптивный режим',
+            {
+                'fields': ('irt_discrimination', 'irt_difficulty'),
+                'description': 'Заполняется командой calibrate_items по истории ответов.',
+            },
+        ),
+        ('Почти одинаковые вопросы', {'fields': ('duplicates_display',)}),
     )
+    readonly_fields = ('irt_discrimination', 'irt_difficulty', 'duplicates_display')
     formfield_overrides = {
         models.TextField: {
             'widget': forms.Textarea(
@@ -123,6 +151,37 @@ class QuestionAdmin(admin.ModelAdmin):
             )
         return formfield
 
+    @admin.display(description='Похожие вопросы')
+    def duplicates_display(self, obj):
+        if not obj.pk:
+            return '—'
+        similar = duplicates.similar_questions(obj.pk)
+        if not similar:
+            return 'Не найдены'
+        questions = Question.objects.select_related('exam').in_bulk([question_id for question_id, _ in similar])
+        return format_html_join(
+            '',
+            '<div><a href="{}">#{}</a> {} — {}: {}</div>',
+            (
+                (
+                    reverse('admin:exams_question_change', args=[question_id]),
+                    question_id,
+                    f'{similarity:.0%}',
+                    questions[question_id].exam.title,
+                    questions[question_id].prompt[:120],
+                )
+                for question_id, similarity in similar
+                if question_id in questions
+            ),
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по полнотекстовому индексу вместо ILIKE по нескольким таблицам.
+        if not search_term.strip() or search.backend() is None:
+            return super().get_search_results(request, queryset, search_term)
+        ranked = search.search(search_term, limit=self.search_limit, active_only=False)
+        return queryset.filter(id__in=[question_id for question_id, _ in ranked]), False
+
     def get_changeform_initial_data(self, request):
         initial = super().get_changeform_initial_data(request)
         exam_id = request.GET.get('exam')
@@ -140,6 +199,12 @@ class QuestionAdmin(admin.ModelAdmin):
             obj.order = max_order + 1
         super().save_model(request, obj, form, change)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Снимок собирается после сохранения вариантов (inline), иначе в нем будет вопрос без вариантов.
+        if form.instance.exam.is_active:
+            snapshots.publish(form.instance.exam_id)
+
     def response_add(self, request, obj, post_url_continue=None):
         if '_addanother' in request.POST:
             url = reverse('admin:exams_question_add')
@@ -162,9 +227,15 @@ class ExamAdmin(admin.ModelAdmin):
         'is_active',
         'questions_count',
     )
-    list_filter = ('subject', 'is_active')
+    list_filter = ('subject', 'is_active', 'is_adaptive')
     search_fields = ('title', 'subject', 'description')
-    actions = ('publish_selected',)
+    actions = (
+        'publish_selected',
+        'clone_selected',
+        'rescore_selected',
+        'find_similar_selected',
+        'find_duplicates_selected',
+    )
     fields = (
         'title',
         'description',
@@ -175,6 +246,9 @@ class ExamAdmin(admin.ModelAdmin):
         'effective_duration_minutes_display',
         'passing_score',
         'is_active',
+        'is_adaptive',
+        'adaptive_max_questions',
+        'adaptive_target_se',
     )
     readonly_fields = ('effective_duration_minutes_display',)
 
@@ -221,12 +295,63 @@ class ExamAdmin(admin.ModelAdmin):
 
             if not exam.is_active:
                 exam.is_active = True
-                exam.save(update_fields=['is_active'])
+                exam.save(update_fields=['is_active', 'updated_at'])
+            snapshots.publish(exam.id)
             published += 1
 
         if published:
             self.message_user(request, f'Опубликовано экзаменов: {published}.')
 
+    @admin.action(description='Клонировать экзамен')
+    def clone_selected(self, request, queryset):
+        for exam_id in queryset.values_list('id', flat=True):
+            exam, questions_count, _ = cloning.clone_exam(exam_id)
+            url = reverse('admin:exams_exam_change', args=[exam.id])
+            self.message_user(
+                request,
+                format_html(
+                    'Создана копия <a href="{}">{}</a>: вопросов {}. Копия не опубликована.',
+                    url,
+                    exam.title,
+                    questions_count,
+                ),
+            )
+
+    @admin.action(description='Пересчитать результаты по текущему ключу ответов')
+    def rescore_selected(self, request, queryset):
+        exam_ids = []
+        for exam in queryset:
+            run = RescoreRun.objects.filter(exam=exam, finished_at__isnull=True).first()
+            if run is not None and rescoring.is_running(run):
+                self.message_user(request, f'Пересчет экзамена "{exam.title}" уже идет ({run.progress}%).', level='warning')
+                continue
+            exam_ids.append(exam.id)
+
+        if exam_ids:
+            rescoring.rescore_in_background(exam_ids)
+            self.message_user(
+                request,
+                f'Пересчет запущен для экзаменов: {len(exam_ids)}. Прогресс — в разделе «Пересчеты результатов».',
+            )
+
+    @admin.action(description='Найти похожие листы ответов')
+    def find_similar_selected(self, request, queryset):
+        exam_ids = list(queryset.values_list('id', flat=True))
+        similarity.analyze_in_background(exam_ids)
+        self.message_user(
+            request,
+            f'Поиск похожих ответов запущен для экзаменов: {len(exam_ids)}. Отчет — в разделе «Похожие ответы».',
+        )
+
+    @admin.action(description='Найти почти одинаковые вопросы')
+    def find_duplicates_selected(self, request, queryset):
+        exam_ids = list(queryset.values_list('id', flat=True))
+        duplicates.find_in_background(exam_ids)
+        self.message_user(
+            request,
+            f'Поиск дубликатов запущен для экзаменов: {len(exam_ids)}. Отчет — в разделе «Почти одинаковые вопросы».',
+        )
+
 
 class AttemptAnswerInline(admin.TabularInline):
     model = AttemptAnswer
@@ -240,6 +365,7 @@ class AttemptAdmin(admin.ModelAdmin):
     list_display = (
         'id',
         'user_name',
+        'participant_link',
         'exam',
         'score',
         'scoring_points',
@@ -249,10 +375,51 @@ class AttemptAdmin(admin.ModelAdmin):
         'duration_seconds',
         'finished_at',
     )
-    list_filter = ('exam', 'finished_at', 'user_name')
-    search_fields = ('user_name', 'exam__title')
+    list_filter = ('exam', 'finished_at')
+    search_fields = ('participant__key', 'user_name', 'exam__title')
+    raw_id_fields = ('participant',)
     ordering = ('-finished_at',)
     inlines = [AttemptAnswerInline]
+    readonly_fields = ('ability', 'packed_answers_display')
+
+    @admin.display(description='Участник', ordering='participant_id')
+    def participant_link(self, obj):
+        # Все попытки участника под любым написанием имени — фильтр по целому ключу.
+        url = reverse('admin:exams_attempt_changelist')
+        return format_html('<a href="{}?participant__id__exact={}">#{}</a>', url, obj.participant_id, obj.participant_id)
+
+    def get_inlines(self, request, obj):
+        if obj is not None and obj.is_packed:
+            return []
+        return super().get_inlines(request, obj)
+
+    def get_fields(self, request, obj=None):
+        fields = [field for field in super().get_fields(request, obj) if field != 'packed_answers_display']
+        if obj is not None and obj.is_packed:
+            fields.append('packed_answers_display')
+        return fields
+
+    @admin.display(description='Ответы в попытке')
+    def packed_answers_display(self, obj):
+        records = obj.answer_records()
+        questions = Question.all_objects.select_related('exam').in_bulk([record.question_id for record in records])
+        options = Option.objects.in_bulk([record.selected_option_id for record in records if record.selected_option_id])
+        rows = format_html_join(
+            '',
+            '<tr><td>{}</td><td>{}</td><td>{}</td></tr>',
+            (
+                (
+                    questions.get(record.question_id, record.question_id),
+                    options.get(record.selected_option_id, '—'),
+                    'да' if record.is_correct else 'нет',
+                )
+                for record in records
+            ),
+        )
+        return format_html(
+            '<table><tr><th>Вопрос</th><th>Выбранный вариант</th><th>Ответ верный</th></tr>{}</table>',
+            rows,
+        )
 
 
 @admin.register(AttemptAnswer)
@@ -262,6 +429,225 @@ class AttemptAnswerAdmin(admin.ModelAdmin):
     search_fields = ('attempt__user_name', 'question__prompt', 'question__exam__title')
 
 
+@admin.register(ArchivedAttemptStat)
+class ArchivedAttemptStatAdmin(admin.ModelAdmin):
+    list_display = ('user_name', 'exam', 'attempts_count', 'best_score', 'archived_until')
+    list_filter = ('exam',)
+    search_fields = ('user_name', 'exam__title')
+    readonly_fields = (
+        'exam',
+        'participant',
+        'user_name',
+        'attempts_count',
+        'best_score',
+        'score_sum',
+        'duration_sum',
+        'archived_until',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ExamDailyStat)
+class ExamDailyStatAdmin(admin.ModelAdmin):
+    list_display = ('day', 'exam', 'attempts_count', 'passed_count', 'score_sum', 'duration_sum')
+    list_filter = ('exam',)
+    date_hierarchy = 'day'
+    readonly_fields = (
+        'exam',
+        'day',
+        'attempts_count',
+        'passed_count',
+        'score_sum',
+        'duration_sum',
+        'score_histogram',
+        'duration_histogram',
+    )
+    # Корзины гистограмм видны списками выше, отдельные счетчики в форме не нужны.
+    fields = readonly_fields
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ExamSnapshot)
+class ExamSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('exam', 'version', 'size_display', 'attempts_count', 'created_at')
+    list_filter = ('exam',)
+    readonly_fields = ('exam', 'version', 'size_display', 'created_at')
+    fields = readonly_fields
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .defer('content')
+            .annotate(content_size=Length('content'), attempts_total=models.Count('attempts'))
+        )
+
+    @admin.display(description='Размер (байт)', ordering='content_size')
+    def size_display(self, obj):
+        return obj.content_size
+
+    @admin.display(description='Попыток', ordering='attempts_total')
+    def attempts_count(self, obj):
+        return obj.attempts_total
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RescoreRun)
+class RescoreRunAdmin(admin.ModelAdmin):
+    list_display = ('exam', 'started_at', 'updated_at', 'finished_at', 'progress_display', 'changed_answers', 'changed_attempts')
+    list_filter = ('exam',)
+    readonly_fields = (
+        'exam',
+        'max_attempt_id',
+        'last_attempt_id',
+        'changed_answers',
+        'changed_attempts',
+        'started_at',
+        'updated_at',
+        'finished_at',
+    )
+
+    @admin.display(description='Прогресс')
+    def progress_display(self, obj):
+        return f'{obj.progress}%'
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(SimilarPair)
+class SimilarPairAdmin(admin.ModelAdmin):
+    list_display = (
+        'exam',
+        'first_attempt_link',
+        'second_attempt_link',
+        'shared_wrong',
+        'wrong_similarity_display',
+        'agreement_display',
+        'score',
+        'detected_at',
+    )
+    list_filter = ('exam',)
+    list_select_related = ('exam', 'first_attempt', 'second_attempt')
+    search_fields = ('first_attempt__user_name', 'second_attempt__user_name')
+
+    def _attempt_link(self, attempt):
+        url = reverse('admin:exams_attempt_change', args=[attempt.id])
+        return format_html('<a href="{}">{} (#{}, {}%)</a>', url, attempt.user_name, attempt.id, attempt.score)
+
+    @admin.display(description='Попытка 1')
+    def first_attempt_link(self, obj):
+        return self._attempt_link(obj.first_attempt)
+
+    @admin.display(description='Попытка 2')
+    def second_attempt_link(self, obj):
+        return self._attempt_link(obj.second_attempt)
+
+    @admin.display(description='Сходство неверных', ordering='wrong_similarity')
+    def wrong_similarity_display(self, obj):
+        return f'{obj.wrong_similarity:.0%}'
+
+    @admin.display(description='Совпадение ответов', ordering='agreement')
+    def agreement_display(self, obj):
+        return f'{obj.agreement:.0%}'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DuplicateQuestion)
+class DuplicateQuestionAdmin(admin.ModelAdmin):
+    list_display = ('cluster_link', 'question_link', 'exam', 'options_display', 'similarity_display', 'detected_at')
+    list_filter = ('question__exam',)
+    search_fields = ('question__prompt',)
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .select_related('question__exam')
+            .prefetch_related('question__options')
+        )
+
+    @admin.display(description='Кластер', ordering='representative_id')
+    def cluster_link(self, obj):
+        # Все вопросы кластера — фильтр по первому вопросу.
+        url = reverse('admin:exams_duplicatequestion_changelist')
+        return format_html(
+            '<a href="{}?representative__id__exact={}">#{}</a>', url, obj.representative_id, obj.representative_id
+        )
+
+    @admin.display(description='Вопрос', ordering='question_id')
+    def question_link(self, obj):
+        url = reverse('admin:exams_question_change', args=[obj.question_id])
+        return format_html('<a href="{}">#{}</a> {}', url, obj.question_id, obj.question.prompt[:120])
+
+    @admin.display(description='Экзамен')
+    def exam(self, obj):
+        return obj.question.exam
+
+    @admin.display(description='Варианты')
+    def options_display(self, obj):
+        return format_html_join(
+            '',
+            '<div>{}{}</div>',
+            ((option.text, ' ✓' if option.is_correct else '') for option in obj.question.options.all()),
+        )
+
+    @admin.display(description='Сходство', ordering='similarity')
+    def similarity_display(self, obj):
+        return f'{obj.similarity:.0%}'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Participant)
+class ParticipantAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'key', 'created_at')
+    search_fields = ('key', 'name')
+    readonly_fields = ('key', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # id участников кэшируются воркерами (participants.py), поэтому участники только добавляются.
+        return False
+
+
+@admin.register(ReviewItem)
+class ReviewItemAdmin(admin.ModelAdmin):
+    list_display = ('user_name', 'question', 'due_at', 'interval_days', 'repetitions', 'lapses')
+    list_filter = ('question__exam',)
+    search_fields = ('participant__key', 'user_name', 'question__prompt')
+    raw_id_fields = ('participant', 'question')
+
+
+@admin.register(SprintResult)
+class SprintResultAdmin(admin.ModelAdmin):
+    list_display = ('user_name', 'subject', 'score', 'total', 'finished_at')
+    list_filter = ('subject', 'finished_at')
+    search_fields = ('participant__key', 'user_name')
+    raw_id_fields = ('participant',)
+    ordering = ('-score', '-total')
+
+
 # Варианты ответов редактируются прямо в вопросе через inline,
 # отдельный раздел Option скрыт намеренно, чтобы не ломать UX.
 
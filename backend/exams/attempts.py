@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import rollups
+from .learning import record_sessions
+from .models import Attempt, AttemptAnswer
+from .ranking import leaderboard
+
+
+def build_attempt(entry, answers, question_ids=None, **fields) -> tuple[Attempt, list[AttemptAnswer], list[tuple]]:
+    """Оценивает ответы по ключу из каталога; fields — поля Attempt (user_name, started_at, ...).
+
+    question_ids ограничивает попытку выданными вопросами (адаптивный режим). Возвращает
+    несохраненную попытку, ее ответы и (question_id, selected_option_id, is_correct) в порядке вопросов.
+    """
+    key = entry.key
+    if question_ids is not None:
+        key = tuple(item for item in key if item[0] in question_ids)
+    results = []
+    correct_count = 0
+    scoring_points = 0
+    attempt = Attempt(
+        exam=entry.exam,
+        snapshot_id=entry.snapshot_id,
+        max_scoring_points=sum(score_value for _, score_value, _ in key),
+        total_questions=len(key),
+        **fields,
+    )
+
+    attempt_answers = []
+    for question_id, score_value, correct_option_id in key:
+        selected_option_id = answers.get(str(question_id)) or answers.get(question_id)
+        if not entry.has_option(selected_option_id):
+            selected_option_id = None
+
+        is_correct = bool(correct_option_id and selected_option_id == correct_option_id)
+        if is_correct:
+            correct_count += 1
+            scoring_points += score_value
+
+        attempt_answers.append(
+            AttemptAnswer(
+                attempt=attempt,
+                question_id=question_id,
+                selected_option_id=selected_option_id,
+                is_correct=is_correct,
+            )
+        )
+        results.append((question_id, selected_option_id, is_correct))
+
+    # Баллы считаются до вставки: одна запись INSERT вместо INSERT + UPDATE,
+    # чтобы блокировка на запись держалась как можно меньше.
+    attempt.score = round((correct_count / len(key)) * 100)
+    attempt.scoring_points = scoring_points
+    attempt.correct_count = correct_count
+    return attempt, attempt_answers, results
+
+
+def save_attempts(scored, passing_scores: dict[int, int]) -> None:
+    """scored — пары (attempt, attempt_answers) из build_attempt; вызывается внутри run_write."""
+    attempts = [attempt for attempt, _ in scored]
+    packed = settings.ATTEMPT_ANSWER_STORAGE == 'packed'
+    if packed:
+        for attempt, attempt_answers in scored:
+            attempt.set_packed_answers(attempt_answers)
+
+    if len(attempts) > 1 and connection.features.can_return_rows_from_bulk_insert:
+        Attempt.objects.bulk_create(attempts)
+    else:
+        for attempt in attempts:
+            attempt.save()
+
+    if not packed:
+        rows = []
+        for attempt, attempt_answers in scored:
+            for answer in attempt_answers:
+                answer.attempt_id = attempt.id
+            rows.extend(attempt_answers)
+        AttemptAnswer.objects.bulk_create(rows, batch_size=2000)
+
+    transaction.on_commit(lambda: leaderboard.record_many(attempts))
+    rollups.record_attempts(attempts, passing_scores)
+    record_sessions(
+        (
+            attempt.participant_id,
+            attempt.user_name,
+            ((answer.question_id, answer.is_correct) for answer in attempt_answers),
+            attempt.finished_at,
+        )
+        for attempt, attempt_answers in scored
+    )
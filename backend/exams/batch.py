@@ -0,0 +1,174 @@
+import json
+from datetime import timedelta
+
+from django.db import IntegrityError
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import participants
+from .attempts import build_attempt, save_attempts
+from .catalog import catalog
+from .db import run_write
+from .models import Attempt
+
+# Пакетная загрузка попыток, пройденных без связи (киоски, классы): элементы разбираются
+# потоком, оцениваются по ключу из каталога (один раз на экзамен) и пишутся пачками
+# bulk_create — по короткой транзакции на пачку. Ошибка элемента не мешает остальным.
+DEFAULT_CHUNK_SIZE = 500
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-seq')
+
+
+def read_json(data):
+    """Массив попыток или {"attempts": [...]}."""
+    if isinstance(data, dict):
+        data = data.get('attempts')
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of attempts.')
+    return data
+
+
+def read_ndjson(lines):
+    """По объекту на строку; ошибка разбора строки возвращается как элемент и попадет в ее результат."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            yield error
+
+
+def _error(result: dict, errors) -> None:
+    result['status'] = 'error'
+    result['errors'] = errors
+
+
+class BatchImport:
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.chunk_size = max(1, chunk_size)
+        self.entries = {}
+        # submission_key -> результат с id попытки: повтор внутри загрузки и между пачками.
+        self.keys: dict[str, dict] = {}
+        self.counts = {'created': 0, 'duplicate': 0, 'error': 0}
+        self._serializer = None
+
+    def entry(self, exam_id: int):
+        if exam_id not in self.entries:
+            self.entries[exam_id] = catalog.get_entry(exam_id)
+        return self.entries[exam_id]
+
+    def run(self, items):
+        """Отдает результаты по элементам в исходном порядке по мере записи пачек."""
+        pending = []
+        scored = []
+        for index, item in enumerate(items):
+            result = {'index': index}
+            pending.append(result)
+            prepared = self.prepare(item, result)
+            if prepared is not None:
+                scored.append(prepared)
+            if len(pending) >= self.chunk_size:
+                self.flush(scored)
+                yield from self.finish(pending)
+                pending = []
+                scored = []
+        if pending:
+            self.flush(scored)
+            yield from self.finish(pending)
+
+    def prepare(self, item, result: dict):
+        if isinstance(item, Exception):
+            _error(result, {'non_field_errors': [f'Invalid JSON: {item}']})
+            return None
+        if self._serializer is None:
+            from .serializers import BatchAttemptSerializer
+
+            # Один экземпляр на всю загрузку: DRF копирует поля при создании сериализатора,
+            # а run_validation — то же, что is_valid(), без этих затрат на каждый элемент.
+            self._serializer = BatchAttemptSerializer()
+        try:
+            payload = self._serializer.run_validation(item)
+        except ValidationError as error:
+            _error(result, error.detail)
+            return None
+        entry = self.entry(payload['exam'])
+        result['exam'] = payload['exam']
+        if entry is None:
+            _error(result, {'exam': ['Exam not found.']})
+            return None
+        if not entry.key:
+            _error(result, {'exam': ['Exam has no questions.']})
+            return None
+
+        submission_key = payload.get('submission_key') or None
+        if submission_key:
+            result['submission_key'] = submission_key
+            if submission_key in self.keys:
+                result['status'] = 'duplicate'
+                result['duplicate_of'] = self.keys[submission_key]
+                return None
+            self.keys[submission_key] = result
+
+        now = timezone.now()
+        # Часы киоска могут спешить: время из будущего заменяется временем загрузки.
+        finished_at = min(payload.get('finished_at') or now, now)
+        duration_seconds = payload.get('duration_seconds', 0)
+        attempt, attempt_answers, _ = build_attempt(
+            entry,
+            payload.get('answers', {}),
+            user_name=payload['user_name'].strip() or 'Student',
+            started_at=payload.get('started_at') or finished_at - timedelta(seconds=duration_seconds),
+            finished_at=finished_at,
+            duration_seconds=duration_seconds,
+            submission_key=submission_key,
+        )
+        return result, attempt, attempt_answers
+
+    def flush(self, scored) -> None:
+        if not scored:
+            return
+        participant_ids = participants.resolve_many({attempt.user_name for _, attempt, _ in scored})
+        for _, attempt, _ in scored:
+            attempt.participant_id = participant_ids[attempt.user_name]
+        for retry in (True, False):
+            keys = [attempt.submission_key for _, attempt, _ in scored if attempt.submission_key]
+            existing = dict(
+                Attempt.objects.filter(submission_key__in=keys).values_list('submission_key', 'id') if keys else ()
+            )
+            fresh = []
+            for result, attempt, attempt_answers in scored:
+                if attempt.submission_key in existing:
+                    result['status'] = 'duplicate'
+                    result['attempt_id'] = existing[attempt.submission_key]
+                else:
+                    fresh.append((result, attempt, attempt_answers))
+            scored = fresh
+            if not scored:
+                return
+            passing_scores = {
+                attempt.exam_id: self.entries[attempt.exam_id].exam.passing_score for _, attempt, _ in scored
+            }
+            try:
+                run_write(save_attempts, [(attempt, answers) for _, attempt, answers in scored], passing_scores)
+                break
+            except IntegrityError:
+                # Параллельная загрузка успела записать те же submission_key: повтор без них.
+                if not retry:
+                    raise
+                for _, attempt, _ in scored:
+                    attempt.pk = None
+                    attempt._state.adding = True
+
+        for result, attempt, _ in scored:
+            result['status'] = 'created'
+            result['attempt_id'] = attempt.id
+            result['score'] = attempt.score
+
+    def finish(self, pending):
+        for result in pending:
+            original = result.pop('duplicate_of', None)
+            if original is not None:
+                result['attempt_id'] = original.get('attempt_id')
+            self.counts[result['status']] += 1
+            yield result
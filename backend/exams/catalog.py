@@ -0,0 +1,186 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from . import catalog_file
+from .models import Exam, ExamSnapshot
+from .reviews import ReviewFragments, build_fragments, encode
+from .snapshots import current
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ExamEntry:
+    snapshot_id: int
+    # Экземпляр без сохранения: id, название и порог для попытки и ответа на отправку.
+    exam: Exam
+    # (question_id, score_value, correct_option_id) в порядке вопросов.
+    key: tuple[tuple[int, int, int | None], ...]
+    option_ids: frozenset[int]
+    detail: bytes
+    summary: bytes
+    reviews: ReviewFragments
+
+    def has_option(self, option_id) -> bool:
+        return option_id in self.option_ids
+
+
+def catalog_version() -> tuple:
+    # Правки вопросов и вариантов обновляют Exam.updated_at (см. signals.py),
+    # поэтому версия каталога — один агрегат по маленькой таблице экзаменов.
+    row = Exam.objects.aggregate(updated_at=Max('updated_at'), total=Count('id'))
+    updated_at = row['updated_at']
+    return (updated_at.isoformat() if updated_at else '', row['total'])
+
+
+def list_item(detail_data: dict) -> dict:
+    item = {key: value for key, value in detail_data.items() if key != 'questions'}
+    item['questions_count'] = len(detail_data['questions'])
+    return item
+
+
+def build_entry(snapshot: ExamSnapshot) -> ExamEntry:
+    # Все данные берутся из снимка, без запросов к вопросам и вариантам.
+    document = snapshot.document
+    data = document['exam']
+    key = []
+    option_ids = set()
+    for question in data['questions']:
+        key.append((question['id'], question['score_value'], document['key'].get(str(question['id']))))
+        option_ids.update(option['id'] for option in question['options'])
+
+    return ExamEntry(
+        snapshot_id=snapshot.id,
+        exam=Exam(id=data['id'], title=data['title'], passing_score=data['passing_score']),
+        key=tuple(key),
+        option_ids=frozenset(option_ids),
+        detail=encode(data),
+        summary=encode(list_item(data)),
+        reviews=build_fragments(snapshot.version, document),
+    )
+
+
+def list_json(entries) -> bytes:
+    return b'[' + b','.join(entry.summary for entry in entries) + b']'
+
+
+class CatalogCache:
+    """Кэш опубликованных экзаменов и ключей ответов: в памяти воркера или в общем файле (CATALOG_FILE)."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries: dict[int, ExamEntry] = {}
+        self._list_json = None
+        self._file: catalog_file.CatalogFile | None = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries = {}
+            self._list_json = None
+            self._file = None
+            self._version = None
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < settings.CATALOG_VERSION_CHECK_SEC:
+            return self._version
+
+        version = catalog_version()
+        with self._lock:
+            if version != self._version:
+                self._entries = {}
+                self._list_json = None
+                # Старое отображение не закрывается: его еще могут дочитывать другие потоки.
+                self._file = self._map_file(version) if settings.CATALOG_FILE else None
+                self._version = version
+            self._checked_at = now
+        return version
+
+    def _map_file(self, version) -> catalog_file.CatalogFile | None:
+        stamp = '|'.join(str(part) for part in version)
+        mapped = catalog_file.CatalogFile.open(settings.CATALOG_FILE)
+        if mapped is not None and mapped.version == stamp:
+            return mapped
+        # Файл собирает первый воркер, заметивший новую версию; остальные его просто отобразят.
+        entries = self._build_all()
+        try:
+            catalog_file.write(settings.CATALOG_FILE, stamp, entries, list_json(entries))
+        except OSError:
+            logger.exception('Catalog file %s is not writable, using in-process cache.', settings.CATALOG_FILE)
+            return None
+        return catalog_file.CatalogFile.open(settings.CATALOG_FILE)
+
+    @staticmethod
+    def _build_all() -> list[ExamEntry]:
+        entries = []
+        for exam in Exam.objects.filter(is_active=True).select_related('snapshot'):
+            snapshot = current(exam)
+            if snapshot is not None:
+                entries.append(build_entry(snapshot))
+        return entries
+
+    def get_entry(self, exam_id: int) -> ExamEntry | catalog_file.MappedEntry | None:
+        version = self.ensure_fresh()
+        entry = self._entries.get(exam_id)
+        if entry is not None:
+            return entry
+
+        mapped = self._file
+        if mapped is not None:
+            entry = mapped.entry(exam_id)
+        else:
+            # Промах кэша — одна строка экзамена с текущим снимком по первичному ключу.
+            exam = Exam.objects.filter(id=exam_id, is_active=True).select_related('snapshot').first()
+            snapshot = current(exam) if exam is not None else None
+            entry = build_entry(snapshot) if snapshot is not None else None
+        if entry is None:
+            return None
+
+        with self._lock:
+            if self._version == version:
+                self._entries[exam_id] = entry
+        return entry
+
+    def get_snapshot_entry(self, snapshot_id: int) -> ExamEntry | catalog_file.MappedEntry | None:
+        """Версия экзамена, на которой прошла попытка; снимки неизменяемы, поэтому проверка версии не нужна."""
+        for entry in list(self._entries.values()):
+            if entry.snapshot_id == snapshot_id:
+                return entry
+        snapshot = ExamSnapshot.objects.filter(id=snapshot_id).first()
+        return build_entry(snapshot) if snapshot is not None else None
+
+    def exam_list_json(self) -> bytes | memoryview:
+        version = self.ensure_fresh()
+        mapped = self._file
+        if mapped is not None:
+            return mapped.list_json
+        data = self._list_json
+        if data is not None:
+            return data
+
+        entries = self._build_all()
+        data = list_json(entries)
+        with self._lock:
+            if self._version == version:
+                self._entries.update((entry.exam.id, entry) for entry in entries)
+                self._list_json = data
+        return data
+
+    def warm(self) -> int:
+        """Загружает все опубликованные экзамены одним проходом, например до приема трафика."""
+        self.ensure_fresh()
+        if self._file is not None:
+            # Отображенному файлу прогрев не нужен: страницы уже в page cache.
+            return self._file.exam_count
+        self.exam_list_json()
+        return len(self._entries)
+
+
+catalog = CatalogCache()
@@ -0,0 +1,221 @@
+import mmap
+import os
+import struct
+import tempfile
+
+from .models import Exam
+from .reviews import ReviewFragments
+
+# Каталог опубликованных экзаменов одним бинарным файлом, который все воркеры отображают
+# в память только для чтения: страницы файла общие в page cache, поэтому память не растет
+# с числом воркеров. Файл пересобирается целиком и подменяется через os.replace, воркеры
+# со старым отображением дочитывают его, пока не переключатся на новый.
+#
+# Формат (little-endian):
+#   HEADER, затем индекс экзаменов INDEX (по возрастанию exam_id), затем записи и данные.
+#   RECORD экзамена: id, снимок, порог, число вопросов и вариантов, (offset, length) названия,
+#   версии, JSON карточки и документа разбора, offsets трех таблиц:
+#   - QUESTION в порядке вопросов: id, баллы, id верного варианта (0 — не задан);
+#   - FRAGMENT по возрастанию id вопроса: JSON-префикс вопроса для разбора;
+#   - FRAGMENT по возрастанию id варианта: JSON-фрагмент выбранного варианта.
+MAGIC = b'EXCATLG1'
+HEADER = struct.Struct('<8sIQIQI')
+INDEX = struct.Struct('<qQ')
+RECORD = struct.Struct('<qqIII' + 'QI' * 4 + 'QQQ')
+QUESTION = struct.Struct('<qIq')
+FRAGMENT = struct.Struct('<qQI')
+
+
+class FragmentTable:
+    """Отсортированная по id таблица (id, offset, length); значения — bytes из файла."""
+
+    def __init__(self, view: memoryview, offset: int, count: int):
+        self._view = view
+        self._offset = offset
+        self._count = count
+
+    def _find(self, key) -> tuple[int, int] | None:
+        if not isinstance(key, int):
+            return None
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            item_id, offset, length = FRAGMENT.unpack_from(self._view, self._offset + middle * FRAGMENT.size)
+            if item_id == key:
+                return offset, length
+            if item_id < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def __contains__(self, key) -> bool:
+        return self._find(key) is not None
+
+    def __getitem__(self, key) -> bytes:
+        found = self._find(key)
+        if found is None:
+            raise KeyError(key)
+        offset, length = found
+        return self._view[offset : offset + length].tobytes()
+
+    def get(self, key, default=None):
+        found = self._find(key)
+        if found is None:
+            return default
+        offset, length = found
+        return self._view[offset : offset + length].tobytes()
+
+
+class MappedEntry:
+    """Экзамен из файла каталога; тот же интерфейс, что у catalog.ExamEntry."""
+
+    def __init__(self, view: memoryview, offset: int):
+        (
+            self.exam_id,
+            self.snapshot_id,
+            self.passing_score,
+            question_count,
+            option_count,
+            title_offset,
+            title_length,
+            version_offset,
+            version_length,
+            detail_offset,
+            detail_length,
+            document_offset,
+            document_length,
+            questions_offset,
+            prefixes_offset,
+            selected_offset,
+        ) = RECORD.unpack_from(view, offset)
+        self._view = view
+        self._questions = view[questions_offset : questions_offset + question_count * QUESTION.size]
+        self._selected = FragmentTable(view, selected_offset, option_count)
+        self.title = str(view[title_offset : title_offset + title_length], 'utf-8')
+        self.detail = view[detail_offset : detail_offset + detail_length]
+        self.reviews = ReviewFragments(
+            version=str(view[version_offset : version_offset + version_length], 'ascii'),
+            question_prefix=FragmentTable(view, prefixes_offset, question_count),
+            selected=self._selected,
+            document=view[document_offset : document_offset + document_length],
+        )
+
+    @property
+    def exam(self) -> Exam:
+        return Exam(id=self.exam_id, title=self.title, passing_score=self.passing_score)
+
+    @property
+    def key(self) -> tuple[tuple[int, int, int | None], ...]:
+        return tuple(
+            (question_id, score_value, correct_option_id or None)
+            for question_id, score_value, correct_option_id in QUESTION.iter_unpack(self._questions)
+        )
+
+    def has_option(self, option_id) -> bool:
+        return option_id in self._selected
+
+
+class CatalogFile:
+    def __init__(self, mapped: mmap.mmap):
+        self._map = mapped
+        self._view = memoryview(mapped)
+        _, self.exam_count, version_offset, version_length, list_offset, list_length = HEADER.unpack_from(self._view, 0)
+        self.version = str(self._view[version_offset : version_offset + version_length], 'utf-8')
+        self.list_json = self._view[list_offset : list_offset + list_length]
+
+    @classmethod
+    def open(cls, path: str) -> 'CatalogFile | None':
+        try:
+            with open(path, 'rb') as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if mapped[: len(MAGIC)] != MAGIC:
+            mapped.close()
+            return None
+        return cls(mapped)
+
+    def entry(self, exam_id: int) -> MappedEntry | None:
+        low, high = 0, self.exam_count
+        while low < high:
+            middle = (low + high) // 2
+            item_id, offset = INDEX.unpack_from(self._view, HEADER.size + middle * INDEX.size)
+            if item_id == exam_id:
+                return MappedEntry(self._view, offset)
+            if item_id < exam_id:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+
+def _fragments(buffer: bytearray, items) -> bytes:
+    table = []
+    for item_id, data in sorted(items):
+        table.append(FRAGMENT.pack(item_id, len(buffer), len(data)))
+        buffer += data
+    return b''.join(table)
+
+
+def write(path: str, version: str, entries, list_json: bytes) -> None:
+    """entries — catalog.ExamEntry; файл собирается во временном и подменяется атомарно."""
+    entries = sorted(entries, key=lambda entry: entry.exam.id)
+    buffer = bytearray(HEADER.size + INDEX.size * len(entries))
+
+    def add(data: bytes) -> tuple[int, int]:
+        offset = len(buffer)
+        buffer.extend(data)
+        return offset, len(data)
+
+    version_ref = add(version.encode('utf-8'))
+    list_ref = add(list_json)
+    index = []
+    for entry in entries:
+        fragments = entry.reviews
+        title_ref = add(entry.exam.title.encode('utf-8'))
+        review_version_ref = add(fragments.version.encode('ascii'))
+        detail_ref = add(entry.detail)
+        document_ref = add(fragments.document)
+        prefixes = _fragments(buffer, fragments.question_prefix.items())
+        selected = _fragments(buffer, fragments.selected.items())
+        questions_ref = add(
+            b''.join(QUESTION.pack(question_id, score, correct or 0) for question_id, score, correct in entry.key)
+        )
+        prefixes_ref = add(prefixes)
+        selected_ref = add(selected)
+
+        index.append(INDEX.pack(entry.exam.id, len(buffer)))
+        buffer += RECORD.pack(
+            entry.exam.id,
+            entry.snapshot_id,
+            entry.exam.passing_score,
+            len(entry.key),
+            len(fragments.selected),
+            *title_ref,
+            *review_version_ref,
+            *detail_ref,
+            *document_ref,
+            questions_ref[0],
+            prefixes_ref[0],
+            selected_ref[0],
+        )
+
+    HEADER.pack_into(buffer, 0, MAGIC, len(entries), *version_ref, *list_ref)
+    buffer[HEADER.size : HEADER.size + INDEX.size * len(entries)] = b''.join(index)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(prefix='.catalog-', dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            file.write(buffer)
+            file.flush()
+            os.fsync(file.fileno())
+        # mkstemp создает файл 0600, а читать его могут воркеры под другим пользователем.
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
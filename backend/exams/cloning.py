@@ -0,0 +1,64 @@
+from django.db import connection
+
+from . import search
+from .db import run_write
+from .models import Exam, Option, Question, QuestionBand
+
+# Копия экзамена с вопросами и вариантами — вариант для правки. Строки копируются пачками
+# bulk_create без Question.save: ни пересчета порядка, ни сигналов на каждый вопрос.
+# Копия создается неактивной и без снимка, публикуется как обычный экзамен.
+EXAM_SKIP_FIELDS = {'id', 'snapshot_id', 'created_at', 'updated_at'}
+BATCH_SIZE = 1000
+
+
+def _copy_questions(source_id: int, exam_id: int) -> dict[int, int]:
+    """Старый id вопроса -> новый."""
+    rows = list(Question.objects.filter(exam_id=source_id).order_by('id').values())
+    questions = [Question(**{**row, 'id': None, 'exam_id': exam_id}) for row in rows]
+    Question.objects.bulk_create(questions, batch_size=BATCH_SIZE)
+    if connection.features.can_return_rows_from_bulk_insert:
+        new_ids = [question.id for question in questions]
+    else:
+        # MySQL не возвращает id из bulk_create: автоинкремент растет в порядке вставки.
+        new_ids = list(Question.objects.filter(exam_id=exam_id).order_by('id').values_list('id', flat=True))
+    return {row['id']: new_id for row, new_id in zip(rows, new_ids)}
+
+
+def _copy(source: Exam, title: str) -> tuple[Exam, int, int]:
+    fields = {
+        field.attname: getattr(source, field.attname)
+        for field in Exam._meta.concrete_fields
+        if field.attname not in EXAM_SKIP_FIELDS
+    }
+    exam = Exam.objects.create(**{**fields, 'title': title, 'is_active': False})
+
+    question_ids = _copy_questions(source.id, exam.id)
+    # Снятые с экзамена версии вопросов (Question.objects их не отдает) не копируются.
+    live = {'question__exam_id': source.id, 'question__retired_at__isnull': True}
+    options = [
+        Option(**{**row, 'id': None, 'question_id': question_ids[row['question_id']]})
+        for row in Option.objects.filter(**live).values().iterator(chunk_size=BATCH_SIZE)
+    ]
+    Option.objects.bulk_create(options, batch_size=BATCH_SIZE)
+
+    # Тексты те же: полосы MinHash и индекс поиска переносятся без пересчета.
+    bands = [
+        (question_ids[question_id], band, bucket)
+        for question_id, band, bucket in QuestionBand.objects.filter(**live).values_list(
+            'question_id', 'band', 'bucket'
+        )
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {QuestionBand._meta.db_table} (question_id, band, bucket) VALUES (%s, %s, %s)', bands
+        )
+    search.copy_exam(source.id, exam.id, question_ids)
+    return exam, len(question_ids), len(options)
+
+
+def clone_exam(exam_id: int, title: str | None = None) -> tuple[Exam, int, int] | None:
+    """(новый экзамен, вопросов, вариантов) в одной транзакции; None — экзамена нет."""
+    source = Exam.objects.filter(id=exam_id).first()
+    if source is None:
+        return None
+    return run_write(_copy, source, title or f'{source.title} (копия)'[:200])
@@ -0,0 +1,39 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+# Внутри процесса записи в SQLite выполняются по очереди: потоки gthread-воркера
+# не конкурируют за файл, а между процессами остается busy_timeout + повтор.
+_sqlite_write_lock = threading.Lock()
+
+
+def is_sqlite() -> bool:
+    return connection.vendor == 'sqlite'
+
+
+def is_locked_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def run_write(func, *args, **kwargs):
+    """Выполняет func(*args, **kwargs) в транзакции, на SQLite — с сериализацией и повтором."""
+    if not is_sqlite():
+        with transaction.atomic():
+            return func(*args, **kwargs)
+
+    retries = max(0, settings.SQLITE_WRITE_RETRIES)
+    delay = settings.SQLITE_WRITE_RETRY_DELAY_MS / 1000
+    attempt = 0
+    while True:
+        try:
+            with _sqlite_write_lock, transaction.atomic():
+                return func(*args, **kwargs)
+        except OperationalError as error:
+            if not is_locked_error(error) or attempt >= retries or connection.in_atomic_block:
+                raise
+            attempt += 1
+            time.sleep(delay * (2 ** (attempt - 1)) * (1 + random.random()))
@@ -0,0 +1,255 @@
+import hashlib
+import logging
+import re
+import threading
+import zlib
+
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from .db import run_write
+from .models import DuplicateQuestion, Question, QuestionBand
+
+logger = logging.getLogger(__name__)
+
+# Почти одинаковые вопросы во всех банках. Текст вопроса — множество символьных k-грамм,
+# по нему считается MinHash-подпись, а полосы подписи хранятся в QuestionBand с индексом
+# (band, bucket) и обновляются при сохранении вопроса. Кандидаты в дубликаты — вопросы
+# с общей корзиной хотя бы в одной полосе; точное сходство (Жаккар по k-граммам)
+# считается только для них, без сравнения всех пар.
+SHINGLE_SIZE = 5
+BANDS = 16
+ROWS = 4
+DEFAULT_THRESHOLD = 0.8
+# Корзина крупнее — шаблонный текст («Выберите верный ответ»), а не дубликаты.
+MAX_BUCKET_SIZE = 200
+PRIME = (1 << 61) - 1
+CHUNK_SIZE = 1000
+
+# Коэффициенты хэш-функций из sha256: полосы, сохраненные разными процессами и версиями Python, совпадают.
+COEFFICIENTS = tuple(
+    (
+        int.from_bytes(hashlib.sha256(f'a{index}'.encode()).digest()[:8], 'big') % (PRIME - 1) + 1,
+        int.from_bytes(hashlib.sha256(f'b{index}'.encode()).digest()[:8], 'big') % PRIME,
+    )
+    for index in range(BANDS * ROWS)
+)
+WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text: str) -> set[int]:
+    normalized = ' '.join(WORD_RE.findall(text.casefold()))
+    if len(normalized) <= SHINGLE_SIZE:
+        return {zlib.crc32(normalized.encode())}
+    return {
+        zlib.crc32(normalized[start : start + SHINGLE_SIZE].encode())
+        for start in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+
+
+def band_buckets(shingle_set: set[int], cache: dict | None = None) -> list[int]:
+    """Корзина в каждой полосе MinHash-подписи — знаковое 64-битное число для BigIntegerField."""
+    vectors = []
+    for shingle in shingle_set:
+        vector = cache.get(shingle) if cache is not None else None
+        if vector is None:
+            vector = tuple((a * shingle + b) % PRIME for a, b in COEFFICIENTS)
+            if cache is not None:
+                cache[shingle] = vector
+        vectors.append(vector)
+    signature = list(map(min, zip(*vectors)))
+    buckets = []
+    for band in range(BANDS):
+        raw = b''.join(value.to_bytes(8, 'big') for value in signature[band * ROWS : (band + 1) * ROWS])
+        buckets.append(int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'big', signed=True))
+    return buckets
+
+
+def jaccard(first: set, second: set) -> float:
+    union = len(first | second)
+    return len(first & second) / union if union else 0.0
+
+
+def _chunks(items, size: int = CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _models(apps=None):
+    # В миграции — исторические модели: живые читают поля, которых в схеме еще нет.
+    if apps is None:
+        return Question, QuestionBand
+    return apps.get_model('exams', 'Question'), apps.get_model('exams', 'QuestionBand')
+
+
+def index_questions(question_ids, cache: dict | None = None, apps=None) -> None:
+    question_ids = list(question_ids)
+    if not question_ids:
+        return
+    question_model, band_model = _models(apps)
+    rows = []
+    for question_id, prompt in question_model.objects.filter(id__in=question_ids).values_list('id', 'prompt'):
+        rows.extend(
+            band_model(question_id=question_id, band=band, bucket=bucket)
+            for band, bucket in enumerate(band_buckets(shingles(prompt), cache))
+        )
+    band_model.objects.filter(question_id__in=question_ids).delete()
+    band_model.objects.bulk_create(rows, batch_size=2000)
+
+
+def index_exam(exam_id: int) -> None:
+    index_questions(Question.objects.filter(exam_id=exam_id).values_list('id', flat=True))
+
+
+def rebuild(batch_size: int = CHUNK_SIZE, apps=None) -> int:
+    """Полосы всех вопросов заново; apps — реестр исторических моделей, когда вызывается из миграции."""
+    question_model, band_model = _models(apps)
+    band_model.objects.all().delete()
+    # Общие k-граммы встречаются в тысячах вопросов: хэши для них считаются один раз.
+    cache = {}
+    total = 0
+    last_id = 0
+    while True:
+        ids = list(
+            question_model.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        if len(cache) > 500_000:
+            cache.clear()
+        index_questions(ids, cache, apps)
+        total += len(ids)
+        last_id = ids[-1]
+    return total
+
+
+def _prompt_shingles(question_ids) -> dict[int, set[int]]:
+    result = {}
+    for chunk in _chunks(question_ids):
+        for question_id, prompt in Question.objects.filter(id__in=chunk).values_list('id', 'prompt'):
+            result[question_id] = shingles(prompt)
+    return result
+
+
+def similar_questions(question_id: int, threshold: float = DEFAULT_THRESHOLD) -> list[tuple[int, float]]:
+    """Почти одинаковые вопросы для одного вопроса: поиск по индексу полос, без перебора банка."""
+    own = QuestionBand.objects.filter(question_id=question_id)
+    candidate_ids = set(
+        QuestionBand.objects.filter(
+            Exists(own.filter(band=OuterRef('band'), bucket=OuterRef('bucket')))
+        ).exclude(question_id=question_id).values_list('question_id', flat=True)[: MAX_BUCKET_SIZE * BANDS]
+    )
+    if not candidate_ids:
+        return []
+    prompts = _prompt_shingles(candidate_ids | {question_id})
+    base = prompts.pop(question_id, set())
+    similar = [(other_id, jaccard(base, other)) for other_id, other in prompts.items()]
+    return sorted(
+        ((other_id, round(similarity, 4)) for other_id, similarity in similar if similarity >= threshold),
+        key=lambda item: (-item[1], item[0]),
+    )
+
+
+def candidate_pairs() -> set[tuple[int, int]]:
+    """Пары вопросов с общей корзиной хотя бы в одной полосе; одиночные корзины не читаются."""
+    shared = QuestionBand.objects.filter(
+        Exists(
+            QuestionBand.objects.filter(band=OuterRef('band'), bucket=OuterRef('bucket')).exclude(
+                question_id=OuterRef('question_id')
+            )
+        )
+    )
+    buckets = {}
+    for band, bucket, question_id in shared.values_list('band', 'bucket', 'question_id').iterator(chunk_size=5000):
+        buckets.setdefault((band, bucket), []).append(question_id)
+
+    pairs = set()
+    for members in buckets.values():
+        if len(members) > MAX_BUCKET_SIZE:
+            continue
+        members.sort()
+        for offset, first in enumerate(members):
+            for second in members[offset + 1 :]:
+                pairs.add((first, second))
+    return pairs
+
+
+def find_clusters(threshold: float = DEFAULT_THRESHOLD, exam_ids=None) -> list[list[tuple[int, float]]]:
+    """Кластеры [(question_id, сходство с первым вопросом кластера), ...], крупные первыми.
+
+    exam_ids — только кластеры, где есть вопрос этих экзаменов.
+    """
+    pairs = candidate_pairs()
+    prompts = _prompt_shingles({question_id for pair in pairs for question_id in pair})
+
+    parent = {}
+
+    def root(question_id):
+        while parent[question_id] != question_id:
+            parent[question_id] = parent[parent[question_id]]
+            question_id = parent[question_id]
+        return question_id
+
+    for first, second in pairs:
+        if first in prompts and second in prompts and jaccard(prompts[first], prompts[second]) >= threshold:
+            first_root = root(parent.setdefault(first, first))
+            second_root = root(parent.setdefault(second, second))
+            if first_root != second_root:
+                parent[max(first_root, second_root)] = min(first_root, second_root)
+
+    groups = {}
+    for question_id in parent:
+        groups.setdefault(root(question_id), []).append(question_id)
+    if exam_ids is not None:
+        in_exams = set()
+        for chunk in _chunks(parent):
+            in_exams.update(
+                Question.objects.filter(id__in=chunk, exam_id__in=exam_ids).values_list('id', flat=True)
+            )
+        groups = {key: members for key, members in groups.items() if in_exams.intersection(members)}
+
+    clusters = []
+    for representative, members in groups.items():
+        members.sort()
+        clusters.append(
+            [
+                (question_id, round(jaccard(prompts[representative], prompts[question_id]), 4))
+                for question_id in members
+            ]
+        )
+    clusters.sort(key=lambda cluster: (-len(cluster), cluster[0][0]))
+    return clusters
+
+
+def _save(clusters) -> None:
+    DuplicateQuestion.objects.all().delete()
+    DuplicateQuestion.objects.bulk_create(
+        [
+            DuplicateQuestion(representative_id=cluster[0][0], question_id=question_id, similarity=similarity)
+            for cluster in clusters
+            for question_id, similarity in cluster
+        ],
+        batch_size=1000,
+    )
+
+
+def find_duplicates(threshold: float = DEFAULT_THRESHOLD, exam_ids=None) -> list[list[tuple[int, float]]]:
+    """Находит кластеры и заменяет ими отчет «Почти одинаковые вопросы»."""
+    clusters = find_clusters(threshold, exam_ids)
+    run_write(_save, clusters)
+    return clusters
+
+
+def find_in_background(exam_ids=None) -> threading.Thread:
+    def target():
+        try:
+            find_duplicates(exam_ids=exam_ids)
+        except Exception:
+            logger.exception('Duplicate question search failed for exams %s', exam_ids)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=target, name='duplicates', daemon=True)
+    thread.start()
+    return thread
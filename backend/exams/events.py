@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+from itertools import count
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .catalog import catalog_version
+from .models import Attempt, Exam
+from .ranking import leaderboard
+
+logger = logging.getLogger(__name__)
+
+
+class EventPoller:
+    """Одна проверка БД на процесс за тик: новые попытки, изменения рейтинга, публикации экзаменов."""
+
+    def __init__(self):
+        self.last_attempt_id = None
+        self.catalog_version = None
+        self.active_exam_ids: set[int] = set()
+        self.ranks: dict[str, int] = {}
+
+    def poll(self) -> list[tuple[str, dict]]:
+        close_old_connections()
+        events = []
+        if self.last_attempt_id is None:
+            self.last_attempt_id = Attempt.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            self.catalog_version = catalog_version()
+            self.active_exam_ids = set(Exam.objects.filter(is_active=True).values_list('id', flat=True))
+            return events
+
+        attempts = list(
+            Attempt.objects.filter(id__gt=self.last_attempt_id)
+            .order_by('id')
+            .values(
+                'id', 'exam_id', 'exam__title', 'participant_id', 'user_name', 'score', 'duration_seconds', 'finished_at'
+            )[:500]
+        )
+        for attempt in attempts:
+            self.last_attempt_id = attempt['id']
+            events.append(
+                (
+                    'attempt',
+                    {
+                        'id': attempt['id'],
+                        'exam': attempt['exam_id'],
+                        'exam_title': attempt['exam__title'],
+                        'user_name': attempt['user_name'],
+                        'score': attempt['score'],
+                        'duration_seconds': attempt['duration_seconds'],
+                        'finished_at': attempt['finished_at'].isoformat(),
+                    },
+                )
+            )
+
+        for participant_id in dict.fromkeys(attempt['participant_id'] for attempt in attempts):
+            position = leaderboard.around(participant_id, window=0)
+            if position is None:
+                continue
+            previous = self.ranks.get(participant_id)
+            self.ranks[participant_id] = position['rank']
+            if previous != position['rank']:
+                events.append(
+                    (
+                        'rank',
+                        {
+                            'participant_id': participant_id,
+                            'user_name': position['entries'][0]['user_name'],
+                            'rank': position['rank'],
+                            'previous_rank': previous,
+                            'total': position['total'],
+                        },
+                    )
+                )
+
+        version = catalog_version()
+        if version != self.catalog_version:
+            self.catalog_version = version
+            active = dict(Exam.objects.filter(is_active=True).values_list('id', 'title'))
+            for exam_id in active.keys() - self.active_exam_ids:
+                events.append(('exam_published', {'id': exam_id, 'title': active[exam_id]}))
+            self.active_exam_ids = set(active)
+
+        return events
+
+
+class Subscription:
+    def __init__(self, exam_id: int | None = None):
+        self.exam_id = exam_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        self.dropped = False
+
+    def wants(self, data: dict) -> bool:
+        exam_id = data.get('exam')
+        return self.exam_id is None or exam_id is None or exam_id == self.exam_id
+
+
+class Broadcaster:
+    """Локальный pub/sub: один фоновый опрос на процесс, события раздаются всем подписчикам."""
+
+    def __init__(self):
+        self._subscribers: set[Subscription] = set()
+        self._task: asyncio.Task | None = None
+        self._poller = EventPoller()
+        self._ids = count(1)
+
+    def subscribe(self, exam_id: int | None = None) -> Subscription:
+        subscription = Subscription(exam_id)
+        self._subscribers.add(subscription)
+        if self._task is None or self._task.done():
+            # Новый опрос начинает с текущего состояния, без пачки событий, накопившихся без зрителей.
+            self._poller = EventPoller()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def publish(self, event: str, data: dict) -> None:
+        message = (next(self._ids), event, data)
+        for subscription in list(self._subscribers):
+            if not subscription.wants(data):
+                continue
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Медленный клиент не тормозит остальных: его поток закрывается, клиент переподключится.
+                subscription.dropped = True
+                self._subscribers.discard(subscription)
+
+    async def _run(self) -> None:
+        poll = sync_to_async(self._poller.poll, thread_sensitive=False)
+        while self._subscribers:
+            try:
+                for event, data in await poll():
+                    self.publish(event, data)
+            except Exception:
+                logger.exception('Event poll failed')
+            await asyncio.sleep(settings.EVENTS_POLL_SEC)
+
+
+broadcaster = Broadcaster()
+
+
+def format_event(event_id: int, event: str, data: dict) -> str:
+    return f'id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+async def stream_events(subscription: Subscription):
+    yield f'retry: {int(settings.EVENTS_RETRY_MS)}\n\n'
+    try:
+        while not subscription.dropped:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), timeout=settings.EVENTS_KEEPALIVE_SEC)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(*message)
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -0,0 +1,309 @@
+import csv
+import re
+import zipfile
+from datetime import date, datetime, time, timedelta
+from itertools import chain
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .models import Attempt, AttemptAnswer, Option, Question
+
+# Выгрузка попыток и ответов для отчетности. Попытки читаются iterator(chunk_size=...)
+# (на PostgreSQL — серверный курсор), ответы подтягиваются пачкой на каждый блок попыток,
+# а CSV/XLSX пишутся кусками, поэтому память не зависит от числа строк.
+KINDS = ('attempts', 'answers')
+FORMATS = ('csv', 'xlsx')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+ATTEMPT_HEADER = (
+    'ID попытки',
+    'Окончание',
+    'Начало',
+    'Имя пользователя',
+    'ID экзамена',
+    'Экзамен',
+    'Результат (%)',
+    'Правильных ответов',
+    'Всего вопросов',
+    'Скоринговый балл',
+    'Макс. скоринговый балл',
+    'Время (сек)',
+)
+ANSWER_HEADER = (
+    'ID попытки',
+    'Окончание',
+    'Имя пользователя',
+    'ID экзамена',
+    'Экзамен',
+    'ID вопроса',
+    'Порядок',
+    'Тема',
+    'Вопрос',
+    'Выбранный вариант',
+    'Ответ верный',
+)
+
+FLUSH_BYTES = 64 * 1024
+
+
+def parse_day(value: str | None) -> date | None:
+    if not value:
+        return None
+    return date.fromisoformat(value)
+
+
+def attempt_queryset(exam_id: int | None = None, date_from: date | None = None, date_to: date | None = None):
+    qs = Attempt.objects.order_by('id')
+    if exam_id:
+        qs = qs.filter(exam_id=exam_id)
+    if date_from:
+        qs = qs.filter(finished_at__gte=timezone.make_aware(datetime.combine(date_from, time.min)))
+    if date_to:
+        # Дата окончания включительно.
+        qs = qs.filter(finished_at__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min)))
+    return qs
+
+
+def _format_dt(value) -> str:
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+
+def _chunks(iterator, size: int):
+    chunk = []
+    for item in iterator:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def attempt_rows(qs, chunk_size: int = 2000):
+    values = qs.values_list(
+        'id',
+        'finished_at',
+        'started_at',
+        'user_name',
+        'exam_id',
+        'exam__title',
+        'score',
+        'correct_count',
+        'total_questions',
+        'scoring_points',
+        'max_scoring_points',
+        'duration_seconds',
+    )
+    for row in values.iterator(chunk_size=chunk_size):
+        yield (row[0], _format_dt(row[1]), _format_dt(row[2]), *row[3:])
+
+
+def answer_rows(qs, chunk_size: int = 2000):
+    attempts = qs.only(
+        'id', 'finished_at', 'user_name', 'exam_id', 'answers_packed', 'correct_mask', 'exam__title'
+    ).select_related('exam')
+    for chunk in _chunks(attempts.iterator(chunk_size=chunk_size), chunk_size):
+        records_by_attempt = {attempt.id: [] for attempt in chunk}
+        row_attempt_ids = []
+        for attempt in chunk:
+            if attempt.is_packed:
+                records_by_attempt[attempt.id] = [
+                    (record.question_id, record.selected_option_id, record.is_correct)
+                    for record in attempt.answer_records()
+                ]
+            else:
+                row_attempt_ids.append(attempt.id)
+
+        answers = (
+            AttemptAnswer.objects.filter(attempt_id__in=row_attempt_ids)
+            .order_by('attempt_id', 'id')
+            .values_list('attempt_id', 'question_id', 'selected_option_id', 'is_correct')
+        )
+        for attempt_id, question_id, option_id, is_correct in answers:
+            records_by_attempt[attempt_id].append((question_id, option_id, is_correct))
+
+        question_ids = set()
+        option_ids = set()
+        for records in records_by_attempt.values():
+            for question_id, option_id, _ in records:
+                question_ids.add(question_id)
+                if option_id:
+                    option_ids.add(option_id)
+        questions = {
+            row[0]: row[1:]
+            for row in Question.all_objects.filter(id__in=question_ids).values_list('id', 'order', 'topic', 'prompt')
+        }
+        options = dict(Option.objects.filter(id__in=option_ids).values_list('id', 'text'))
+
+        for attempt in chunk:
+            finished_at = _format_dt(attempt.finished_at)
+            for question_id, option_id, is_correct in records_by_attempt[attempt.id]:
+                order, topic, prompt = questions.get(question_id, ('', '', ''))
+                yield (
+                    attempt.id,
+                    finished_at,
+                    attempt.user_name,
+                    attempt.exam_id,
+                    attempt.exam.title,
+                    question_id,
+                    order,
+                    topic,
+                    prompt,
+                    options.get(option_id, ''),
+                    'да' if is_correct else 'нет',
+                )
+
+
+def export_rows(kind: str, exam_id=None, date_from=None, date_to=None, chunk_size: int = 2000):
+    qs = attempt_queryset(exam_id, date_from, date_to)
+    if kind == 'answers':
+        return ANSWER_HEADER, answer_rows(qs, chunk_size)
+    return ATTEMPT_HEADER, attempt_rows(qs, chunk_size)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_stream(header, rows):
+    writer = csv.writer(_Echo())
+    # BOM, чтобы Excel открыл UTF-8 с кириллицей без мастера импорта.
+    parts = ['\ufeff', writer.writerow(header)]
+    size = 0
+    for row in rows:
+        line = writer.writerow(row)
+        parts.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield ''.join(parts).encode('utf-8')
+            parts = []
+            size = 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+class _ChunkBuffer:
+    """Приемник без seek для ZipFile: накопленные байты забирает генератор."""
+
+    def __init__(self):
+        self.parts: list[bytes] = []
+        self.size = 0
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self.parts)
+        self.parts = []
+        self.size = 0
+        return data
+
+
+_ILLEGAL_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+XLSX_STATIC_PARTS = (
+    (
+        '[Content_Types].xml',
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>',
+    ),
+    (
+        '_rels/.rels',
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>',
+    ),
+    (
+        'xl/workbook.xml',
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>',
+    ),
+    (
+        'xl/_rels/workbook.xml.rels',
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>',
+    ),
+)
+
+
+def _xlsx_cell(value) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_ILLEGAL_XML_RE.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def xlsx_stream(header, rows):
+    # Строки пишутся inline-строками прямо в поток sheet1.xml внутри zip, без таблицы
+    # общих строк и без временных файлов.
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS:
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for row in chain([header], rows):
+                sheet.write(f'<row>{"".join(_xlsx_cell(value) for value in row)}</row>'.encode('utf-8'))
+                if buffer.size >= FLUSH_BYTES:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+def render(file_format: str, header, rows):
+    if file_format == 'xlsx':
+        return xlsx_stream(header, rows)
+    return csv_stream(header, rows)
+
+
+async def iterate_in_thread(iterator):
+    """Отдает синхронный генератор под ASGI по одному куску, не собирая ответ в память."""
+    step = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while True:
+        chunk = await step(iterator, done)
+        if chunk is done:
+            break
+        yield chunk
+
+
+def filename(kind: str, file_format: str, exam_id=None, date_from=None, date_to=None) -> str:
+    parts = [kind]
+    if exam_id:
+        parts.append(f'exam{exam_id}')
+    if date_from:
+        parts.append(f'from{date_from.isoformat()}')
+    if date_to:
+        parts.append(f'to{date_to.isoformat()}')
+    return f'{"-".join(parts)}.{file_format}'
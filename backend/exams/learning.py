@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.db import connection
+
+from .models import ReviewItem
+
+MIN_EASE = 1.3
+# Первые интервалы после верного ответа (в днях), дальше интервал умножается на ease.
+FIRST_INTERVALS = (1, 3)
+
+
+def schedule(item: ReviewItem, is_correct: bool, now) -> None:
+    """Упрощенный SM-2: ошибка возвращает вопрос в очередь сразу, верный ответ отодвигает его."""
+    if is_correct:
+        item.repetitions += 1
+        if item.repetitions <= len(FIRST_INTERVALS):
+            item.interval_days = FIRST_INTERVALS[item.repetitions - 1]
+        else:
+            item.interval_days = round(item.interval_days * item.ease, 2)
+        item.ease = item.ease + 0.1
+    else:
+        item.repetitions = 0
+        item.lapses += 1
+        item.interval_days = 0
+        item.ease = max(MIN_EASE, item.ease - 0.2)
+
+    item.due_at = now + timedelta(days=item.interval_days)
+    item.last_reviewed_at = now
+
+
+def record_answers(participant_id: int, user_name: str, results, now) -> None:
+    """Обновляет очередь повторения по ответам одной попытки: results — пары (question_id, is_correct).
+
+    В очередь попадают только вопросы с ошибкой; верные ответы продвигают уже известные вопросы.
+    """
+    record_sessions([(participant_id, user_name, results, now)])
+
+
+def record_sessions(sessions) -> None:
+    """То же для пачки попыток: sessions — (participant_id, user_name, results, now) в порядке прохождения."""
+    sessions = [
+        (participant_id, user_name, dict(results), now) for participant_id, user_name, results, now in sessions
+    ]
+    sessions = [session for session in sessions if session[2]]
+    if not sessions:
+        return
+
+    participant_ids = {participant_id for participant_id, _, _, _ in sessions}
+    question_ids = {question_id for _, _, results, _ in sessions for question_id in results}
+    items = {
+        (item.participant_id, item.question_id): item
+        for item in ReviewItem.objects.filter(participant_id__in=participant_ids, question_id__in=question_ids)
+    }
+    touched = set()
+    for participant_id, user_name, results, now in sessions:
+        for question_id, is_correct in results.items():
+            key = (participant_id, question_id)
+            item = items.get(key)
+            if item is None:
+                if is_correct:
+                    continue
+                item = ReviewItem(
+                    participant_id=participant_id,
+                    user_name=user_name,
+                    question_id=question_id,
+                    due_at=now,
+                    last_reviewed_at=now,
+                )
+                schedule(item, False, now)
+                items[key] = item
+            else:
+                schedule(item, is_correct, now)
+            touched.add(key)
+
+    # Новые и измененные записи пишутся одним upsert по (participant, question): bulk_update
+    # строит CASE по каждому полю и на больших пачках в разы медленнее. pk не передается,
+    # чтобы конфликт определялся только уникальным ключом.
+    rows = [items[key] for key in touched]
+    for item in rows:
+        item.pk = None
+    ReviewItem.objects.bulk_create(
+        rows,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['participant', 'question'] if connection.features.supports_update_conflicts_with_target else None,
+        update_fields=['due_at', 'interval_days', 'ease', 'repetitions', 'lapses', 'last_reviewed_at'],
+    )
+
+
+def due_items(participant_id: int, now, limit: int, exam_id: int | None = None):
+    qs = ReviewItem.objects.filter(participant_id=participant_id, due_at__lte=now)
+    if exam_id:
+        qs = qs.filter(question__exam_id=exam_id)
+    return qs.order_by('due_at')[:limit]
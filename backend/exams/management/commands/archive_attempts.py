@@ -0,0 +1,174 @@
+import gzip
+import json
+import os
+from datetime import timedelta
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from exams.models import ArchivedAttemptStat, Attempt, AttemptAnswer
+from exams.packing import unpack_answers, unpack_flags
+
+
+ATTEMPT_FIELDS = (
+    "id",
+    "exam_id",
+    "participant_id",
+    "user_name",
+    "started_at",
+    "finished_at",
+    "score",
+    "scoring_points",
+    "max_scoring_points",
+    "correct_count",
+    "total_questions",
+    "duration_seconds",
+)
+PACKED_FIELDS = ("answers_packed", "correct_mask")
+
+
+class Command(BaseCommand):
+    help = "Переносит старые попытки в сжатые JSONL-архивы, сохраняя сводную статистику."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ATTEMPT_RETENTION_DAYS,
+            help="Сколько дней попытки хранятся в основной таблице",
+        )
+        parser.add_argument("--output-dir", default=str(settings.ATTEMPT_ARCHIVE_DIR), help="Каталог архивов")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Попыток в одной транзакции")
+        parser.add_argument("--dry-run", action="store_true", help="Только посчитать, ничего не переносить")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        queryset = Attempt.objects.filter(finished_at__lt=cutoff)
+
+        if options["dry_run"]:
+            self.stdout.write(f"К архивации: {queryset.count()} попыток старше {cutoff:%Y-%m-%d}.")
+            return
+
+        output_dir = Path(options["output_dir"])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        batch_size = max(1, options["batch_size"])
+        self.recover_parts(output_dir)
+
+        archived = 0
+        while True:
+            batch = list(queryset.order_by("id").values(*ATTEMPT_FIELDS, *PACKED_FIELDS)[:batch_size])
+            if not batch:
+                break
+            try:
+                self.archive_batch(batch, output_dir, cutoff)
+            except BaseException:
+                self.recover_parts(output_dir)
+                raise
+            archived += len(batch)
+            self.stdout.write(f"Архивировано попыток: {archived}")
+
+        self.stdout.write(self.style.SUCCESS(f"Готово. Перенесено в архив: {archived}, каталог: {output_dir}."))
+
+    @transaction.atomic
+    def archive_batch(self, batch, output_dir: Path, cutoff):
+        attempt_ids = [row["id"] for row in batch]
+        answers_by_attempt: dict[int, list] = {}
+        answers = AttemptAnswer.objects.filter(attempt_id__in=attempt_ids).values_list(
+            "attempt_id", "question_id", "selected_option_id", "is_correct"
+        )
+        for attempt_id, question_id, option_id, is_correct in answers.iterator(chunk_size=5000):
+            answers_by_attempt.setdefault(attempt_id, []).append([question_id, option_id, is_correct])
+
+        lines_by_month: dict[str, list[str]] = {}
+        totals: dict[tuple[int, int], list] = {}
+        for row in batch:
+            answers_packed = row.pop("answers_packed")
+            correct_mask = row.pop("correct_mask")
+            if answers_packed is not None:
+                pairs = unpack_answers(answers_packed)
+                flags = unpack_flags(correct_mask, len(pairs))
+                answers_by_attempt[row["id"]] = [
+                    [question_id, option_id, is_correct] for (question_id, option_id), is_correct in zip(pairs, flags)
+                ]
+
+            month = row["finished_at"].strftime("%Y-%m")
+            record = {
+                **row,
+                "started_at": row["started_at"].isoformat(),
+                "finished_at": row["finished_at"].isoformat(),
+                "answers": answers_by_attempt.get(row["id"], []),
+            }
+            lines_by_month.setdefault(month, []).append(json.dumps(record, ensure_ascii=False))
+
+            total = totals.setdefault((row["exam_id"], row["participant_id"]), [0, 0, 0, 0, row["user_name"]])
+            total[0] += 1
+            total[1] = max(total[1], row["score"])
+            total[2] += row["score"]
+            total[3] += row["duration_seconds"]
+
+        # Файлы дописываются новыми gzip-членами: архив за месяц можно пополнять повторными запусками.
+        # Член сначала пишется рядом во временный .part и дописывается в архив только после коммита:
+        # при откате попытки остаются в БД, и в архиве не появляется их вторая копия.
+        parts = [
+            self.write_part(output_dir / f"attempts-{month}.jsonl.gz", batch[0]["id"], lines)
+            for month, lines in lines_by_month.items()
+        ]
+        transaction.on_commit(partial(self.append_parts, parts))
+
+        for (exam_id, participant_id), (count, best, score_sum, duration_sum, user_name) in totals.items():
+            stat, created = ArchivedAttemptStat.objects.get_or_create(
+                exam_id=exam_id,
+                participant_id=participant_id,
+                defaults={
+                    "user_name": user_name,
+                    "attempts_count": count,
+                    "best_score": best,
+                    "score_sum": score_sum,
+                    "duration_sum": duration_sum,
+                    "archived_until": cutoff,
+                },
+            )
+            if not created:
+                ArchivedAttemptStat.objects.filter(pk=stat.pk).update(
+                    attempts_count=F("attempts_count") + count,
+                    best_score=Greatest("best_score", Value(best)),
+                    score_sum=F("score_sum") + score_sum,
+                    duration_sum=F("duration_sum") + duration_sum,
+                    archived_until=cutoff,
+                )
+
+        AttemptAnswer.objects.filter(attempt_id__in=attempt_ids).delete()
+        Attempt.objects.filter(id__in=attempt_ids).delete()
+
+    def write_part(self, archive_path: Path, first_id: int, lines) -> Path:
+        part = archive_path.with_name(f"{archive_path.name}.{first_id}.part")
+        with open(part, "wb") as output:
+            output.write(gzip.compress(("\n".join(lines) + "\n").encode("utf-8")))
+            output.flush()
+            os.fsync(output.fileno())
+        return part
+
+    def append_parts(self, parts):
+        for part in parts:
+            with open(part.with_name(part.name.rsplit(".", 2)[0]), "ab") as archive:
+                archive.write(part.read_bytes())
+                archive.flush()
+                os.fsync(archive.fileno())
+            part.unlink()
+
+    def recover_parts(self, output_dir: Path):
+        # .part остается после отката или падения между коммитом и дописыванием. Если попыток
+        # из него уже нет в БД, транзакция закоммичена и член дописывается, иначе файл удаляется.
+        for part in sorted(output_dir.glob("attempts-*.jsonl.gz.*.part")):
+            with gzip.open(part, "rt", encoding="utf-8") as source:
+                attempt_ids = [json.loads(line)["id"] for line in source if line.strip()]
+            if Attempt.objects.filter(id__in=attempt_ids).exists():
+                part.unlink()
+            else:
+                self.append_parts([part])
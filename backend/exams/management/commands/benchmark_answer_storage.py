@@ -0,0 +1,99 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from exams.models import Attempt, AttemptAnswer, Exam, Participant
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость записи и объем хранения ответов в режимах rows и packed (без сохранения данных)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--exam", type=int, help="Экзамен для генерации попыток (по умолчанию первый активный)")
+        parser.add_argument("--attempts", type=int, default=2000, help="Сколько попыток записать в каждом режиме")
+
+    def handle(self, *args, **options):
+        exam = Exam.objects.filter(is_active=True).order_by("id")
+        if options["exam"]:
+            exam = exam.filter(id=options["exam"])
+        exam = exam.prefetch_related("questions__options").first()
+        if exam is None:
+            raise CommandError("Нет активного экзамена для замера.")
+
+        questions = list(exam.questions.all())
+        if not questions:
+            raise CommandError("В экзамене нет вопросов.")
+
+        count = max(1, options["attempts"])
+        for mode in ("rows", "packed"):
+            elapsed, size = self.measure(mode, exam, questions, count)
+            size_text = f", {size / count:.0f} байт/попытка" if size is not None else ""
+            self.stdout.write(f"{mode:>6}: {count / elapsed:,.0f} попыток/с{size_text}")
+
+    def measure(self, mode, exam, questions, count):
+        rng = random.Random(42)
+        size_before = self.storage_size()
+        try:
+            with transaction.atomic():
+                # Без participants.resolve: участник откатывается вместе с попытками и не попадает в кэш.
+                participant_id = Participant.objects.get_or_create(key="benchmark", defaults={"name": "benchmark"})[0].id
+                started = time.perf_counter()
+                for _ in range(count):
+                    attempt = Attempt(
+                        exam=exam,
+                        participant_id=participant_id,
+                        user_name="benchmark",
+                        started_at=timezone.now(),
+                        score=0,
+                        correct_count=0,
+                        total_questions=len(questions),
+                    )
+                    answers = []
+                    for question in questions:
+                        option = rng.choice(list(question.options.all()) or [None])
+                        answers.append(
+                            AttemptAnswer(
+                                attempt=attempt,
+                                question=question,
+                                selected_option=option,
+                                is_correct=bool(option and option.is_correct),
+                            )
+                        )
+                    if mode == "packed":
+                        attempt.set_packed_answers(answers)
+                        attempt.save()
+                    else:
+                        attempt.save()
+                        AttemptAnswer.objects.bulk_create(answers)
+                elapsed = time.perf_counter() - started
+                size_after = self.storage_size()
+                raise Rollback
+        except Rollback:
+            pass
+
+        size = None if size_before is None or size_after is None else size_after - size_before
+        return elapsed, size
+
+    def storage_size(self):
+        tables = (Attempt._meta.db_table, AttemptAnswer._meta.db_table)
+        with connection.cursor() as cursor:
+            try:
+                if connection.vendor == "postgresql":
+                    cursor.execute(
+                        "SELECT SUM(pg_total_relation_size(relname::regclass)) FROM unnest(%s::text[]) AS relname",
+                        [list(tables)],
+                    )
+                elif connection.vendor == "sqlite":
+                    cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'exams_attempt%'")
+                else:
+                    return None
+            except Exception:
+                return None
+            return cursor.fetchone()[0] or 0
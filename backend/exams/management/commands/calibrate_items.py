@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import adaptive, export
+from exams.db import run_write
+from exams.models import Exam
+
+
+class Command(BaseCommand):
+    help = "Калибрует параметры вопросов (модель 2PL) для адаптивного режима по истории ответов."
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_ids", nargs="*", type=int, help="ID экзаменов; по умолчанию все")
+        parser.add_argument("--from", dest="date_from", help="Дата окончания от (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="date_to", help="Дата окончания до включительно (YYYY-MM-DD)")
+        parser.add_argument(
+            "--min-responses",
+            type=int,
+            default=adaptive.MIN_RESPONSES,
+            help="Минимум ответов на вопрос; вопросы с меньшим числом остаются с прежними параметрами",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Только показать параметры, без сохранения")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = export.parse_day(options["date_from"])
+            date_to = export.parse_day(options["date_to"])
+        except ValueError as exc:
+            raise CommandError(f"Неверная дата: {exc}") from exc
+
+        exam_ids = options["exam_ids"] or list(Exam.objects.order_by("id").values_list("id", flat=True))
+        missing = set(exam_ids) - set(Exam.objects.filter(id__in=exam_ids).values_list("id", flat=True))
+        if missing:
+            raise CommandError(f"Экзамены не найдены: {', '.join(map(str, sorted(missing)))}")
+
+        started = time.perf_counter()
+        for exam_id in exam_ids:
+            parameters, sheets_count = adaptive.calibrate_exam(
+                exam_id, max(2, options["min_responses"]), date_from, date_to
+            )
+            if parameters and not options["dry_run"]:
+                run_write(adaptive.save_parameters, exam_id, parameters)
+            self.stdout.write(f"Экзамен {exam_id}: листов {sheets_count}, откалибровано вопросов {len(parameters)}")
+            if options["verbosity"] > 1:
+                for question_id, (discrimination, difficulty) in sorted(parameters.items()):
+                    self.stdout.write(f"  вопрос {question_id}: a={discrimination:.3f} b={difficulty:+.3f}")
+        self.stdout.write(self.style.SUCCESS(f"Готово за {time.perf_counter() - started:.1f} с."))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from exams.models import Attempt, AttemptAnswer
+
+
+class Command(BaseCommand):
+    help = "Переводит ответы попыток между строковым (rows) и упакованным (packed) хранением."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--to", choices=("packed", "rows"), required=True, help="Целевой формат хранения")
+        parser.add_argument("--exam", type=int, help="Только попытки указанного экзамена")
+        parser.add_argument("--batch-size", type=int, default=500, help="Попыток в одной транзакции")
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        queryset = Attempt.objects.filter(answers_packed__isnull=(options["to"] == "packed"))
+        if options["exam"]:
+            queryset = queryset.filter(exam_id=options["exam"])
+
+        convert = self.to_packed if options["to"] == "packed" else self.to_rows
+        converted = 0
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).order_by("id")[:batch_size])
+            if not batch:
+                break
+            convert(batch)
+            last_id = batch[-1].id
+            converted += len(batch)
+            self.stdout.write(f"Конвертировано попыток: {converted}")
+
+        self.stdout.write(self.style.SUCCESS(f"Готово. Формат {options['to']}: {converted} попыток."))
+
+    @transaction.atomic
+    def to_packed(self, attempts):
+        answers_by_attempt: dict[int, list] = {}
+        answers = (
+            AttemptAnswer.objects.filter(attempt__in=attempts)
+            .order_by("question__order", "question_id")
+            .only("attempt_id", "question_id", "selected_option_id", "is_correct")
+        )
+        for answer in answers:
+            answers_by_attempt.setdefault(answer.attempt_id, []).append(answer)
+
+        for attempt in attempts:
+            attempt.set_packed_answers(answers_by_attempt.get(attempt.id, []))
+        Attempt.objects.bulk_update(attempts, ["answers_packed", "correct_mask"])
+        AttemptAnswer.objects.filter(attempt__in=attempts).delete()
+
+    @transaction.atomic
+    def to_rows(self, attempts):
+        records = []
+        for attempt in attempts:
+            records.extend(attempt.answer_records())
+            attempt.answers_packed = None
+            attempt.correct_mask = None
+        AttemptAnswer.objects.bulk_create(records, ignore_conflicts=True)
+        Attempt.objects.bulk_update(attempts, ["answers_packed", "correct_mask"])
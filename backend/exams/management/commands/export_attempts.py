@@ -0,0 +1,46 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import export
+
+
+class Command(BaseCommand):
+    help = "Потоковая выгрузка попыток или ответов в CSV/XLSX с фильтрами по экзамену и датам."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=export.KINDS, default="attempts", help="Попытки или ответы")
+        parser.add_argument("--format", dest="file_format", choices=export.FORMATS, default="csv")
+        parser.add_argument("--exam", type=int, help="ID экзамена")
+        parser.add_argument("--from", dest="date_from", help="Дата окончания от (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="date_to", help="Дата окончания до включительно (YYYY-MM-DD)")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Попыток за одно чтение")
+        parser.add_argument("--output", help="Файл для выгрузки; по умолчанию stdout")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = export.parse_day(options["date_from"])
+            date_to = export.parse_day(options["date_to"])
+        except ValueError as exc:
+            raise CommandError(f"Неверная дата: {exc}") from exc
+
+        header, rows = export.export_rows(
+            options["kind"], options["exam"], date_from, date_to, chunk_size=max(1, options["chunk_size"])
+        )
+        started = time.perf_counter()
+        written = 0
+        output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        try:
+            for chunk in export.render(options["file_format"], header, rows):
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options["output"]:
+                output.close()
+
+        if options["output"]:
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                self.style.SUCCESS(f"Готово: {options['output']}, {written / 1024 / 1024:.1f} МБ за {elapsed:.1f} с.")
+            )
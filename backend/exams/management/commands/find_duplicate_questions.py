@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from exams import duplicates
+from exams.models import Exam, Option, Question
+
+
+class Command(BaseCommand):
+    help = "Ищет почти одинаковые вопросы во всех банках (MinHash LSH) и сохраняет отчет кластерами."
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_ids", nargs="*", type=int, help="Только кластеры с вопросами этих экзаменов")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=duplicates.DEFAULT_THRESHOLD,
+            help="Минимальное сходство текстов (Жаккар по k-граммам), 0..1",
+        )
+        parser.add_argument("--rebuild-index", action="store_true", help="Сначала пересобрать индекс полос MinHash")
+        parser.add_argument("--top", type=int, default=20, help="Сколько кластеров вывести")
+
+    def handle(self, *args, **options):
+        exam_ids = options["exam_ids"] or None
+        if exam_ids:
+            missing = set(exam_ids) - set(Exam.objects.filter(id__in=exam_ids).values_list("id", flat=True))
+            if missing:
+                raise CommandError(f"Экзамены не найдены: {', '.join(map(str, sorted(missing)))}")
+
+        started = time.perf_counter()
+        if options["rebuild_index"]:
+            with transaction.atomic():
+                total = duplicates.rebuild()
+            self.stdout.write(f"Индекс пересобран: вопросов {total}, за {time.perf_counter() - started:.1f} с.")
+
+        clusters = duplicates.find_duplicates(options["threshold"], exam_ids)
+        self.stdout.write(
+            f"Кластеров: {len(clusters)}, вопросов в них: {sum(len(cluster) for cluster in clusters)}"
+        )
+        self.report(clusters[: max(0, options["top"])])
+        self.stdout.write(self.style.SUCCESS(f"Готово за {time.perf_counter() - started:.1f} с."))
+
+    def report(self, clusters):
+        question_ids = [question_id for cluster in clusters for question_id, _ in cluster]
+        questions = Question.objects.select_related("exam").in_bulk(question_ids)
+        options = {}
+        for question_id, text in (
+            Option.objects.filter(question_id__in=question_ids).order_by("order", "id").values_list("question_id", "text")
+        ):
+            options.setdefault(question_id, []).append(text)
+
+        for number, cluster in enumerate(clusters, start=1):
+            self.stdout.write(f"Кластер {number}: вопросов {len(cluster)}")
+            for question_id, similarity in cluster:
+                question = questions.get(question_id)
+                if question is None:
+                    continue
+                line = f"  {similarity:4.0%} #{question_id} [{question.exam.title}] {question.prompt[:80]}"
+                if question_id in options:
+                    line += f" | {'; '.join(options[question_id])}"
+                self.stdout.write(line)
@@ -0,0 +1,74 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import export, similarity_index
+from exams.models import Attempt, Exam
+from exams.similarity import analyze_exams
+
+
+class Command(BaseCommand):
+    help = "Ищет подозрительно похожие листы ответов (общие неверные ответы) и сохраняет отчет по экзаменам."
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_ids", nargs="*", type=int, help="ID экзаменов; по умолчанию все")
+        parser.add_argument("--from", dest="date_from", help="Дата окончания от (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="date_to", help="Дата окончания до включительно (YYYY-MM-DD)")
+        parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Процессов для экзаменов")
+        parser.add_argument(
+            "--min-shared-wrong",
+            type=int,
+            default=similarity_index.DEFAULT_MIN_SHARED_WRONG,
+            help="Минимум одинаковых неверных ответов в паре",
+        )
+        parser.add_argument(
+            "--min-similarity",
+            type=float,
+            default=similarity_index.DEFAULT_MIN_SIMILARITY,
+            help="Минимальное сходство (Жаккар) множеств неверных ответов, 0..1",
+        )
+        parser.add_argument("--top", type=int, default=10, help="Сколько пар экзамена вывести")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = export.parse_day(options["date_from"])
+            date_to = export.parse_day(options["date_to"])
+        except ValueError as exc:
+            raise CommandError(f"Неверная дата: {exc}") from exc
+
+        exam_ids = options["exam_ids"] or list(Exam.objects.order_by("id").values_list("id", flat=True))
+        missing = set(exam_ids) - set(Exam.objects.filter(id__in=exam_ids).values_list("id", flat=True))
+        if missing:
+            raise CommandError(f"Экзамены не найдены: {', '.join(map(str, sorted(missing)))}")
+
+        self.top = max(0, options["top"])
+        started = time.perf_counter()
+        analyze_exams(
+            exam_ids,
+            jobs=max(1, options["jobs"]),
+            date_from=date_from,
+            date_to=date_to,
+            progress=self.report,
+            min_shared_wrong=max(1, options["min_shared_wrong"]),
+            min_similarity=options["min_similarity"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Готово за {time.perf_counter() - started:.1f} с."))
+
+    def report(self, exam_id, sheets_count, candidates_count, pairs):
+        self.stdout.write(
+            f"Экзамен {exam_id}: листов {sheets_count}, кандидатов {candidates_count}, похожих пар {len(pairs)}"
+        )
+        top = pairs[: self.top]
+        names = dict(
+            Attempt.objects.filter(
+                id__in={pair.first_attempt_id for pair in top} | {pair.second_attempt_id for pair in top}
+            ).values_list("id", "user_name")
+        )
+        for pair in top:
+            self.stdout.write(
+                f"  {pair.score:7.2f}  #{pair.first_attempt_id} {names.get(pair.first_attempt_id, '?')} ~ "
+                f"#{pair.second_attempt_id} {names.get(pair.second_attempt_id, '?')}: "
+                f"общих неверных {pair.shared_wrong}, сходство {pair.wrong_similarity:.0%}, "
+                f"совпадение ответов {pair.agreement:.0%}"
+            )
@@ -0,0 +1,69 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import batch
+
+MAX_PRINTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = "Пакетная загрузка попыток из JSON-массива или NDJSON (по попытке на строку), например с киосков."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл с попытками; - читает stdin")
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=("auto", "json", "ndjson"),
+            default="auto",
+            help="По умолчанию по расширению: .json — массив, остальное — NDJSON",
+        )
+        parser.add_argument("--chunk-size", type=int, default=batch.DEFAULT_CHUNK_SIZE, help="Попыток в транзакции")
+        parser.add_argument("--errors", help="Файл для ошибок по элементам (NDJSON)")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["file_format"]
+        if file_format == "auto":
+            file_format = "json" if path.endswith(".json") else "ndjson"
+
+        source = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        errors_output = open(options["errors"], "w", encoding="utf-8") if options["errors"] else None
+        importer = batch.BatchImport(chunk_size=options["chunk_size"])
+        started = time.perf_counter()
+        printed = 0
+        try:
+            if file_format == "json":
+                try:
+                    items = batch.read_json(json.load(source))
+                except ValueError as exc:
+                    raise CommandError(f"Неверный JSON: {exc}") from exc
+            else:
+                items = batch.read_ndjson(source)
+
+            for result in importer.run(items):
+                if result["status"] != "error":
+                    continue
+                if errors_output is not None:
+                    errors_output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                if printed < MAX_PRINTED_ERRORS:
+                    self.stderr.write(f"#{result['index']}: {json.dumps(result['errors'], ensure_ascii=False)}")
+                    printed += 1
+        finally:
+            if path != "-":
+                source.close()
+            if errors_output is not None:
+                errors_output.close()
+
+        elapsed = time.perf_counter() - started
+        counts = importer.counts
+        total = sum(counts.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Готово за {elapsed:.1f} с: создано {counts['created']}, повторов {counts['duplicate']}, "
+                f"ошибок {counts['error']} (всего {total}, {total / elapsed if elapsed else 0:.0f} попыток/с)."
+            )
+        )
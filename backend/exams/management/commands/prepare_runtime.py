@@ -0,0 +1,99 @@
+import hashlib
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+
+STATIC_FINGERPRINT_FILE = ".collectstatic-fingerprint"
+
+
+class Command(BaseCommand):
+    help = "Готовит контейнер к запуску: migrate, seed_exams и collectstatic выполняются только при изменениях."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", action="store_true", help="Загружать банк экзаменов, если он изменился")
+        parser.add_argument("--collectstatic", action="store_true", help="Собирать статику, если она устарела")
+        parser.add_argument(
+            "--strict-static",
+            action="store_true",
+            help="Завершаться с ошибкой, если collectstatic не удался",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        with self.step("migrate"):
+            self.migrate()
+
+        if options["seed"]:
+            with self.step("seed_exams", fatal=False):
+                call_command("seed_exams", if_changed=True, stdout=self.stdout)
+
+        if options["collectstatic"]:
+            with self.step("collectstatic", fatal=options["strict_static"]):
+                self.collectstatic()
+
+        if settings.CATALOG_FILE:
+            with self.step("catalog_file", fatal=False):
+                self.catalog_file()
+
+        self.stdout.write(f"[boot] готово за {time.perf_counter() - started:.2f} с")
+
+    @contextmanager
+    def step(self, name: str, fatal: bool = True):
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as error:
+            elapsed = time.perf_counter() - started
+            if fatal:
+                raise CommandError(f"[boot] {name}: ошибка за {elapsed:.2f} с: {error}") from error
+            self.stderr.write(f"[boot] WARNING: {name} не выполнен ({error}), запуск продолжается.")
+            return
+        self.stdout.write(f"[boot] {name}: {time.perf_counter() - started:.2f} с")
+
+    def migrate(self):
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            self.stdout.write("[boot] migrate: непримененных миграций нет, пропуск")
+            return
+        self.stdout.write(f"[boot] migrate: применяется миграций: {len(plan)}")
+        call_command("migrate", interactive=False, verbosity=0)
+
+    def catalog_file(self):
+        # Воркеры сразу отображают готовый файл каталога, без прогрева из БД.
+        from exams.catalog import catalog
+
+        catalog.invalidate()
+        catalog.ensure_fresh()
+        self.stdout.write(f"[boot] catalog_file: {settings.CATALOG_FILE}, экзаменов: {catalog.warm()}")
+
+    def collectstatic(self):
+        fingerprint = static_fingerprint()
+        stamp = Path(settings.STATIC_ROOT) / STATIC_FINGERPRINT_FILE
+        if stamp.exists() and stamp.read_text(encoding="utf-8").strip() == fingerprint:
+            self.stdout.write("[boot] collectstatic: статика актуальна, пропуск")
+            return
+        call_command("collectstatic", interactive=False, verbosity=0)
+        stamp.parent.mkdir(parents=True, exist_ok=True)
+        stamp.write_text(fingerprint, encoding="utf-8")
+
+
+def static_fingerprint() -> str:
+    digest = hashlib.sha256(settings.STORAGES["staticfiles"]["BACKEND"].encode("utf-8"))
+    entries = []
+    for finder in get_finders():
+        for path, storage in finder.list([]):
+            stat = Path(storage.path(path)).stat()
+            entries.append(f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}")
+    for entry in sorted(entries):
+        digest.update(entry.encode("utf-8"))
+    return digest.hexdigest()
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exams import export, purge
+from exams.models import Exam
+
+
+class Command(BaseCommand):
+    help = "Быстро удаляет экзамены или попытки целиком из БД: DELETE частями по id или TRUNCATE, без загрузки строк."
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_ids", nargs="*", type=int, help="ID экзаменов")
+        parser.add_argument("--all", action="store_true", help="Все экзамены (без ID)")
+        parser.add_argument(
+            "--attempts-only",
+            action="store_true",
+            help="Удалить только попытки с ответами, экзамены и вопросы оставить",
+        )
+        parser.add_argument("--from", dest="date_from", help="Дата окончания попытки от (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="date_to", help="Дата окончания попытки до включительно (YYYY-MM-DD)")
+        parser.add_argument(
+            "--chunk-size", type=int, default=purge.DEFAULT_CHUNK_SIZE, help="Диапазон id в одной транзакции"
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Только посчитать, ничего не удалять")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = export.parse_day(options["date_from"])
+            date_to = export.parse_day(options["date_to"])
+        except ValueError as exc:
+            raise CommandError(f"Неверная дата: {exc}") from exc
+
+        if bool(options["exam_ids"]) == options["all"]:
+            raise CommandError("Укажите ID экзаменов или --all.")
+        attempts_only = options["attempts_only"]
+        if (date_from or date_to) and not attempts_only:
+            raise CommandError("--from и --to применяются только вместе с --attempts-only.")
+
+        exam_ids = options["exam_ids"] or None
+        if exam_ids:
+            missing = set(exam_ids) - set(Exam.objects.filter(id__in=exam_ids).values_list("id", flat=True))
+            if missing:
+                raise CommandError(f"Экзамены не найдены: {', '.join(map(str, sorted(missing)))}")
+
+        if options["dry_run"]:
+            for name, count in purge.count(exam_ids, date_from, date_to, attempts_only).items():
+                self.stdout.write(f"К удалению: {name} — {count}")
+            return
+
+        chunk_size = max(1, options["chunk_size"])
+        started = time.perf_counter()
+        if attempts_only:
+            totals = purge.purge_attempts(exam_ids, date_from, date_to, chunk_size=chunk_size, progress=self.report)
+        else:
+            totals = purge.purge_exams(exam_ids, chunk_size=chunk_size, progress=self.report)
+
+        for name, count in totals.items():
+            self.stdout.write(f"  {name}: {'очищено целиком' if count is None else count}")
+        self.stdout.write(self.style.SUCCESS(f"Готово за {time.perf_counter() - started:.1f} с."))
+
+    def report(self, totals):
+        if None not in totals.values():
+            self.stdout.write("Удалено: " + ", ".join(f"{name} {count}" for name, count in totals.items() if count))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from exams.ranking import leaderboard
+
+
+class Command(BaseCommand):
+    help = "Пересобирает рейтинги (общий и по экзаменам) из Attempt и архивной статистики."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=5, help="Сколько первых мест вывести после пересборки")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        leaderboard.rebuild()
+        elapsed = time.perf_counter() - started
+
+        for item in leaderboard.top(limit=options["top"]):
+            self.stdout.write(f"{item['rank']:>4}. {item['user_name']} — {item['best_score']}% ({item['attempts_count']})")
+        self.stdout.write(self.style.SUCCESS(f"Готово за {elapsed:.2f} с."))
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from exams import participants
+from exams.learning import schedule
+from exams.models import Attempt, AttemptAnswer, ReviewItem
+
+
+class Command(BaseCommand):
+    help = "Пересобирает очередь повторения из истории ответов (AttemptAnswer и упакованных попыток)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Только для указанного пользователя")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Попыток за один проход")
+
+    def handle(self, *args, **options):
+        attempts = Attempt.objects.order_by("finished_at", "id").only(
+            "id", "participant_id", "user_name", "finished_at", "answers_packed", "correct_mask"
+        )
+        participant_id = None
+        if options["user"]:
+            # Все написания имени — один участник и одна очередь.
+            participant_id = participants.lookup(options["user"]) or 0
+            attempts = attempts.filter(participant_id=participant_id)
+
+        chunk_size = max(1, options["chunk_size"])
+        items: dict[tuple[int, int], ReviewItem] = {}
+        processed = 0
+        chunk = []
+        for attempt in attempts.iterator(chunk_size=chunk_size):
+            chunk.append(attempt)
+            if len(chunk) >= chunk_size:
+                self.replay(chunk, items)
+                processed += len(chunk)
+                chunk = []
+                self.stdout.write(f"Обработано попыток: {processed}")
+        if chunk:
+            self.replay(chunk, items)
+            processed += len(chunk)
+
+        with transaction.atomic():
+            existing = ReviewItem.objects.all()
+            if participant_id is not None:
+                existing = existing.filter(participant_id=participant_id)
+            existing.delete()
+            ReviewItem.objects.bulk_create(items.values(), batch_size=1000)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Готово. Попыток: {processed}, вопросов в очереди: {len(items)}.")
+        )
+
+    def replay(self, attempts, items):
+        rows_by_attempt: dict[int, list] = {}
+        row_attempt_ids = [attempt.id for attempt in attempts if not attempt.is_packed]
+        answers = AttemptAnswer.objects.filter(attempt_id__in=row_attempt_ids).values_list(
+            "attempt_id", "question_id", "is_correct"
+        )
+        for attempt_id, question_id, is_correct in answers:
+            rows_by_attempt.setdefault(attempt_id, []).append((question_id, is_correct))
+
+        for attempt in attempts:
+            if attempt.is_packed:
+                results = [(record.question_id, record.is_correct) for record in attempt.answer_records()]
+            else:
+                results = rows_by_attempt.get(attempt.id, [])
+
+            now = attempt.finished_at
+            for question_id, is_correct in results:
+                key = (attempt.participant_id, question_id)
+                item = items.get(key)
+                if item is None:
+                    if is_correct:
+                        continue
+                    item = ReviewItem(
+                        participant_id=attempt.participant_id, user_name=attempt.user_name, question_id=question_id
+                    )
+                    items[key] = item
+                schedule(item, is_correct, now)
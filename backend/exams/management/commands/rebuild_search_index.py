@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from exams import search
+
+
+class Command(BaseCommand):
+    help = "Пересобирает полнотекстовый индекс вопросов (PostgreSQL tsvector или SQLite FTS5)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Вопросов за один запрос")
+
+    def handle(self, *args, **options):
+        if search.backend() is None:
+            self.stdout.write(self.style.WARNING("СУБД без полнотекстового индекса, используется поиск по подстроке."))
+            return
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            total = search.rebuild(batch_size=max(1, options["batch_size"]))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Готово. Вопросов в индексе: {total}, за {elapsed:.2f} с."))
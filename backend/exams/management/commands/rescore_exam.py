@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.models import Exam
+from exams.rescoring import DEFAULT_CHUNK_SIZE, rescore_exam
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает ответы и результаты попыток экзамена по текущему ключу ответов."
+
+    def add_arguments(self, parser):
+        parser.add_argument("exam_ids", nargs="+", type=int, help="ID экзаменов")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Диапазон id попыток на транзакцию")
+        parser.add_argument("--restart", action="store_true", help="Начать заново, а не продолжить прерванный пересчет")
+
+    def handle(self, *args, **options):
+        missing = set(options["exam_ids"]) - set(Exam.objects.filter(id__in=options["exam_ids"]).values_list("id", flat=True))
+        if missing:
+            raise CommandError(f"Экзамены не найдены: {', '.join(map(str, sorted(missing)))}")
+
+        for exam_id in options["exam_ids"]:
+            run = rescore_exam(
+                exam_id,
+                chunk_size=max(1, options["chunk_size"]),
+                restart=options["restart"],
+                progress=lambda run: self.stdout.write(
+                    f"Экзамен {run.exam_id}: {run.progress}% (до попытки {run.last_attempt_id}), "
+                    f"изменено ответов: {run.changed_answers}"
+                ),
+            )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Экзамен {exam_id}: изменено ответов {run.changed_answers}, попыток {run.changed_attempts}."
+                )
+            )
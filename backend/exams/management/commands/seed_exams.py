@@ -1,7 +1,17 @@
+import hashlib
+import json
+
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from exams import duplicates, purge, search, snapshots
+from exams.catalog import catalog
+from exams.models import Attempt, BootFingerprint, DuplicateQuestion, Exam, Option, Question, QuestionBand, ReviewItem
 
-from exams.models import Attempt, Exam, Option, Question
+
+FINGERPRINT_NAME = "seed_exams"
 
 
 SEED = [
@@ -281,22 +291,36 @@ DIFFICULTY_SCORE = {
 }
 
 
+def seed_fingerprint() -> str:
+    payload = json.dumps({"seed": SEED, "difficulty_score": DIFFICULTY_SCORE}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 class Command(BaseCommand):
     help = "Загружает нейтральный банк экзаменов для аттестации сотрудников."
 
     def add_arguments(self, parser):
         parser.add_argument("--reset", action="store_true", help="Очистить текущие экзамены перед загрузкой")
+        parser.add_argument(
+            "--if-changed",
+            action="store_true",
+            help="Пропустить загрузку, если содержимое банка не менялось с прошлого запуска",
+        )
 
     @transaction.atomic
     def handle(self, *args, **options):
+        fingerprint = seed_fingerprint()
+        if options["if_changed"] and not options["reset"]:
+            if BootFingerprint.objects.filter(name=FINGERPRINT_NAME, value=fingerprint).exists():
+                self.stdout.write("Банк экзаменов не менялся, загрузка пропущена.")
+                return
+
         if options["reset"]:
-            Attempt.objects.all().delete()
-            Exam.objects.all().delete()
+            # Без сборщика Django: QuerySet.delete() загрузил бы каждый ответ, вопрос и вариант ради каскада.
+            purge.purge_exams()
             self.stdout.write(self.style.WARNING("Существующие экзамены удалены."))
 
-        created_questions = 0
-        created_options = 0
-
+        stats = {"created": 0, "updated": 0, "deleted": 0, "retired": 0}
         for exam_data in SEED:
             exam, created = Exam.objects.get_or_create(
                 title=exam_data["title"],
@@ -316,33 +340,88 @@ class Command(BaseCommand):
                 exam.passing_score = exam_data["passing_score"]
                 exam.is_active = True
                 exam.save()
-                exam.questions.all().delete()
 
-            for q_order, q_data in enumerate(exam_data["questions"], start=1):
-                correct_key = q_data["correct_key"]
-                correct_text = next((text for key, text in q_data["options"] if key == correct_key), "")
-                question = Question.objects.create(
-                    exam=exam,
-                    prompt=q_data["prompt"],
-                    explanation=q_data.get("explanation", f"Верный вариант: {correct_text}"),
-                    topic=q_data["topic"],
-                    difficulty=q_data["difficulty"],
-                    score_value=q_data.get("score_value", DIFFICULTY_SCORE.get(q_data["difficulty"], 1)),
-                    order=q_order,
-                )
-                created_questions += 1
+            self.sync_questions(exam, exam_data["questions"], stats)
+            # bulk-операции не вызывают сигналы, поэтому индексы поиска и дубликатов обновляются целиком по экзамену.
+            search.index_exam(exam.id)
+            duplicates.index_exam(exam.id)
+            snapshots.publish(exam.id)
 
-                for o_order, (key, text) in enumerate(q_data["options"], start=1):
-                    Option.objects.create(
-                        question=question,
-                        text=text,
-                        is_correct=(key == correct_key),
-                        order=o_order,
-                    )
-                    created_options += 1
+        BootFingerprint.objects.update_or_create(name=FINGERPRINT_NAME, defaults={"value": fingerprint})
+        catalog.invalidate()
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"Готово. Экзамены: {Exam.objects.count()}, вопросов: {created_questions}, вариантов: {created_options}."
+                f"Готово. Экзамены: {Exam.objects.count()}, строк создано: {stats['created']}, "
+                f"обновлено: {stats['updated']}, удалено: {stats['deleted']}, снято с экзаменов: {stats['retired']}."
             )
         )
+
+    def sync_questions(self, exam, questions_data, stats):
+        # Вопрос узнается по тексту, а не по позиции: вставка или перестановка вопросов в SEED
+        # не переписывает чужие строки, на которые ссылаются старые попытки. На месте меняются
+        # только порядок, тема, сложность и пояснение; другие варианты, верный ответ или баллы —
+        # новая строка вопроса, а прежняя убирается (см. retire_questions).
+        existing = {}
+        for question in exam.questions.prefetch_related("options"):
+            existing.setdefault(question.prompt, []).append(question)
+
+        questions_to_update = []
+        replaced = []
+        for q_order, q_data in enumerate(questions_data, start=1):
+            correct_key = q_data["correct_key"]
+            correct_text = next((text for key, text in q_data["options"] if key == correct_key), "")
+            values = {
+                "explanation": q_data.get("explanation", f"Верный вариант: {correct_text}"),
+                "topic": q_data["topic"],
+                "difficulty": q_data["difficulty"],
+                "order": q_order,
+            }
+            score_value = q_data.get("score_value", DIFFICULTY_SCORE.get(q_data["difficulty"], 1))
+            options = [(text, key == correct_key) for key, text in q_data["options"]]
+
+            candidates = existing.get(q_data["prompt"], [])
+            question = candidates.pop(0) if candidates else None
+            if question is not None and (
+                question.score_value != score_value
+                or [(option.text, option.is_correct) for option in question.options.all()] != options
+            ):
+                replaced.append(question)
+                question = None
+
+            if question is None:
+                question = Question.objects.bulk_create(
+                    [Question(exam=exam, prompt=q_data["prompt"], score_value=score_value, **values)]
+                )[0]
+                Option.objects.bulk_create(
+                    [
+                        Option(question=question, text=text, is_correct=is_correct, order=o_order)
+                        for o_order, (text, is_correct) in enumerate(options, start=1)
+                    ]
+                )
+                stats["created"] += 1 + len(options)
+            elif any(getattr(question, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(question, field, value)
+                questions_to_update.append(question)
+
+        Question.objects.bulk_update(questions_to_update, ["explanation", "topic", "difficulty", "order"])
+        stats["updated"] += len(questions_to_update)
+        self.retire_questions(exam, replaced + [question for group in existing.values() for question in group], stats)
+
+    def retire_questions(self, exam, questions, stats):
+        if not questions:
+            return
+        question_ids = [question.id for question in questions]
+        if not Attempt.objects.filter(exam=exam).exists():
+            stats["deleted"] += len(question_ids)
+            Question.objects.filter(id__in=question_ids).delete()
+            return
+        # На вопросы ссылаются попытки (строки ответов или упакованные id), поэтому строка остается
+        # для их истории, но из экзамена, поиска, очереди повторения и индекса дубликатов убирается.
+        Question.objects.filter(id__in=question_ids).update(retired_at=timezone.now())
+        search.remove_questions(question_ids)
+        ReviewItem.objects.filter(question_id__in=question_ids).delete()
+        QuestionBand.objects.filter(question_id__in=question_ids).delete()
+        DuplicateQuestion.objects.filter(Q(question_id__in=question_ids) | Q(representative_id__in=question_ids)).delete()
+        stats["retired"] += len(question_ids)
@@ -0,0 +1,88 @@
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+
+class AdmissionControl:
+    """Счетчик занятых слотов процесса; запрос занимает столько слотов, сколько стоит его view."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, cost: int, capacity: int) -> bool:
+        with self._lock:
+            # Одиночный дорогой запрос пропускается всегда, иначе он не прошел бы никогда.
+            if self.in_flight and self.in_flight + cost > capacity:
+                return False
+            self.in_flight += cost
+            return True
+
+    def release(self, cost: int) -> None:
+        with self._lock:
+            self.in_flight -= cost
+
+
+admission = AdmissionControl()
+
+
+def view_cost(path: str) -> int:
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return 0
+    view_class = getattr(match.func, 'view_class', None) or getattr(match.func, 'cls', None)
+    return int(getattr(view_class or match.func, 'throttle_cost', 1))
+
+
+class AdmissionControlMiddleware:
+    """Сбрасывает нагрузку с 503 + Retry-After, пока запросы еще не встали в очередь к БД."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def admit(self, request) -> int | None:
+        capacity = settings.ADMISSION_MAX_IN_FLIGHT
+        if capacity <= 0 or not request.path.startswith('/api/'):
+            return 0
+        cost = view_cost(request.path_info)
+        if cost <= 0:
+            return 0
+        return cost if admission.acquire(cost, capacity) else None
+
+    @staticmethod
+    def overloaded():
+        response = JsonResponse({'detail': 'Server is busy, retry later.'}, status=503)
+        response['Retry-After'] = str(settings.ADMISSION_RETRY_AFTER_SEC)
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        cost = self.admit(request)
+        if cost is None:
+            return self.overloaded()
+        try:
+            return self.get_response(request)
+        finally:
+            if cost:
+                admission.release(cost)
+
+    async def __acall__(self, request):
+        cost = self.admit(request)
+        if cost is None:
+            return self.overloaded()
+        try:
+            return await self.get_response(request)
+        finally:
+            if cost:
+                admission.release(cost)
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0005_exam_default_question_time_sec_question_time_limit_sec'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAttemptStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_name', models.CharField(max_length=100, verbose_name='Имя пользователя')),
+                ('attempts_count', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('best_score', models.PositiveIntegerField(default=0, verbose_name='Лучший результат (%)')),
+                ('score_sum', models.PositiveBigIntegerField(default=0, verbose_name='Сумма результатов')),
+                ('duration_sum', models.PositiveBigIntegerField(default=0, verbose_name='Суммарное время (сек)')),
+                ('archived_until', models.DateTimeField(blank=True, null=True, verbose_name='Архив по дату')),
+            ],
+            options={
+                'verbose_name': 'Архивная статистика',
+                'verbose_name_plural': 'Архивная статистика',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['finished_at'], name='exams_attempt_finished_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedattemptstat',
+            name='exam',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_stats', to='exams.exam', verbose_name='Экзамен'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='archivedattemptstat',
+            unique_together={('exam', 'user_name')},
+        ),
+    ]
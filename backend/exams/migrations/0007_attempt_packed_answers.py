@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0006_attempt_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='answers_packed',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Ответы (упаковано)'),
+        ),
+        migrations.AddField(
+            model_name='attempt',
+            name='correct_mask',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Маска верных ответов'),
+        ),
+    ]
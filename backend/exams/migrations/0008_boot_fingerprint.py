@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0007_attempt_packed_answers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BootFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Шаг запуска')),
+                ('value', models.CharField(max_length=64, verbose_name='Отпечаток')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлен')),
+            ],
+            options={
+                'verbose_name': 'Отпечаток шага запуска',
+                'verbose_name_plural': 'Отпечатки шагов запуска',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0008_boot_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SprintResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_name', models.CharField(db_index=True, max_length=100, verbose_name='Имя пользователя')),
+                ('subject', models.CharField(blank=True, max_length=100, verbose_name='Направление')),
+                ('score', models.PositiveIntegerField(verbose_name='Верных ответов')),
+                ('total', models.PositiveIntegerField(verbose_name='Всего ответов')),
+                ('started_at', models.DateTimeField(verbose_name='Начало')),
+                ('finished_at', models.DateTimeField(auto_now_add=True, verbose_name='Окончание')),
+            ],
+            options={
+                'verbose_name': 'Результат спринта',
+                'verbose_name_plural': 'Результаты спринта',
+                'ordering': ['-score', '-total', 'finished_at'],
+                'indexes': [models.Index(fields=['-score', '-total'], name='exams_sprint_rank_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0009_sprint_result'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_name', models.CharField(max_length=100, verbose_name='Имя пользователя')),
+                ('due_at', models.DateTimeField(verbose_name='Повторить после')),
+                ('interval_days', models.FloatField(default=0, verbose_name='Интервал (дн)')),
+                ('ease', models.FloatField(default=2.5, verbose_name='Легкость')),
+                ('repetitions', models.PositiveIntegerField(default=0, verbose_name='Верных подряд')),
+                ('lapses', models.PositiveIntegerField(default=0, verbose_name='Ошибок')),
+                ('last_reviewed_at', models.DateTimeField(verbose_name='Последнее повторение')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_items', to='exams.question', verbose_name='Вопрос')),
+            ],
+            options={
+                'verbose_name': 'Вопрос на повторение',
+                'verbose_name_plural': 'Очередь повторения',
+                'indexes': [models.Index(fields=['user_name', 'due_at'], name='exams_review_due_idx')],
+                'unique_together': {('user_name', 'question')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+from django.db import migrations
+
+from exams import search
+
+
+def create_search_index(apps, schema_editor):
+    search.create_tables(schema_editor)
+    search.rebuild(apps=apps)
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_tables(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0010_review_item'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
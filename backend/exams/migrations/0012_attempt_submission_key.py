@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0011_question_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='submission_key',
+            field=models.CharField(blank=True, editable=False, help_text='Генерируется клиентом; повторная отправка с тем же ключом не создает новую попытку.', max_length=64, null=True, unique=True, verbose_name='Ключ отправки'),
+        ),
+    ]
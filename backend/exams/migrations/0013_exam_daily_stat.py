@@ -0,0 +1,93 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Корзины на момент этой миграции (rollups.py): результат по 10%, время по этим границам (сек).
+SCORE_BUCKETS = 10
+DURATION_BOUNDS = (60, 120, 300, 600, 900, 1200, 1800, 2700, 3600)
+
+
+def backfill_daily_stats(apps, schema_editor):
+    # Дневная статистика по уже существующим попыткам: без нее API статистики показывал бы нули
+    # до ручного rebuild_exam_stats.
+    Attempt = apps.get_model('exams', 'Attempt')
+    ExamDailyStat = apps.get_model('exams', 'ExamDailyStat')
+
+    annotations = {
+        'attempts': Count('id'),
+        'passed': Count('id', filter=Q(score__gte=F('exam__passing_score'))),
+        'scores': Sum('score'),
+        'durations': Sum('duration_seconds'),
+    }
+    for index in range(SCORE_BUCKETS):
+        condition = Q(score__gte=index * 10)
+        if index < SCORE_BUCKETS - 1:
+            condition &= Q(score__lt=(index + 1) * 10)
+        annotations[f's{index}'] = Count('id', filter=condition)
+    lower = None
+    for index, bound in enumerate((*DURATION_BOUNDS, None)):
+        condition = Q()
+        if lower is not None:
+            condition &= Q(duration_seconds__gte=lower)
+        if bound is not None:
+            condition &= Q(duration_seconds__lt=bound)
+        annotations[f'd{index}'] = Count('id', filter=condition)
+        lower = bound
+
+    rows = (
+        Attempt.objects.annotate(day=TruncDate('finished_at', tzinfo=timezone.get_current_timezone()))
+        .values('exam_id', 'day')
+        .annotate(**annotations)
+        .order_by()
+    )
+    ExamDailyStat.objects.bulk_create(
+        [
+            ExamDailyStat(
+                exam_id=row['exam_id'],
+                day=row['day'],
+                attempts_count=row['attempts'],
+                passed_count=row['passed'],
+                score_sum=row['scores'] or 0,
+                duration_sum=row['durations'] or 0,
+                score_histogram=[row[f's{index}'] for index in range(SCORE_BUCKETS)],
+                duration_histogram=[row[f'd{index}'] for index in range(len(DURATION_BOUNDS) + 1)],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0012_attempt_submission_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('attempts_count', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('passed_count', models.PositiveIntegerField(default=0, verbose_name='Сдано')),
+                ('score_sum', models.PositiveBigIntegerField(default=0, verbose_name='Сумма результатов')),
+                ('duration_sum', models.PositiveBigIntegerField(default=0, verbose_name='Суммарное время (сек)')),
+                ('score_histogram', models.JSONField(default=list, verbose_name='Гистограмма результатов')),
+                ('duration_histogram', models.JSONField(default=list, verbose_name='Гистограмма времени')),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='exams.exam', verbose_name='Экзамен')),
+            ],
+            options={
+                'verbose_name': 'Статистика экзамена за день',
+                'verbose_name_plural': 'Статистика экзаменов по дням',
+                'ordering': ['-day'],
+                'unique_together': {('exam', 'day')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
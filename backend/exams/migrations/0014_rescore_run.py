@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0013_exam_daily_stat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RescoreRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_attempt_id', models.PositiveBigIntegerField(default=0, verbose_name='Последняя попытка на старте')),
+                ('last_attempt_id', models.PositiveBigIntegerField(default=0, verbose_name='Обработано до попытки')),
+                ('changed_answers', models.PositiveIntegerField(default=0, verbose_name='Изменено ответов')),
+                ('changed_attempts', models.PositiveIntegerField(default=0, verbose_name='Изменено попыток')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='Начало')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rescore_runs', to='exams.exam', verbose_name='Экзамен')),
+            ],
+            options={
+                'verbose_name': 'Пересчет результатов',
+                'verbose_name_plural': 'Пересчеты результатов',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
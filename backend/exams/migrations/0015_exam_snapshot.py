@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0014_rescore_run'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=16, verbose_name='Версия')),
+                ('content', models.BinaryField(verbose_name='Содержимое (JSON, zlib)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='exams.exam', verbose_name='Экзамен')),
+            ],
+            options={
+                'verbose_name': 'Снимок экзамена',
+                'verbose_name_plural': 'Снимки экзаменов',
+                'ordering': ['-created_at'],
+                'unique_together': {('exam', 'version')},
+            },
+        ),
+        migrations.AddField(
+            model_name='attempt',
+            name='snapshot',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='attempts', to='exams.examsnapshot', verbose_name='Версия экзамена'),
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='snapshot',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Сбрасывается при любой правке содержимого и собирается заново при публикации или первом чтении.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='exams.examsnapshot', verbose_name='Текущий снимок'),
+        ),
+    ]
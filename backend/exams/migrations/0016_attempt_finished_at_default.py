@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0015_exam_snapshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attempt',
+            name='finished_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Окончание прохождения'),
+        ),
+    ]
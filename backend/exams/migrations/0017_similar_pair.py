@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0016_attempt_finished_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shared_wrong', models.PositiveIntegerField(verbose_name='Общих неверных ответов')),
+                ('wrong_similarity', models.FloatField(verbose_name='Сходство неверных ответов')),
+                ('agreement', models.FloatField(verbose_name='Совпадение ответов')),
+                ('score', models.FloatField(help_text='Сумма редкости общих неверных ответов: чем выше, тем подозрительнее', verbose_name='Оценка')),
+                ('detected_at', models.DateTimeField(auto_now_add=True, verbose_name='Найдено')),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_pairs', to='exams.exam', verbose_name='Экзамен')),
+                ('first_attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exams.attempt', verbose_name='Попытка 1')),
+                ('second_attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exams.attempt', verbose_name='Попытка 2')),
+            ],
+            options={
+                'verbose_name': 'Похожие ответы',
+                'verbose_name_plural': 'Похожие ответы',
+                'ordering': ['-score'],
+                'unique_together': {('first_attempt', 'second_attempt')},
+            },
+        ),
+    ]
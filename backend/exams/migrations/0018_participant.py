@@ -0,0 +1,132 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+from exams.participants import normalize
+
+# Написание имени -> участник на время заполнения: ключ считается в Python (NFKC + casefold),
+# а сами таблицы обновляются одним UPDATE с подзапросом к этой таблице.
+SPELLINGS_TABLE = 'exams_participant_spelling_tmp'
+
+
+def backfill_participants(apps, schema_editor):
+    Participant = apps.get_model('exams', 'Participant')
+    Attempt = apps.get_model('exams', 'Attempt')
+    ArchivedAttemptStat = apps.get_model('exams', 'ArchivedAttemptStat')
+    ReviewItem = apps.get_model('exams', 'ReviewItem')
+    SprintResult = apps.get_model('exams', 'SprintResult')
+    named_models = (Attempt, ArchivedAttemptStat, ReviewItem, SprintResult)
+
+    # Написания одного ключа сливаются в одного участника; имя — самое частое написание.
+    spellings = {}
+    for model in named_models:
+        for row in model.objects.values('user_name').annotate(total=Count('id')).order_by():
+            counts = spellings.setdefault(normalize(row['user_name']), {})
+            counts[row['user_name']] = counts.get(row['user_name'], 0) + row['total']
+    Participant.objects.bulk_create(
+        [
+            Participant(key=key, name=max(sorted(counts), key=counts.get)[:100])
+            for key, counts in spellings.items()
+        ],
+        batch_size=1000,
+    )
+
+    ids = dict(Participant.objects.values_list('key', 'id'))
+    rows = [(name, ids[key]) for key, counts in spellings.items() for name in counts]
+    quote = schema_editor.connection.ops.quote_name
+    table = quote(SPELLINGS_TABLE)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'CREATE TEMPORARY TABLE {table} (user_name varchar(100) NOT NULL, participant_id bigint NOT NULL)')
+        for start in range(0, len(rows), 1000):
+            cursor.executemany(
+                f'INSERT INTO {table} (user_name, participant_id) VALUES (%s, %s)', rows[start:start + 1000]
+            )
+        cursor.execute(f'CREATE INDEX {quote(SPELLINGS_TABLE + "_name")} ON {table} (user_name)')
+        for model in named_models:
+            target = quote(model._meta.db_table)
+            cursor.execute(
+                f'UPDATE {target} SET participant_id = ('
+                f'SELECT MIN(spelling.participant_id) FROM {table} spelling WHERE spelling.user_name = {target}.user_name)'
+            )
+        cursor.execute(f'DROP TABLE {table}')
+
+    # Очередь повторения станет уникальной по (participant, question): из записей разных написаний
+    # остается последняя повторенная, ошибки складываются.
+    duplicates = (
+        ReviewItem.objects.values('participant_id', 'question_id')
+        .annotate(rows=Count('id'), lapses=Sum('lapses'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in duplicates:
+        rows = ReviewItem.objects.filter(participant_id=group['participant_id'], question_id=group['question_id'])
+        keep = rows.order_by('-last_reviewed_at', '-id').first()
+        rows.exclude(id=keep.id).delete()
+        ReviewItem.objects.filter(id=keep.id).update(lapses=group['lapses'])
+
+    # Архивная статистика станет уникальной по (exam, participant): дубли складываются в одну строку.
+    duplicates = (
+        ArchivedAttemptStat.objects.values('exam_id', 'participant_id')
+        .annotate(rows=Count('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in duplicates:
+        rows = ArchivedAttemptStat.objects.filter(exam_id=group['exam_id'], participant_id=group['participant_id'])
+        totals = rows.aggregate(
+            attempts_count=Sum('attempts_count'),
+            best_score=Max('best_score'),
+            score_sum=Sum('score_sum'),
+            duration_sum=Sum('duration_sum'),
+            archived_until=Max('archived_until'),
+        )
+        keep = rows.order_by('-attempts_count', 'id').first()
+        rows.exclude(id=keep.id).delete()
+        ArchivedAttemptStat.objects.filter(id=keep.id).update(**totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0017_similar_pair'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Participant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='Ключ')),
+                ('name', models.CharField(max_length=100, verbose_name='Имя')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+            ],
+            options={
+                'verbose_name': 'Участник',
+                'verbose_name_plural': 'Участники',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='archivedattemptstat',
+            name='participant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_stats', to='exams.participant', verbose_name='Участник'),
+        ),
+        migrations.AddField(
+            model_name='attempt',
+            name='participant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='attempts', to='exams.participant', verbose_name='Участник'),
+        ),
+        migrations.AddField(
+            model_name='reviewitem',
+            name='participant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='review_items', to='exams.participant', verbose_name='Участник'),
+        ),
+        migrations.AddField(
+            model_name='sprintresult',
+            name='participant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sprint_results', to='exams.participant', verbose_name='Участник'),
+        ),
+        migrations.RunPython(backfill_participants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0018_participant'),
+    ]
+
+    operations = [
+        # Индекс по user_name снимается после заполнения participant в 0018.
+        migrations.AlterField(
+            model_name='attempt',
+            name='user_name',
+            field=models.CharField(max_length=100, verbose_name='Имя пользователя'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='archivedattemptstat',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='archivedattemptstat',
+            name='participant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_stats', to='exams.participant', verbose_name='Участник'),
+        ),
+        migrations.AlterField(
+            model_name='attempt',
+            name='participant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='attempts', to='exams.participant', verbose_name='Участник'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='archivedattemptstat',
+            unique_together={('exam', 'participant')},
+        ),
+        migrations.AlterField(
+            model_name='reviewitem',
+            name='participant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='review_items', to='exams.participant', verbose_name='Участник'),
+        ),
+        migrations.AlterField(
+            model_name='sprintresult',
+            name='participant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='sprint_results', to='exams.participant', verbose_name='Участник'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='reviewitem',
+            unique_together={('participant', 'question')},
+        ),
+        migrations.RemoveIndex(
+            model_name='reviewitem',
+            name='exams_review_due_idx',
+        ),
+        migrations.AddIndex(
+            model_name='reviewitem',
+            index=models.Index(fields=['participant', 'due_at'], name='exams_review_due_idx'),
+        ),
+    ]
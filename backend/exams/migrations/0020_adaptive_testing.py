@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0019_participant_required'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='ability',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Оценка уровня'),
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='adaptive_max_questions',
+            field=models.PositiveIntegerField(default=20, verbose_name='Макс. вопросов в адаптивном режиме'),
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='adaptive_target_se',
+            field=models.FloatField(default=0.3, help_text='Адаптивная попытка заканчивается, когда стандартная ошибка оценки уровня не больше этого значения.', verbose_name='Точность оценки уровня'),
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='is_adaptive',
+            field=models.BooleanField(default=False, help_text='Вопросы выдаются по одному под текущую оценку уровня участника (/adaptive/ в API).', verbose_name='Адаптивный режим'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='irt_difficulty',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Трудность (b)'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='irt_discrimination',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Дискриминативность (a)'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from exams import duplicates
+
+
+def build_index(apps, schema_editor):
+    duplicates.rebuild(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0020_adaptive_testing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField(verbose_name='Сходство с первым вопросом')),
+                ('detected_at', models.DateTimeField(auto_now_add=True, verbose_name='Найдено')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exams.question', verbose_name='Вопрос')),
+                ('representative', models.ForeignKey(help_text='Первый вопрос кластера', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exams.question', verbose_name='Кластер')),
+            ],
+            options={
+                'verbose_name': 'Почти одинаковый вопрос',
+                'verbose_name_plural': 'Почти одинаковые вопросы',
+                'ordering': ['representative_id', 'question_id'],
+                'unique_together': {('representative', 'question')},
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='exams.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'bucket'], name='exams_qband_bucket_idx')],
+                'unique_together': {('question', 'band')},
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
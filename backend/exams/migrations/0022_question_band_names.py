@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0021_duplicate_questions'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='questionband',
+            options={'verbose_name': 'Полоса MinHash вопроса', 'verbose_name_plural': 'Полосы MinHash вопросов'},
+        ),
+    ]
@@ -0,0 +1,135 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+from django.db import migrations, models
+
+
+def copy_histograms(apps, schema_editor):
+    # Гистограммы из JSON-списков переносятся в счетчики корзин.
+    ExamDailyStat = apps.get_model('exams', 'ExamDailyStat')
+    stats = []
+    for stat in ExamDailyStat.objects.only('id', 'score_histogram', 'duration_histogram').iterator(chunk_size=1000):
+        for prefix, values in (('score', stat.score_histogram), ('duration', stat.duration_histogram)):
+            for index, value in enumerate((values or [])[:10]):
+                setattr(stat, f'{prefix}_{index}', value)
+        stats.append(stat)
+    fields = [f'score_{index}' for index in range(10)] + [f'duration_{index}' for index in range(10)]
+    ExamDailyStat.objects.bulk_update(stats, fields, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0022_question_band_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examdailystat',
+            name='duration_0',
+            field=models.PositiveIntegerField(default=0, verbose_name='Время < 1 мин'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='duration_1',
+            field=models.PositiveIntegerField(default=0, verbose_name='Время 1–2 мин'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='duration_2',
+            field=models.PositiveIntegerField(default=0, verbose_name='Время 2–5 мин'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='duration_3',
+            field=models.PositiveIntegerField(default=0, verbose_name='Время 5–10 мин'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='duration_4',
+            field=models.PositiveIntegerField(default=0, verbose_name='Время 10–15 мин'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='duration_5',
+            field=models.PositiveIntegerField(default=0, verbose_name='Время 15–20 мин'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='duration_6',
+            field=models.PositiveIntegerField(default=0, verbose_name='Время 20–30 мин'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='duration_7',
+            field=models.PositiveIntegerField(default=0, verbose_name='Время 30–45 мин'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='duration_8',
+            field=models.PositiveIntegerField(default=0, verbose_name='Время 45–60 мин'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='duration_9',
+            field=models.PositiveIntegerField(default=0, verbose_name='Время ≥ 60 мин'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='score_0',
+            field=models.PositiveIntegerField(default=0, verbose_name='Результат 0–9%'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='score_1',
+            field=models.PositiveIntegerField(default=0, verbose_name='Результат 10–19%'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='score_2',
+            field=models.PositiveIntegerField(default=0, verbose_name='Результат 20–29%'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='score_3',
+            field=models.PositiveIntegerField(default=0, verbose_name='Результат 30–39%'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='score_4',
+            field=models.PositiveIntegerField(default=0, verbose_name='Результат 40–49%'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='score_5',
+            field=models.PositiveIntegerField(default=0, verbose_name='Результат 50–59%'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='score_6',
+            field=models.PositiveIntegerField(default=0, verbose_name='Результат 60–69%'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='score_7',
+            field=models.PositiveIntegerField(default=0, verbose_name='Результат 70–79%'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='score_8',
+            field=models.PositiveIntegerField(default=0, verbose_name='Результат 80–89%'),
+        ),
+        migrations.AddField(
+            model_name='examdailystat',
+            name='score_9',
+            field=models.PositiveIntegerField(default=0, verbose_name='Результат 90–100%'),
+        ),
+        migrations.RunPython(copy_histograms, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='examdailystat',
+            name='duration_histogram',
+        ),
+        migrations.RemoveField(
+            model_name='examdailystat',
+            name='score_histogram',
+        ),
+    ]
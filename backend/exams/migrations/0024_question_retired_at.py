@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0023_daily_stat_bucket_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='retired_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Снят с экзамена'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19
+
+from django.db import migrations, models
+
+
+def mark_existing_finished(apps, schema_editor):
+    # Результаты до серверного счета уже сохранялись завершенными.
+    apps.get_model('exams', 'SprintResult').objects.update(is_finished=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0024_question_retired_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sprintresult',
+            name='is_finished',
+            field=models.BooleanField(default=False, verbose_name='Завершен'),
+        ),
+        migrations.AlterField(
+            model_name='sprintresult',
+            name='score',
+            field=models.PositiveIntegerField(default=0, verbose_name='Верных ответов'),
+        ),
+        migrations.AlterField(
+            model_name='sprintresult',
+            name='total',
+            field=models.PositiveIntegerField(default=0, verbose_name='Всего ответов'),
+        ),
+        migrations.RunPython(mark_existing_finished, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,11 @@
-﻿from django.db import models, transaction
+﻿import json
+import zlib
+
+from django.db import models, transaction
 from django.db.models import F
+from django.utils import timezone
+
+from .packing import pack_answers, pack_flags, unpack_answers, unpack_flags
 
 
 class Exam(models.Model):
@@ -16,6 +22,27 @@ class Exam(models.Model):
     )
     passing_score = models.PositiveIntegerField('Порог прохождения (%)', default=70)
     is_active = models.BooleanField('Активен', default=True)
+    is_adaptive = models.BooleanField(
+        'Адаптивный режим',
+        default=False,
+        help_text='Вопросы выдаются по одному под текущую оценку уровня участника (/adaptive/ в API).',
+    )
+    adaptive_max_questions = models.PositiveIntegerField('Макс. вопросов в адаптивном режиме', default=20)
+    adaptive_target_se = models.FloatField(
+        'Точность оценки уровня',
+        default=0.3,
+        help_text='Адаптивная попытка заканчивается, когда стандартная ошибка оценки уровня не больше этого значения.',
+    )
+    snapshot = models.ForeignKey(
+        'ExamSnapshot',
+        verbose_name='Текущий снимок',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+        help_text='Сбрасывается при любой правке содержимого и собирается заново при публикации или первом чтении.',
+    )
     created_at = models.DateTimeField('Создан', auto_now_add=True)
     updated_at = models.DateTimeField('Обновлен', auto_now=True)
 
@@ -41,6 +68,13 @@ class Exam(models.Model):
         return max(1, (seconds + 59) // 60)
 
 
+class QuestionManager(models.Manager):
+    # Снятые с экзамена версии вопросов остаются только ради истории попыток: по умолчанию их не видно
+    # ни в экзамене (exam.questions), ни в каталоге, поиске и тренировках. Для истории — Question.all_objects.
+    def get_queryset(self):
+        return super().get_queryset().filter(retired_at__isnull=True)
+
+
 class Question(models.Model):
     DIFFICULTY_CHOICES = [
         ('easy', 'Легкий'),
@@ -56,6 +90,13 @@ class Question(models.Model):
     score_value = models.PositiveIntegerField('Баллы за вопрос', default=1)
     time_limit_sec = models.PositiveIntegerField('Время на вопрос (сек)', null=True, blank=True)
     order = models.PositiveIntegerField('Порядок', default=1)
+    # Параметры модели 2PL для адаптивного режима; заполняет calibrate_items по истории ответов.
+    irt_discrimination = models.FloatField('Дискриминативность (a)', null=True, blank=True, editable=False)
+    irt_difficulty = models.FloatField('Трудность (b)', null=True, blank=True, editable=False)
+    retired_at = models.DateTimeField('Снят с экзамена', null=True, blank=True, editable=False)
+
+    objects = QuestionManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['exam_id', 'order', 'id']
@@ -147,26 +188,116 @@ class Option(models.Model):
         return self.text
 
 
+class ExamSnapshot(models.Model):
+    """Неизменяемая версия опубликованного экзамена: условия, варианты и ключ ответов одним блобом."""
+
+    exam = models.ForeignKey(Exam, verbose_name='Экзамен', on_delete=models.CASCADE, related_name='snapshots')
+    version = models.CharField('Версия', max_length=16)
+    content = models.BinaryField('Содержимое (JSON, zlib)', editable=False)
+    created_at = models.DateTimeField('Создан', auto_now_add=True)
+
+    class Meta:
+        unique_together = ('exam', 'version')
+        ordering = ['-created_at']
+        verbose_name = 'Снимок экзамена'
+        verbose_name_plural = 'Снимки экзаменов'
+
+    def __str__(self) -> str:
+        return f'{self.exam_id} / {self.version}'
+
+    @property
+    def document(self) -> dict:
+        return json.loads(zlib.decompress(bytes(self.content)))
+
+
+class Participant(models.Model):
+    # Один человек под разными написаниями имени: ключ — нормализованное имя (participants.normalize),
+    # name — написание при первой попытке.
+    key = models.CharField('Ключ', max_length=100, unique=True)
+    name = models.CharField('Имя', max_length=100)
+    created_at = models.DateTimeField('Создан', auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Участник'
+        verbose_name_plural = 'Участники'
+
+    def __str__(self) -> str:
+        return self.name
+
+
 class Attempt(models.Model):
     exam = models.ForeignKey(Exam, verbose_name='Экзамен', on_delete=models.PROTECT, related_name='attempts')
-    user_name = models.CharField('Имя пользователя', max_length=100, db_index=True)
+    snapshot = models.ForeignKey(
+        ExamSnapshot,
+        verbose_name='Версия экзамена',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='attempts',
+    )
+    participant = models.ForeignKey(
+        Participant, verbose_name='Участник', on_delete=models.PROTECT, related_name='attempts'
+    )
+    # Имя как введено в этой попытке; группировка и фильтры — по participant.
+    user_name = models.CharField('Имя пользователя', max_length=100)
     started_at = models.DateTimeField('Начало прохождения')
-    finished_at = models.DateTimeField('Окончание прохождения', auto_now_add=True)
+    # Не auto_now_add: попытки, загруженные пакетом с киосков, сохраняют свое время окончания.
+    finished_at = models.DateTimeField('Окончание прохождения', default=timezone.now, editable=False)
     score = models.PositiveIntegerField('Результат (%)')
     scoring_points = models.PositiveIntegerField('Скоринговый балл', default=0)
     max_scoring_points = models.PositiveIntegerField('Макс. скоринговый балл', default=0)
     correct_count = models.PositiveIntegerField('Правильных ответов')
     total_questions = models.PositiveIntegerField('Всего вопросов')
     duration_seconds = models.PositiveIntegerField('Время (сек)', default=0)
+    # Только у адаптивных попыток: оценка уровня (тета) по ответам, score — ее процентиль.
+    ability = models.FloatField('Оценка уровня', null=True, blank=True, editable=False)
+    submission_key = models.CharField(
+        'Ключ отправки',
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Генерируется клиентом; повторная отправка с тем же ключом не создает новую попытку.',
+    )
+    answers_packed = models.BinaryField('Ответы (упаковано)', null=True, blank=True, editable=False)
+    correct_mask = models.BinaryField('Маска верных ответов', null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['-finished_at']
+        indexes = [models.Index(fields=['finished_at'], name='exams_attempt_finished_idx')]
         verbose_name = 'Попытка'
         verbose_name_plural = 'Попытки'
 
     def __str__(self) -> str:
         return f'{self.user_name} - {self.exam.title} ({self.score}%)'
 
+    @property
+    def is_packed(self) -> bool:
+        return self.answers_packed is not None
+
+    def set_packed_answers(self, answers) -> None:
+        answers = list(answers)
+        self.answers_packed = pack_answers((answer.question_id, answer.selected_option_id) for answer in answers)
+        self.correct_mask = pack_flags(answer.is_correct for answer in answers)
+
+    def answer_records(self) -> list['AttemptAnswer']:
+        if not self.is_packed:
+            return list(self.answers.all())
+        pairs = unpack_answers(self.answers_packed)
+        flags = unpack_flags(self.correct_mask, len(pairs))
+        return [
+            AttemptAnswer(
+                attempt=self,
+                question_id=question_id,
+                selected_option_id=option_id,
+                is_correct=is_correct,
+            )
+            for (question_id, option_id), is_correct in zip(pairs, flags)
+        ]
+
 
 class AttemptAnswer(models.Model):
     attempt = models.ForeignKey(Attempt, verbose_name='Попытка', on_delete=models.CASCADE, related_name='answers')
@@ -188,3 +319,210 @@ class AttemptAnswer(models.Model):
     def __str__(self) -> str:
         return f'Попытка {self.attempt_id} / Вопрос {self.question_id}'
 
+
+class ArchivedAttemptStat(models.Model):
+    exam = models.ForeignKey(Exam, verbose_name='Экзамен', on_delete=models.CASCADE, related_name='archived_stats')
+    participant = models.ForeignKey(
+        Participant, verbose_name='Участник', on_delete=models.PROTECT, related_name='archived_stats'
+    )
+    user_name = models.CharField('Имя пользователя', max_length=100)
+    attempts_count = models.PositiveIntegerField('Попыток', default=0)
+    best_score = models.PositiveIntegerField('Лучший результат (%)', default=0)
+    score_sum = models.PositiveBigIntegerField('Сумма результатов', default=0)
+    duration_sum = models.PositiveBigIntegerField('Суммарное время (сек)', default=0)
+    archived_until = models.DateTimeField('Архив по дату', null=True, blank=True)
+
+    class Meta:
+        unique_together = ('exam', 'participant')
+        verbose_name = 'Архивная статистика'
+        verbose_name_plural = 'Архивная статистика'
+
+    def __str__(self) -> str:
+        return f'{self.user_name} - {self.exam_id} ({self.attempts_count})'
+
+
+class BootFingerprint(models.Model):
+    name = models.CharField('Шаг запуска', max_length=100, unique=True)
+    value = models.CharField('Отпечаток', max_length=64)
+    updated_at = models.DateTimeField('Обновлен', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Отпечаток шага запуска'
+        verbose_name_plural = 'Отпечатки шагов запуска'
+
+    def __str__(self) -> str:
+        return f'{self.name}: {self.value[:12]}'
+
+
+class SprintResult(models.Model):
+    participant = models.ForeignKey(
+        Participant, verbose_name='Участник', on_delete=models.PROTECT, related_name='sprint_results'
+    )
+    user_name = models.CharField('Имя пользователя', max_length=100, db_index=True)
+    subject = models.CharField('Направление', max_length=100, blank=True)
+    # Счет ведет сервер при проверке ответов (sprint.py); в рейтинг попадают только завершенные спринты.
+    score = models.PositiveIntegerField('Верных ответов', default=0)
+    total = models.PositiveIntegerField('Всего ответов', default=0)
+    is_finished = models.BooleanField('Завершен', default=False)
+    started_at = models.DateTimeField('Начало')
+    finished_at = models.DateTimeField('Окончание', auto_now_add=True)
+
+    class Meta:
+        ordering = ['-score', '-total', 'finished_at']
+        indexes = [models.Index(fields=['-score', '-total'], name='exams_sprint_rank_idx')]
+        verbose_name = 'Результат спринта'
+        verbose_name_plural = 'Результаты спринта'
+
+    def __str__(self) -> str:
+        return f'{self.user_name}: {self.score}/{self.total}'
+
+
+class ReviewItem(models.Model):
+    # Очередь одна на участника при любом написании имени; user_name — написание при первой ошибке.
+    participant = models.ForeignKey(
+        Participant, verbose_name='Участник', on_delete=models.PROTECT, related_name='review_items'
+    )
+    user_name = models.CharField('Имя пользователя', max_length=100)
+    question = models.ForeignKey(Question, verbose_name='Вопрос', on_delete=models.CASCADE, related_name='review_items')
+    due_at = models.DateTimeField('Повторить после')
+    interval_days = models.FloatField('Интервал (дн)', default=0)
+    ease = models.FloatField('Легкость', default=2.5)
+    repetitions = models.PositiveIntegerField('Верных подряд', default=0)
+    lapses = models.PositiveIntegerField('Ошибок', default=0)
+    last_reviewed_at = models.DateTimeField('Последнее повторение')
+
+    class Meta:
+        unique_together = ('participant', 'question')
+        indexes = [models.Index(fields=['participant', 'due_at'], name='exams_review_due_idx')]
+        verbose_name = 'Вопрос на повторение'
+        verbose_name_plural = 'Очередь повторения'
+
+    def __str__(self) -> str:
+        return f'{self.user_name} / Вопрос {self.question_id}'
+
+
+# Корзины гистограмм — отдельные счетчики: отправка прибавляет к ним F() одним UPDATE (см. rollups.py).
+SCORE_BUCKET_FIELDS = tuple(f'score_{index}' for index in range(10))
+DURATION_BUCKET_FIELDS = tuple(f'duration_{index}' for index in range(10))
+
+
+class ExamDailyStat(models.Model):
+    exam = models.ForeignKey(Exam, verbose_name='Экзамен', on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField('День')
+    attempts_count = models.PositiveIntegerField('Попыток', default=0)
+    passed_count = models.PositiveIntegerField('Сдано', default=0)
+    score_sum = models.PositiveBigIntegerField('Сумма результатов', default=0)
+    duration_sum = models.PositiveBigIntegerField('Суммарное время (сек)', default=0)
+    score_0 = models.PositiveIntegerField('Результат 0–9%', default=0)
+    score_1 = models.PositiveIntegerField('Результат 10–19%', default=0)
+    score_2 = models.PositiveIntegerField('Результат 20–29%', default=0)
+    score_3 = models.PositiveIntegerField('Результат 30–39%', default=0)
+    score_4 = models.PositiveIntegerField('Результат 40–49%', default=0)
+    score_5 = models.PositiveIntegerField('Результат 50–59%', default=0)
+    score_6 = models.PositiveIntegerField('Результат 60–69%', default=0)
+    score_7 = models.PositiveIntegerField('Результат 70–79%', default=0)
+    score_8 = models.PositiveIntegerField('Результат 80–89%', default=0)
+    score_9 = models.PositiveIntegerField('Результат 90–100%', default=0)
+    duration_0 = models.PositiveIntegerField('Время < 1 мин', default=0)
+    duration_1 = models.PositiveIntegerField('Время 1–2 мин', default=0)
+    duration_2 = models.PositiveIntegerField('Время 2–5 мин', default=0)
+    duration_3 = models.PositiveIntegerField('Время 5–10 мин', default=0)
+    duration_4 = models.PositiveIntegerField('Время 10–15 мин', default=0)
+    duration_5 = models.PositiveIntegerField('Время 15–20 мин', default=0)
+    duration_6 = models.PositiveIntegerField('Время 20–30 мин', default=0)
+    duration_7 = models.PositiveIntegerField('Время 30–45 мин', default=0)
+    duration_8 = models.PositiveIntegerField('Время 45–60 мин', default=0)
+    duration_9 = models.PositiveIntegerField('Время ≥ 60 мин', default=0)
+
+    class Meta:
+        unique_together = ('exam', 'day')
+        ordering = ['-day']
+        verbose_name = 'Статистика экзамена за день'
+        verbose_name_plural = 'Статистика экзаменов по дням'
+
+    def __str__(self) -> str:
+        return f'{self.exam_id} / {self.day} ({self.attempts_count})'
+
+    @property
+    def score_histogram(self) -> list[int]:
+        return [getattr(self, field) for field in SCORE_BUCKET_FIELDS]
+
+    @property
+    def duration_histogram(self) -> list[int]:
+        return [getattr(self, field) for field in DURATION_BUCKET_FIELDS]
+
+
+class RescoreRun(models.Model):
+    exam = models.ForeignKey(Exam, verbose_name='Экзамен', on_delete=models.CASCADE, related_name='rescore_runs')
+    max_attempt_id = models.PositiveBigIntegerField('Последняя попытка на старте', default=0)
+    last_attempt_id = models.PositiveBigIntegerField('Обработано до попытки', default=0)
+    changed_answers = models.PositiveIntegerField('Изменено ответов', default=0)
+    changed_attempts = models.PositiveIntegerField('Изменено попыток', default=0)
+    started_at = models.DateTimeField('Начало', auto_now_add=True)
+    updated_at = models.DateTimeField('Обновлено', auto_now=True)
+    finished_at = models.DateTimeField('Завершено', null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = 'Пересчет результатов'
+        verbose_name_plural = 'Пересчеты результатов'
+
+    def __str__(self) -> str:
+        return f'{self.exam_id}: {self.last_attempt_id}/{self.max_attempt_id}'
+
+    @property
+    def progress(self) -> int:
+        if self.finished_at or not self.max_attempt_id:
+            return 100
+        return min(99, self.last_attempt_id * 100 // self.max_attempt_id)
+
+
+class SimilarPair(models.Model):
+    exam = models.ForeignKey(Exam, verbose_name='Экзамен', on_delete=models.CASCADE, related_name='similar_pairs')
+    first_attempt = models.ForeignKey(Attempt, verbose_name='Попытка 1', on_delete=models.CASCADE, related_name='+')
+    second_attempt = models.ForeignKey(Attempt, verbose_name='Попытка 2', on_delete=models.CASCADE, related_name='+')
+    shared_wrong = models.PositiveIntegerField('Общих неверных ответов')
+    wrong_similarity = models.FloatField('Сходство неверных ответов')
+    agreement = models.FloatField('Совпадение ответов')
+    score = models.FloatField('Оценка', help_text='Сумма редкости общих неверных ответов: чем выше, тем подозрительнее')
+    detected_at = models.DateTimeField('Найдено', auto_now_add=True)
+
+    class Meta:
+        ordering = ['-score']
+        unique_together = ('first_attempt', 'second_attempt')
+        verbose_name = 'Похожие ответы'
+        verbose_name_plural = 'Похожие ответы'
+
+    def __str__(self) -> str:
+        return f'{self.first_attempt_id} ~ {self.second_attempt_id} ({self.score})'
+
+
+class QuestionBand(models.Model):
+    # Индекс LSH для поиска почти одинаковых вопросов (duplicates.py): корзина вопроса в каждой полосе MinHash-подписи.
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='+')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ('question', 'band')
+        indexes = [models.Index(fields=['band', 'bucket'], name='exams_qband_bucket_idx')]
+        verbose_name = 'Полоса MinHash вопроса'
+        verbose_name_plural = 'Полосы MinHash вопросов'
+
+
+class DuplicateQuestion(models.Model):
+    representative = models.ForeignKey(
+        Question, verbose_name='Кластер', on_delete=models.CASCADE, related_name='+', help_text='Первый вопрос кластера'
+    )
+    question = models.ForeignKey(Question, verbose_name='Вопрос', on_delete=models.CASCADE, related_name='+')
+    similarity = models.FloatField('Сходство с первым вопросом')
+    detected_at = models.DateTimeField('Найдено', auto_now_add=True)
+
+    class Meta:
+        ordering = ['representative_id', 'question_id']
+        unique_together = ('representative', 'question')
+        verbose_name = 'Почти одинаковый вопрос'
+        verbose_name_plural = 'Почти одинаковые вопросы'
+
+    def __str__(self) -> str:
+        return f'{self.representative_id} ~ {self.question_id} ({self.similarity})'
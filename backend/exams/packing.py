@@ -0,0 +1,45 @@
+from array import array
+import sys
+
+# Формат упакованных ответов: 1 байт ширины id (4 или 8), затем пары
+# (question_id, option_id) little-endian; option_id = 0 означает «не выбран».
+_TYPECODES = {4: 'I', 8: 'Q'}
+_UINT32_MAX = 2**32 - 1
+
+
+def pack_answers(pairs) -> bytes:
+    flat = array('Q')
+    for question_id, option_id in pairs:
+        flat.append(question_id)
+        flat.append(option_id or 0)
+
+    width = 4 if not flat or max(flat) <= _UINT32_MAX else 8
+    packed = array(_TYPECODES[width], flat)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return bytes([width]) + packed.tobytes()
+
+
+def unpack_answers(blob) -> list[tuple[int, int | None]]:
+    blob = bytes(blob or b'')
+    if not blob:
+        return []
+    values = array(_TYPECODES[blob[0]])
+    values.frombytes(blob[1:])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return [(values[i], values[i + 1] or None) for i in range(0, len(values), 2)]
+
+
+def pack_flags(flags) -> bytes:
+    flags = list(flags)
+    mask = bytearray((len(flags) + 7) // 8)
+    for index, flag in enumerate(flags):
+        if flag:
+            mask[index >> 3] |= 1 << (index & 7)
+    return bytes(mask)
+
+
+def unpack_flags(blob, count: int) -> list[bool]:
+    mask = bytes(blob or b'')
+    return [bool(mask[i >> 3] & (1 << (i & 7))) if (i >> 3) < len(mask) else False for i in range(count)]
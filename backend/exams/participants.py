@@ -0,0 +1,103 @@
+import threading
+import unicodedata
+
+from .db import run_write
+from .models import Participant
+
+# Участник — один человек под разными написаниями имени («Иван Петров», «иван  петров»):
+# попытки ссылаются на него целым ключом, по нему идут рейтинги и фильтры. Ключ -> id
+# кэшируется в процессе: участники только добавляются (Attempt.participant — PROTECT).
+MAX_CACHED = 100_000
+
+_lock = threading.Lock()
+_ids: dict[str, int] = {}
+_names: dict[int, str] = {}
+
+
+def normalize(name: str) -> str:
+    """Ключ участника: NFKC, без учета регистра, пробелы схлопнуты."""
+    return ' '.join(unicodedata.normalize('NFKC', name).casefold().split())[:100]
+
+
+def _remember(rows) -> None:
+    with _lock:
+        if len(_ids) >= MAX_CACHED:
+            _ids.clear()
+            _names.clear()
+        for key, participant_id, name in rows:
+            _ids[key] = participant_id
+            _names[participant_id] = name
+
+
+def clear_cache() -> None:
+    with _lock:
+        _ids.clear()
+        _names.clear()
+
+
+def _fetch(keys) -> list[tuple[str, int, str]]:
+    return list(Participant.objects.filter(key__in=keys).values_list('key', 'id', 'name'))
+
+
+def _create(new: dict[str, str]) -> None:
+    # Параллельная отправка могла создать того же участника: конфликт по ключу не ошибка.
+    Participant.objects.bulk_create([Participant(key=key, name=name) for key, name in new.items()], ignore_conflicts=True)
+
+
+def resolve_many(names) -> dict[str, int]:
+    """Имя как введено -> id участника, недостающие участники создаются.
+
+    Вызывается до транзакции записи попыток: в кэш попадают только зафиксированные id.
+    """
+    keys = {name: normalize(name) for name in names}
+    found = {}
+    missing = {}
+    for name, key in keys.items():
+        participant_id = _ids.get(key)
+        if participant_id is None:
+            missing.setdefault(key, name[:100])
+        else:
+            found[key] = participant_id
+    if missing:
+        rows = _fetch(missing)
+        known = {row[0] for row in rows}
+        new = {key: name for key, name in missing.items() if key not in known}
+        if new:
+            run_write(_create, new)
+            rows += _fetch(new)
+        _remember(rows)
+        found.update((key, participant_id) for key, participant_id, _ in rows)
+    return {name: found[key] for name, key in keys.items()}
+
+
+def resolve(name: str) -> int:
+    return resolve_many([name])[name]
+
+
+def lookup(name: str) -> int | None:
+    """id участника по имени без создания: для фильтров и поиска в рейтинге."""
+    key = normalize(name)
+    participant_id = _ids.get(key)
+    if participant_id is None:
+        rows = _fetch([key])
+        if not rows:
+            return None
+        _remember(rows)
+        participant_id = rows[0][1]
+    return participant_id
+
+
+def display_names(participant_ids) -> dict[int, str]:
+    names = {}
+    missing = []
+    for participant_id in participant_ids:
+        name = _names.get(participant_id)
+        if name is None:
+            missing.append(participant_id)
+        else:
+            names[participant_id] = name
+    if missing:
+        rows = list(Participant.objects.filter(id__in=missing).values_list('key', 'id', 'name'))
+        _remember(rows)
+        names.update((participant_id, name) for _, participant_id, name in rows)
+    return names
@@ -0,0 +1,224 @@
+from django.db import connection
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from . import rollups, search
+from .catalog import catalog
+from .db import run_write
+from .export import attempt_queryset
+from .models import (
+    ArchivedAttemptStat,
+    Attempt,
+    AttemptAnswer,
+    BootFingerprint,
+    DuplicateQuestion,
+    Exam,
+    ExamDailyStat,
+    ExamSnapshot,
+    Option,
+    Question,
+    QuestionBand,
+    RescoreRun,
+    ReviewItem,
+    SimilarPair,
+)
+from .ranking import PURGE_FINGERPRINT, leaderboard
+
+# Массовое удаление попыток и экзаменов без сборщика Django: QuerySet.delete() загружает
+# каждую связанную строку (ответы, вопросы, варианты) ради каскада и сигналов. Здесь таблицы
+# очищаются в порядке зависимостей запросами DELETE по условию, частями по диапазонам id
+# родителя; каждый диапазон — отдельная короткая транзакция, память не растет с объемом.
+# Полная очистка в PostgreSQL — один TRUNCATE. Участники не удаляются: это справочник людей,
+# а не данные экзаменов.
+DEFAULT_CHUNK_SIZE = 2000
+
+# Порядок полной очистки: зависимые таблицы раньше тех, на которые они ссылаются.
+EXAM_TABLES = (
+    SimilarPair,
+    AttemptAnswer,
+    Attempt,
+    ArchivedAttemptStat,
+    ExamDailyStat,
+    RescoreRun,
+    ReviewItem,
+    QuestionBand,
+    DuplicateQuestion,
+    Option,
+    Question,
+    ExamSnapshot,
+    Exam,
+)
+
+
+def label(model) -> str:
+    return str(model._meta.verbose_name_plural)
+
+
+def _raw_delete(queryset) -> int:
+    # Один DELETE по условию queryset: без чтения строк, каскада и сигналов.
+    queryset = queryset.order_by()
+    return queryset._raw_delete(queryset.db)
+
+
+def _ranges(queryset, chunk_size: int):
+    """Диапазоны [low, high] id по chunk_size; пустые промежутки id пропускаются."""
+    ids = queryset.order_by('id').values_list('id', flat=True)
+    low = ids.first()
+    while low is not None:
+        high = low + chunk_size - 1
+        yield low, high
+        low = ids.filter(id__gt=high).first()
+
+
+def _add(totals: dict, counts: dict, progress) -> None:
+    for name, count in counts.items():
+        totals[name] = totals.get(name, 0) + count
+    if progress is not None:
+        progress(totals)
+
+
+def _delete_attempt_range(attempts, low: int, high: int) -> dict:
+    chunk = attempts.filter(id__gte=low, id__lte=high)
+    ids = chunk.values('id')
+    return {
+        label(SimilarPair): _raw_delete(
+            SimilarPair.objects.filter(Q(first_attempt__in=ids) | Q(second_attempt__in=ids))
+        ),
+        label(AttemptAnswer): _raw_delete(AttemptAnswer.objects.filter(attempt__in=ids)),
+        # Сама таблица — без подзапроса к себе же: MySQL такой DELETE не выполняет.
+        label(Attempt): _raw_delete(chunk),
+    }
+
+
+def _delete_question_range(questions, low: int, high: int) -> dict:
+    chunk = questions.filter(id__gte=low, id__lte=high)
+    ids = chunk.values('id')
+    counts = {
+        label(ReviewItem): _raw_delete(ReviewItem.objects.filter(question__in=ids)),
+        label(QuestionBand): _raw_delete(QuestionBand.objects.filter(question__in=ids)),
+        label(DuplicateQuestion): _raw_delete(
+            DuplicateQuestion.objects.filter(Q(representative__in=ids) | Q(question__in=ids))
+        ),
+        label(Option): _raw_delete(Option.objects.filter(question__in=ids)),
+    }
+    # Строки индекса поиска в PostgreSQL удаляет ON DELETE CASCADE, FTS5 в SQLite чистится заранее по экзамену.
+    counts[label(Question)] = _raw_delete(chunk)
+    return counts
+
+
+def _delete_rows(queryset, totals: dict, progress, chunk_size: int) -> None:
+    name = label(queryset.model)
+    for low, high in _ranges(queryset, chunk_size):
+        _add(totals, {name: run_write(_raw_delete, queryset.filter(id__gte=low, id__lte=high))}, progress)
+
+
+def _delete_attempts(attempts, totals: dict, progress, chunk_size: int) -> None:
+    for low, high in _ranges(attempts, chunk_size):
+        _add(totals, run_write(_delete_attempt_range, attempts, low, high), progress)
+
+
+def _delete_exams(exams) -> dict:
+    exams.update(snapshot=None)
+    return {
+        label(ExamSnapshot): _raw_delete(ExamSnapshot.objects.filter(exam__in=exams.values('id'))),
+        label(Exam): _raw_delete(exams),
+    }
+
+
+def _truncate() -> dict:
+    # Без RESTART IDENTITY: id не выдаются повторно, старые ссылки в кэшах и токенах не оживут.
+    tables = [model._meta.db_table for model in EXAM_TABLES] + [search.PG_TABLE]
+    with connection.cursor() as cursor:
+        cursor.execute(f'TRUNCATE {", ".join(tables)}')
+    return {label(model): None for model in EXAM_TABLES}
+
+
+def _mark_purged() -> None:
+    # Другие воркеры не видят удаленных попыток при догоне рейтинга по id: новая отметка
+    # меняет поколение рейтинга (ranking.board_generation), и они строят его заново.
+    BootFingerprint.objects.update_or_create(
+        name=PURGE_FINGERPRINT, defaults={'value': timezone.now().isoformat()}
+    )
+
+
+def _refresh_caches() -> None:
+    run_write(_mark_purged)
+    catalog.invalidate()
+    leaderboard.rebuild()
+
+
+def _rebuild_days(exam_id: int, first, last) -> None:
+    # Дни удаленных попыток пересчитываются по оставшимся; дни без попыток удаляются.
+    _raw_delete(
+        ExamDailyStat.objects.filter(
+            exam_id=exam_id, day__gte=timezone.localdate(first), day__lte=timezone.localdate(last)
+        )
+    )
+    rollups.rebuild(exam_id)
+
+
+def count(exam_ids=None, date_from=None, date_to=None, attempts_only: bool = False) -> dict:
+    """Сколько строк основных таблиц попадет под удаление (для --dry-run)."""
+    exams = Exam.objects.all() if exam_ids is None else Exam.objects.filter(id__in=exam_ids)
+    attempts = attempt_queryset(None, date_from, date_to).filter(exam__in=exams.values('id'))
+    counts = {
+        label(Attempt): attempts.count(),
+        label(AttemptAnswer): AttemptAnswer.objects.filter(attempt__in=attempts.values('id')).count(),
+    }
+    if not attempts_only:
+        questions = Question.all_objects.filter(exam__in=exams.values('id'))
+        counts[label(Question)] = questions.count()
+        counts[label(Option)] = Option.objects.filter(question__in=questions.values('id')).count()
+        counts[label(Exam)] = exams.count()
+    return counts
+
+
+def purge_attempts(
+    exam_ids=None, date_from=None, date_to=None, chunk_size: int = DEFAULT_CHUNK_SIZE, progress=None
+) -> dict:
+    """Удаляет попытки (по экзаменам и датам окончания) с ответами и похожими парами.
+
+    Возвращает {название таблицы: удалено строк}; progress(totals) вызывается после каждого диапазона.
+    """
+    attempts = attempt_queryset(None, date_from, date_to)
+    if exam_ids is not None:
+        attempts = attempts.filter(exam_id__in=exam_ids)
+    spans = {
+        row['exam_id']: (row['first'], row['last'])
+        for row in attempts.values('exam_id').annotate(first=Min('finished_at'), last=Max('finished_at')).order_by()
+    }
+    totals = {}
+    _delete_attempts(attempts, totals, progress, chunk_size)
+    for exam_id, (first, last) in spans.items():
+        run_write(_rebuild_days, exam_id, first, last)
+    _refresh_caches()
+    return totals
+
+
+def purge_exams(exam_ids=None, chunk_size: int = DEFAULT_CHUNK_SIZE, progress=None) -> dict:
+    """Удаляет экзамены (по умолчанию все) со всеми вопросами, попытками, снимками и отчетами.
+
+    Полная очистка в PostgreSQL — TRUNCATE, тогда вместо числа строк в итогах None.
+    """
+    if exam_ids is None and connection.vendor == 'postgresql':
+        totals = run_write(_truncate)
+        if progress is not None:
+            progress(totals)
+        _refresh_caches()
+        return totals
+
+    exams = Exam.objects.all() if exam_ids is None else Exam.objects.filter(id__in=exam_ids)
+    exam_ids = list(exams.values_list('id', flat=True))
+    totals = {}
+    _delete_attempts(Attempt.objects.filter(exam_id__in=exam_ids), totals, progress, chunk_size)
+    for model in (SimilarPair, ArchivedAttemptStat, ExamDailyStat, RescoreRun):
+        _delete_rows(model.objects.filter(exam_id__in=exam_ids), totals, progress, chunk_size)
+
+    run_write(search.remove_exams, exam_ids)
+    # Вместе со снятыми с экзамена версиями вопросов.
+    questions = Question.all_objects.filter(exam_id__in=exam_ids)
+    for low, high in _ranges(questions, chunk_size):
+        _add(totals, run_write(_delete_question_range, questions, low, high), progress)
+    _add(totals, run_write(_delete_exams, Exam.objects.filter(id__in=exam_ids)), progress)
+    _refresh_caches()
+    return totals
@@ -0,0 +1,448 @@
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+
+from . import participants
+from .models import ArchivedAttemptStat, Attempt, BootFingerprint, RescoreRun
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis необязателен
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_BOARD = 'global'
+# Отметка последнего массового удаления в BootFingerprint (см. purge.py).
+PURGE_FINGERPRINT = 'purge_data'
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'span')
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.next = [None] * level
+        self.span = [0] * level
+
+
+class RankedSet:
+    """Skip list с длинами ссылок (как zset в Redis): вставка, удаление, ранг и доступ по рангу за O(log n)."""
+
+    MAX_LEVEL = 32
+    P = 0.25
+
+    def __init__(self):
+        self._head = _Node(None, self.MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+        self._random = random.Random()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVEL and self._random.random() < self.P:
+            level += 1
+        return level
+
+    def insert(self, key) -> None:
+        update = [None] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        node = self._head
+        for i in reversed(range(self._level)):
+            rank[i] = 0 if i == self._level - 1 else rank[i + 1]
+            while node.next[i] is not None and node.next[i].key < key:
+                rank[i] += node.span[i]
+                node = node.next[i]
+            update[i] = node
+
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                rank[i] = 0
+                update[i] = self._head
+                self._head.span[i] = self._size
+            self._level = level
+
+        new = _Node(key, level)
+        for i in range(level):
+            new.next[i] = update[i].next[i]
+            update[i].next[i] = new
+            new.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = rank[0] - rank[i] + 1
+        for i in range(level, self._level):
+            update[i].span[i] += 1
+        self._size += 1
+
+    def remove(self, key) -> bool:
+        update = [None] * self.MAX_LEVEL
+        node = self._head
+        for i in reversed(range(self._level)):
+            while node.next[i] is not None and node.next[i].key < key:
+                node = node.next[i]
+            update[i] = node
+
+        target = node.next[0]
+        if target is None or target.key != key:
+            return False
+
+        for i in range(self._level):
+            if update[i].next[i] is target:
+                update[i].span[i] += target.span[i] - 1
+                update[i].next[i] = target.next[i]
+            else:
+                update[i].span[i] -= 1
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+        return True
+
+    def rank(self, key) -> int | None:
+        """Ранг ключа, начиная с 1, или None."""
+        traversed = 0
+        node = self._head
+        for i in reversed(range(self._level)):
+            while node.next[i] is not None and node.next[i].key <= key:
+                traversed += node.span[i]
+                node = node.next[i]
+            if node.key == key and node is not self._head:
+                return traversed
+        return None
+
+    def slice(self, start: int, stop: int) -> list:
+        """Ключи с рангами start..stop-1 (нумерация с 1)."""
+        start = max(1, start)
+        if start >= stop or start > self._size:
+            return []
+
+        traversed = 0
+        node = self._head
+        for i in reversed(range(self._level)):
+            while node.next[i] is not None and traversed + node.span[i] < start:
+                traversed += node.span[i]
+                node = node.next[i]
+
+        keys = []
+        node = node.next[0]
+        while node is not None and len(keys) < stop - start:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+# Участник рейтинга (member) — Participant.id, имя подставляется только в ответе.
+def sort_key(member: int, stats) -> tuple:
+    count, best, score_sum, _duration_sum = stats
+    return (-best, -(score_sum / count if count else 0), member)
+
+
+def entry(rank: int, member: int, name: str, stats) -> dict:
+    count, best, score_sum, duration_sum = stats
+    return {
+        'rank': rank,
+        'participant_id': member,
+        'user_name': name,
+        'attempts_count': count,
+        'best_score': best,
+        'avg_score': score_sum / count if count else 0.0,
+        'avg_duration_seconds': duration_sum / count if count else 0.0,
+    }
+
+
+class MemoryBoard:
+    def __init__(self):
+        self.stats: dict[int, tuple] = {}
+        self.ranked = RankedSet()
+
+    def add(self, member: int, count: int, best: int, score_sum: int, duration_sum: int) -> None:
+        old = self.stats.get(member)
+        if old is not None:
+            self.ranked.remove(sort_key(member, old))
+            count += old[0]
+            best = max(best, old[1])
+            score_sum += old[2]
+            duration_sum += old[3]
+        stats = (count, best, score_sum, duration_sum)
+        self.stats[member] = stats
+        self.ranked.insert(sort_key(member, stats))
+
+    def range(self, start: int, stop: int) -> list[tuple]:
+        """(rank, member, stats) с рангами start..stop-1."""
+        keys = self.ranked.slice(start, stop)
+        return [(start + offset, key[2], self.stats[key[2]]) for offset, key in enumerate(keys)]
+
+    def rank(self, member: int) -> int | None:
+        stats = self.stats.get(member)
+        return None if stats is None else self.ranked.rank(sort_key(member, stats))
+
+    def __len__(self) -> int:
+        return len(self.stats)
+
+
+class MemoryLeaderboardBackend:
+    """Рейтинги в памяти воркера; новые попытки подтягиваются по возрастанию Attempt.id.
+
+    Транзакции могут фиксироваться не в порядке id, поэтому каждый sync перечитывает
+    хвост из LEADERBOARD_SYNC_OVERLAP последних id и пропускает уже учтенные.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards: dict | None = None
+        self._last_attempt_id = 0
+        self._recent_ids: set[int] = set()
+        self._synced_at = 0.0
+        self._generation = None
+
+    def record(self, exam_id: int, participant_id: int, score: int, duration_seconds: int) -> None:
+        # Попытка будет подхвачена следующим sync() в каждом воркере, включая этот.
+        self._synced_at = 0.0
+
+    def record_many(self, rows) -> None:
+        self._synced_at = 0.0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._boards = None
+            self._recent_ids = set()
+
+    def board(self, name) -> MemoryBoard:
+        self.sync()
+        board = self._boards.get(name)
+        return board if board is not None else MemoryBoard()
+
+    def sync(self) -> None:
+        now = time.monotonic()
+        if self._boards is not None and now - self._synced_at < settings.LEADERBOARD_SYNC_SEC:
+            return
+        with self._lock:
+            # Пересчет результатов меняет старые попытки, которые догон по id не увидит:
+            # такие рейтинги строятся заново во всех воркерах.
+            generation = board_generation()
+            if generation != self._generation:
+                self._boards = None
+                self._generation = generation
+            if self._boards is None:
+                self._boards, self._last_attempt_id, self._recent_ids = build_memory_boards()
+            else:
+                overlap_from = self._last_attempt_id - settings.LEADERBOARD_SYNC_OVERLAP
+                new_attempts = (
+                    Attempt.objects.filter(id__gt=overlap_from)
+                    .order_by('id')
+                    .values_list('id', 'exam_id', 'participant_id', 'score', 'duration_seconds')
+                )
+                for attempt_id, exam_id, participant_id, score, duration in new_attempts:
+                    if attempt_id in self._recent_ids:
+                        continue
+                    for name in (GLOBAL_BOARD, exam_id):
+                        self._boards.setdefault(name, MemoryBoard()).add(participant_id, 1, score, score, duration)
+                    self._recent_ids.add(attempt_id)
+                    self._last_attempt_id = max(self._last_attempt_id, attempt_id)
+                threshold = self._last_attempt_id - settings.LEADERBOARD_SYNC_OVERLAP
+                self._recent_ids = {attempt_id for attempt_id in self._recent_ids if attempt_id > threshold}
+            self._synced_at = now
+
+
+def board_generation():
+    rescored_at = (
+        RescoreRun.objects.filter(finished_at__isnull=False, changed_attempts__gt=0)
+        .order_by('-finished_at')
+        .values_list('finished_at', flat=True)
+        .first()
+    )
+    # Массовое удаление (purge.py) тоже меняет уже учтенные попытки.
+    purged_at = BootFingerprint.objects.filter(name=PURGE_FINGERPRINT).values_list('updated_at', flat=True).first()
+    return rescored_at, purged_at
+
+
+def aggregate_rows():
+    """Строки (exam_id, participant_id, count, best, score_sum, duration_sum) по живым и архивным попыткам."""
+    live = Attempt.objects.values('exam_id', 'participant_id').annotate(
+        count=Count('id'), best=Max('score'), score_sum=Sum('score'), duration_sum=Sum('duration_seconds')
+    )
+    for row in live.order_by():
+        yield row['exam_id'], row['participant_id'], row['count'], row['best'], row['score_sum'], row['duration_sum']
+
+    archived = ArchivedAttemptStat.objects.values_list(
+        'exam_id', 'participant_id', 'attempts_count', 'best_score', 'score_sum', 'duration_sum'
+    )
+    yield from archived.iterator()
+
+
+def build_memory_boards():
+    last_attempt_id = Attempt.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    boards: dict = {GLOBAL_BOARD: MemoryBoard()}
+    for exam_id, participant_id, count, best, score_sum, duration_sum in aggregate_rows():
+        for name in (GLOBAL_BOARD, exam_id):
+            boards.setdefault(name, MemoryBoard()).add(participant_id, count, best, score_sum, duration_sum)
+    recent_ids = set(
+        Attempt.objects.filter(
+            id__gt=last_attempt_id - settings.LEADERBOARD_SYNC_OVERLAP,
+            id__lte=last_attempt_id,
+        ).values_list('id', flat=True)
+    )
+    return boards, last_attempt_id, recent_ids
+
+
+_REDIS_RECORD_SCRIPT = """
+local raw = redis.call('HGET', KEYS[2], ARGV[1])
+local count, best, total, duration = 0, 0, 0, 0
+if raw then
+  local a, b, c, d = string.match(raw, '(%d+),(%d+),(%d+),(%d+)')
+  count, best, total, duration = tonumber(a), tonumber(b), tonumber(c), tonumber(d)
+end
+count = count + tonumber(ARGV[2])
+best = math.max(best, tonumber(ARGV[3]))
+total = total + tonumber(ARGV[4])
+duration = duration + tonumber(ARGV[5])
+redis.call('HSET', KEYS[2], ARGV[1], count .. ',' .. best .. ',' .. total .. ',' .. duration)
+redis.call('ZADD', KEYS[1], best * 1000 + total / count, ARGV[1])
+return count
+"""
+
+
+class RedisBoard:
+    def __init__(self, client, name):
+        self.client = client
+        self.zset_key = f'{settings.LEADERBOARD_REDIS_PREFIX}:board:{name}'
+        self.hash_key = f'{settings.LEADERBOARD_REDIS_PREFIX}:stats:{name}'
+
+    def _stats(self, members) -> list:
+        if not members:
+            return []
+        raw = self.client.hmget(self.hash_key, members)
+        return [tuple(int(part) for part in value.decode().split(',')) for value in raw]
+
+    def range(self, start: int, stop: int) -> list[tuple]:
+        if start >= stop:
+            return []
+        members = self.client.zrevrange(self.zset_key, start - 1, stop - 2)
+        return [
+            (start + offset, int(member), stats)
+            for offset, (member, stats) in enumerate(zip(members, self._stats(members)))
+        ]
+
+    def rank(self, member: int) -> int | None:
+        rank = self.client.zrevrank(self.zset_key, member)
+        return None if rank is None else rank + 1
+
+    def __len__(self) -> int:
+        return self.client.zcard(self.zset_key)
+
+
+class RedisLeaderboardBackend:
+    def __init__(self, url: str):
+        self.client = redis.Redis.from_url(url)
+        self._record = self.client.register_script(_REDIS_RECORD_SCRIPT)
+
+    def board(self, name) -> RedisBoard:
+        return RedisBoard(self.client, name)
+
+    def add(self, name, member, count, best, score_sum, duration_sum, client=None) -> None:
+        board = self.board(name)
+        self._record(
+            keys=[board.zset_key, board.hash_key],
+            args=[member, count, best, score_sum, duration_sum],
+            client=client or self.client,
+        )
+
+    def record(self, exam_id: int, participant_id: int, score: int, duration_seconds: int) -> None:
+        for name in (GLOBAL_BOARD, exam_id):
+            self.add(name, participant_id, 1, score, score, duration_seconds)
+
+    def record_many(self, rows) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for exam_id, participant_id, score, duration_seconds in rows:
+            for name in (GLOBAL_BOARD, exam_id):
+                self.add(name, participant_id, 1, score, score, duration_seconds, client=pipeline)
+        pipeline.execute()
+
+    def reset(self) -> None:
+        prefix = settings.LEADERBOARD_REDIS_PREFIX
+        keys = list(self.client.scan_iter(f'{prefix}:board:*')) + list(self.client.scan_iter(f'{prefix}:stats:*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def rebuild(self) -> None:
+        self.reset()
+        pipeline = self.client.pipeline(transaction=False)
+        for exam_id, participant_id, count, best, score_sum, duration_sum in aggregate_rows():
+            for name in (GLOBAL_BOARD, exam_id):
+                self.add(name, participant_id, count, best, score_sum, duration_sum, client=pipeline)
+        pipeline.execute()
+
+
+class Leaderboard:
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._make_backend()
+        return self._backend
+
+    @staticmethod
+    def _make_backend():
+        if settings.LEADERBOARD_BACKEND == 'redis':
+            if redis is not None and settings.LEADERBOARD_REDIS_URL:
+                return RedisLeaderboardBackend(settings.LEADERBOARD_REDIS_URL)
+            logger.warning('LEADERBOARD_BACKEND=redis, но redis недоступен: используется рейтинг в памяти.')
+        return MemoryLeaderboardBackend()
+
+    def record(self, attempt: Attempt) -> None:
+        try:
+            self.backend.record(attempt.exam_id, attempt.participant_id, attempt.score, attempt.duration_seconds)
+        except Exception:
+            logger.exception('Не удалось обновить рейтинг для попытки %s', attempt.pk)
+
+    def record_many(self, attempts) -> None:
+        try:
+            self.backend.record_many(
+                [(attempt.exam_id, attempt.participant_id, attempt.score, attempt.duration_seconds) for attempt in attempts]
+            )
+        except Exception:
+            logger.exception('Не удалось обновить рейтинг для %s попыток', len(attempts))
+
+    @staticmethod
+    def _entries(rows) -> list[dict]:
+        names = participants.display_names(member for _, member, _ in rows)
+        return [entry(rank, member, names.get(member, ''), stats) for rank, member, stats in rows]
+
+    def top(self, exam_id=None, limit: int = 10) -> list[dict]:
+        return self._entries(self.backend.board(exam_id or GLOBAL_BOARD).range(1, limit + 1))
+
+    def entries(self, exam_id=None) -> list[dict]:
+        board = self.backend.board(exam_id or GLOBAL_BOARD)
+        return self._entries(board.range(1, len(board) + 1))
+
+    def around(self, participant_id: int, exam_id=None, window: int = 5) -> dict | None:
+        board = self.backend.board(exam_id or GLOBAL_BOARD)
+        rank = board.rank(participant_id)
+        if rank is None:
+            return None
+        return {
+            'rank': rank,
+            'total': len(board),
+            'entries': self._entries(board.range(max(1, rank - window), rank + window + 1)),
+        }
+
+    def rebuild(self) -> None:
+        backend = self.backend
+        if isinstance(backend, RedisLeaderboardBackend):
+            backend.rebuild()
+        else:
+            backend.reset()
+            backend.sync()
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,187 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Case, Count, Exists, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Mod
+from django.db.models.lookups import Exact, GreaterThan
+from django.utils import timezone
+
+from . import rollups, snapshots
+from .db import run_write
+from .models import Attempt, AttemptAnswer, Option, Question, RescoreRun
+from .packing import pack_flags, unpack_answers, unpack_flags
+from .ranking import leaderboard
+
+logger = logging.getLogger(__name__)
+
+# Пересчет истории после исправления ключа ответов: ответы и итоги попыток обновляются
+# несколькими UPDATE на диапазон id, каждый диапазон — отдельная короткая транзакция.
+# Прогресс хранится в RescoreRun, прерванный пересчет продолжается с места остановки.
+DEFAULT_CHUNK_SIZE = 5000
+# Пересчет считается идущим, пока его прогресс обновлялся недавно.
+STALE_AFTER = timedelta(minutes=2)
+
+
+def _score_expression():
+    # round() в Python округляет половину к четному; то же самое целочисленно в SQL,
+    # чтобы пересчитанный score совпадал с посчитанным при отправке.
+    scaled = F('correct_count') * 100
+    quotient = scaled / F('total_questions')
+    remainder = Mod(scaled, F('total_questions'))
+    return Case(
+        When(total_questions=0, then=Value(0)),
+        When(GreaterThan(remainder * 2, F('total_questions')), then=quotient + 1),
+        When(Exact(remainder * 2, F('total_questions')), then=quotient + Mod(quotient, 2)),
+        default=quotient,
+        output_field=IntegerField(),
+    )
+
+
+def _rescore_rows(exam_id: int, low: int, high: int) -> tuple[int, set[int]]:
+    correct = Option.objects.filter(
+        id=OuterRef('selected_option_id'),
+        question_id=OuterRef('question_id'),
+        is_correct=True,
+    )
+    mismatched = (
+        AttemptAnswer.objects.filter(attempt_id__gte=low, attempt_id__lte=high, attempt__exam_id=exam_id)
+        .annotate(expected=Exists(correct))
+        .exclude(is_correct=F('expected'))
+    )
+    attempt_ids = set(mismatched.values_list('attempt_id', flat=True).distinct())
+    if not attempt_ids:
+        return 0, attempt_ids
+
+    changed = (
+        AttemptAnswer.objects.filter(attempt_id__in=attempt_ids)
+        .annotate(expected=Exists(correct))
+        .exclude(is_correct=F('expected'))
+        .update(is_correct=Exists(correct))
+    )
+
+    correct_answers = AttemptAnswer.objects.filter(attempt_id=OuterRef('pk'), is_correct=True).order_by()
+    attempts = Attempt.objects.filter(id__in=attempt_ids)
+    attempts.update(
+        correct_count=Coalesce(
+            Subquery(correct_answers.values('attempt_id').annotate(total=Count('id')).values('total')),
+            0,
+        ),
+        scoring_points=Coalesce(
+            Subquery(
+                correct_answers.values('attempt_id').annotate(total=Sum('question__score_value')).values('total')
+            ),
+            0,
+        ),
+    )
+    # У адаптивных попыток score — процентиль оценки уровня, а не доля верных ответов.
+    attempts.filter(ability__isnull=True).update(score=_score_expression())
+    return changed, attempt_ids
+
+
+def _rescore_packed(exam_id: int, low: int, high: int) -> tuple[int, set[int]]:
+    # Упакованные ответы нельзя пересчитать в SQL: маска пересобирается в Python, но только
+    # для попыток этого диапазона и одной пачкой bulk_update.
+    attempts = list(
+        Attempt.objects.filter(exam_id=exam_id, id__gte=low, id__lte=high, answers_packed__isnull=False).only(
+            'id', 'answers_packed', 'correct_mask', 'total_questions', 'ability'
+        )
+    )
+    if not attempts:
+        return 0, set()
+
+    correct_options = set(
+        Option.objects.filter(question__exam_id=exam_id, is_correct=True).values_list('question_id', 'id')
+    )
+    # Старые попытки могут ссылаться на снятые с экзамена вопросы.
+    score_values = dict(Question.all_objects.filter(exam_id=exam_id).values_list('id', 'score_value'))
+    changed = 0
+    updated = []
+    for attempt in attempts:
+        pairs = unpack_answers(attempt.answers_packed)
+        old_flags = unpack_flags(attempt.correct_mask, len(pairs))
+        flags = [(question_id, option_id) in correct_options for question_id, option_id in pairs]
+        if flags == old_flags:
+            continue
+        changed += sum(old != new for old, new in zip(old_flags, flags))
+        attempt.correct_mask = pack_flags(flags)
+        attempt.correct_count = sum(flags)
+        attempt.scoring_points = sum(
+            score_values.get(question_id, 0) for (question_id, _), flag in zip(pairs, flags) if flag
+        )
+        if attempt.ability is None:
+            attempt.score = (
+                round(attempt.correct_count / attempt.total_questions * 100) if attempt.total_questions else 0
+            )
+        updated.append(attempt)
+    Attempt.objects.bulk_update(updated, ['correct_mask', 'correct_count', 'scoring_points', 'score'])
+    return changed, {attempt.id for attempt in updated}
+
+
+def _rescore_chunk(run: RescoreRun, low: int, high: int, snapshot_id: int | None) -> None:
+    changed_rows, row_attempts = _rescore_rows(run.exam_id, low, high)
+    changed_packed, packed_attempts = _rescore_packed(run.exam_id, low, high)
+    rescored = row_attempts | packed_attempts
+    if snapshot_id and rescored:
+        # Пересчитанные попытки оценены по текущему ключу, и разбор должен показывать его же;
+        # остальные остаются на версии, на которой прошли.
+        Attempt.objects.filter(id__in=rescored).exclude(snapshot_id=snapshot_id).update(snapshot_id=snapshot_id)
+    # Прогресс фиксируется в той же транзакции, что и данные диапазона.
+    RescoreRun.objects.filter(id=run.id).update(
+        last_attempt_id=high,
+        changed_answers=F('changed_answers') + changed_rows + changed_packed,
+        changed_attempts=F('changed_attempts') + len(rescored),
+        updated_at=timezone.now(),
+    )
+
+
+def is_running(run: RescoreRun) -> bool:
+    return run.finished_at is None and timezone.now() - run.updated_at < STALE_AFTER
+
+
+def start_run(exam_id: int, restart: bool = False) -> RescoreRun:
+    run = RescoreRun.objects.filter(exam_id=exam_id, finished_at__isnull=True).first()
+    if run is not None and not restart:
+        return run
+    if run is not None:
+        RescoreRun.objects.filter(exam_id=exam_id, finished_at__isnull=True).delete()
+    # Попытки после старта уже оценены по новому ключу: каталог сбрасывается при правке Option.
+    max_attempt_id = Attempt.objects.filter(exam_id=exam_id).aggregate(last=Max('id'))['last'] or 0
+    return RescoreRun.objects.create(exam_id=exam_id, max_attempt_id=max_attempt_id)
+
+
+def rescore_exam(exam_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE, restart: bool = False, progress=None):
+    run = start_run(exam_id, restart)
+    snapshot = snapshots.publish(exam_id)
+    while run.last_attempt_id < run.max_attempt_id:
+        low = run.last_attempt_id + 1
+        high = min(low + chunk_size - 1, run.max_attempt_id)
+        run_write(_rescore_chunk, run, low, high, snapshot.id if snapshot else None)
+        run.refresh_from_db()
+        if progress is not None:
+            progress(run)
+
+    if run.changed_attempts:
+        run_write(rollups.rebuild, exam_id)
+    run.finished_at = timezone.now()
+    run.save(update_fields=['finished_at', 'updated_at'])
+    if run.changed_attempts:
+        # Завершенный пересчет меняет поколение рейтинга, остальные воркеры перестроят его сами.
+        leaderboard.rebuild()
+    return run
+
+
+def rescore_in_background(exam_ids) -> threading.Thread:
+    def target():
+        try:
+            for exam_id in exam_ids:
+                rescore_exam(exam_id)
+        except Exception:
+            logger.exception('Rescore failed for exams %s', exam_ids)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=target, name='rescore', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,91 @@
+import json
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+from django.core import signing
+from rest_framework.utils.encoders import JSONEncoder
+
+# Разбор попытки собирается из заранее закодированных JSON-фрагментов: статическая часть
+# каждого вопроса и выбранного варианта кодируется один раз на снимок экзамена,
+# а на отправке остается склеить байты.
+REVIEW_TOKEN_SALT = 'exams.review'
+
+CORRECT_SUFFIX = b',"is_correct":true}'
+WRONG_SUFFIX = b',"is_correct":false}'
+
+
+def encode(value) -> bytes:
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+NOT_SELECTED = b',"selected_option_id":null,"selected_text":' + encode('Не выбран')
+
+
+@dataclass(frozen=True)
+class ReviewFragments:
+    version: str
+    question_prefix: Mapping[int, bytes]
+    selected: Mapping[int, bytes]
+    document: bytes | memoryview
+
+    def reviews(self, results) -> bytes:
+        """results — (question_id, selected_option_id, is_correct) в порядке вопросов."""
+        parts = []
+        for question_id, option_id, is_correct in results:
+            parts.append(
+                self.question_prefix[question_id]
+                + self.selected.get(option_id, NOT_SELECTED)
+                + (CORRECT_SUFFIX if is_correct else WRONG_SUFFIX)
+            )
+        return b'[' + b','.join(parts) + b']'
+
+
+def build_fragments(version: str, document: dict) -> ReviewFragments:
+    """document — содержимое снимка экзамена (см. snapshots.build_document)."""
+    question_prefix = {}
+    selected = {}
+    document_questions = []
+    exam = document['exam']
+    for question in exam['questions']:
+        options = question['options']
+        correct_id = document['key'].get(str(question['id']))
+        correct_option = next((option for option in options if option['id'] == correct_id), None)
+        static = {
+            'question_id': question['id'],
+            'prompt': question['prompt'],
+            'topic': question['topic'],
+            'explanation': question['explanation'],
+            'score_value': question['score_value'],
+            'correct_option_id': correct_option['id'] if correct_option else None,
+            'correct_text': correct_option['text'] if correct_option else 'Не задан',
+        }
+        # Без закрывающей скобки: дальше дописываются выбранный вариант и is_correct.
+        question_prefix[question['id']] = encode(static)[:-1]
+
+        for option in options:
+            selected[option['id']] = (
+                b',"selected_option_id":' + encode(option['id']) + b',"selected_text":' + encode(option['text'])
+            )
+        document_questions.append(
+            {**static, 'options': [{'id': option['id'], 'text': option['text']} for option in options]}
+        )
+
+    review_document = encode({'exam': exam['id'], 'version': version, 'questions': document_questions})
+    return ReviewFragments(
+        version=version, question_prefix=question_prefix, selected=selected, document=review_document
+    )
+
+
+def review_token(exam_id: int, version: str, snapshot_id: int) -> str:
+    # Документ разбора содержит ключ ответов, поэтому выдается только после отправки попытки.
+    # Подпись без метки времени: один URL на версию экзамена, браузер кэширует его один раз.
+    return signing.Signer(salt=REVIEW_TOKEN_SALT).sign_object(
+        {'exam': exam_id, 'version': version, 'snapshot': snapshot_id}, compress=True
+    )
+
+
+def read_review_token(token: str) -> dict | None:
+    try:
+        return signing.Signer(salt=REVIEW_TOKEN_SALT).unsign_object(token)
+    except signing.BadSignature:
+        return None
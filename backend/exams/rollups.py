@@ -0,0 +1,238 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DURATION_BUCKET_FIELDS, SCORE_BUCKET_FIELDS, Attempt, Exam, ExamDailyStat
+
+# Дневные агрегаты по экзаменам: счетчики, суммы и гистограммы результата и времени.
+# Обновляются при отправке попытки, по направлениям складываются из тех же строк,
+# поэтому объем чтения зависит от числа экзаменов и дней, а не попыток.
+SCORE_BUCKET_WIDTH = 10
+SCORE_BUCKETS = 10
+DURATION_BOUNDS = (60, 120, 300, 600, 900, 1200, 1800, 2700, 3600)
+
+
+def score_bucket(score: int) -> int:
+    return min(max(score, 0) // SCORE_BUCKET_WIDTH, SCORE_BUCKETS - 1)
+
+
+def duration_bucket(duration_seconds: int) -> int:
+    for index, bound in enumerate(DURATION_BOUNDS):
+        if duration_seconds < bound:
+            return index
+    return len(DURATION_BOUNDS)
+
+
+def empty_histograms() -> tuple[list[int], list[int]]:
+    return [0] * SCORE_BUCKETS, [0] * (len(DURATION_BOUNDS) + 1)
+
+
+def record_attempt(attempt: Attempt, passing_score: int) -> None:
+    """Вызывается в транзакции отправки."""
+    record_attempts([attempt], {attempt.exam_id: passing_score})
+
+
+def _add_counts(exam_id: int, day, counts: Counter) -> None:
+    # Прибавка F() одним UPDATE, без чтения и блокировки строки заранее; строки дня еще нет — INSERT.
+    stats = ExamDailyStat.objects.filter(exam_id=exam_id, day=day)
+    increments = {field: F(field) + value for field, value in counts.items()}
+    if stats.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            ExamDailyStat.objects.create(exam_id=exam_id, day=day, **counts)
+    except IntegrityError:
+        # Строку дня только что вставила параллельная отправка.
+        stats.update(**increments)
+
+
+def record_attempts(attempts, passing_scores: dict[int, int]) -> None:
+    """Пачка попыток: один UPDATE на экзамен и день, строки обновляются в одном порядке."""
+    groups: dict[tuple, Counter] = {}
+    for attempt in attempts:
+        counts = groups.setdefault((attempt.exam_id, timezone.localdate(attempt.finished_at)), Counter())
+        counts['attempts_count'] += 1
+        counts['passed_count'] += int(attempt.score >= passing_scores[attempt.exam_id])
+        counts['score_sum'] += attempt.score
+        counts['duration_sum'] += attempt.duration_seconds
+        counts[SCORE_BUCKET_FIELDS[score_bucket(attempt.score)]] += 1
+        counts[DURATION_BUCKET_FIELDS[duration_bucket(attempt.duration_seconds)]] += 1
+
+    for (exam_id, day), counts in sorted(groups.items()):
+        _add_counts(exam_id, day, counts)
+
+
+def _bucket_filters():
+    score_filters = []
+    for index in range(SCORE_BUCKETS):
+        condition = Q(score__gte=index * SCORE_BUCKET_WIDTH)
+        if index < SCORE_BUCKETS - 1:
+            condition &= Q(score__lt=(index + 1) * SCORE_BUCKET_WIDTH)
+        score_filters.append(condition)
+
+    duration_filters = []
+    lower = None
+    for bound in (*DURATION_BOUNDS, None):
+        condition = Q()
+        if lower is not None:
+            condition &= Q(duration_seconds__gte=lower)
+        if bound is not None:
+            condition &= Q(duration_seconds__lt=bound)
+        duration_filters.append(condition)
+        lower = bound
+    return score_filters, duration_filters
+
+
+def rebuild(exam_id: int | None = None) -> int:
+    """Пересчитывает дни, за которые есть попытки; более старые дни (архив) не трогаются."""
+    attempts = Attempt.objects.all()
+    if exam_id:
+        attempts = attempts.filter(exam_id=exam_id)
+    first = attempts.order_by('finished_at').values_list('finished_at', flat=True).first()
+    stale = ExamDailyStat.objects.all()
+    if exam_id:
+        stale = stale.filter(exam_id=exam_id)
+    if first is None:
+        return 0
+
+    score_filters, duration_filters = _bucket_filters()
+    annotations = {
+        'attempts': Count('id'),
+        'passed': Count('id', filter=Q(score__gte=F('exam__passing_score'))),
+        'scores': Sum('score'),
+        'durations': Sum('duration_seconds'),
+    }
+    for index, condition in enumerate(score_filters):
+        annotations[f's{index}'] = Count('id', filter=condition)
+    for index, condition in enumerate(duration_filters):
+        annotations[f'd{index}'] = Count('id', filter=condition)
+
+    rows = (
+        attempts.annotate(day=TruncDate('finished_at', tzinfo=timezone.get_current_timezone()))
+        .values('exam_id', 'day')
+        .annotate(**annotations)
+        .order_by()
+    )
+    stats = [
+        ExamDailyStat(
+            exam_id=row['exam_id'],
+            day=row['day'],
+            attempts_count=row['attempts'],
+            passed_count=row['passed'],
+            score_sum=row['scores'] or 0,
+            duration_sum=row['durations'] or 0,
+            **{field: row[f's{index}'] for index, field in enumerate(SCORE_BUCKET_FIELDS)},
+            **{field: row[f'd{index}'] for index, field in enumerate(DURATION_BUCKET_FIELDS)},
+        )
+        for row in rows
+    ]
+    stale.filter(day__gte=timezone.localdate(first)).delete()
+    ExamDailyStat.objects.bulk_create(stats, batch_size=1000)
+    return len(stats)
+
+
+def _window(days: int):
+    if days <= 0:
+        return ExamDailyStat.objects.all()
+    return ExamDailyStat.objects.filter(day__gt=timezone.localdate() - timedelta(days=days))
+
+
+def _merge(total: dict, stat: ExamDailyStat) -> None:
+    total['attempts'] += stat.attempts_count
+    total['passed'] += stat.passed_count
+    total['score_sum'] += stat.score_sum
+    total['duration_sum'] += stat.duration_sum
+    for index, value in enumerate(stat.score_histogram):
+        total['score_histogram'][index] += value
+    for index, value in enumerate(stat.duration_histogram):
+        total['duration_histogram'][index] += value
+
+
+def _new_total() -> dict:
+    scores, durations = empty_histograms()
+    return {
+        'attempts': 0,
+        'passed': 0,
+        'score_sum': 0,
+        'duration_sum': 0,
+        'score_histogram': scores,
+        'duration_histogram': durations,
+    }
+
+
+def _summary(total: dict) -> dict:
+    attempts = total['attempts']
+    score_histogram = [
+        {
+            'from': index * SCORE_BUCKET_WIDTH,
+            'to': 100 if index == SCORE_BUCKETS - 1 else (index + 1) * SCORE_BUCKET_WIDTH - 1,
+            'count': count,
+        }
+        for index, count in enumerate(total['score_histogram'])
+    ]
+    bounds = (0, *DURATION_BOUNDS, None)
+    duration_histogram = [
+        {'from': bounds[index], 'to': bounds[index + 1], 'count': count}
+        for index, count in enumerate(total['duration_histogram'])
+    ]
+    return {
+        'attempts_count': attempts,
+        'passed_count': total['passed'],
+        'pass_rate': round(total['passed'] * 100 / attempts, 1) if attempts else 0,
+        'avg_score': round(total['score_sum'] / attempts, 1) if attempts else 0,
+        'avg_duration_seconds': round(total['duration_sum'] / attempts) if attempts else 0,
+        'score_histogram': score_histogram,
+        'duration_histogram': duration_histogram,
+    }
+
+
+def exam_stats(exam: Exam, days: int = 30) -> dict:
+    total = _new_total()
+    daily = []
+    for stat in _window(days).filter(exam=exam).order_by('day'):
+        _merge(total, stat)
+        daily.append(
+            {
+                'day': stat.day,
+                'attempts_count': stat.attempts_count,
+                'passed_count': stat.passed_count,
+                'avg_score': round(stat.score_sum / stat.attempts_count, 1) if stat.attempts_count else 0,
+                'avg_duration_seconds': (
+                    round(stat.duration_sum / stat.attempts_count) if stat.attempts_count else 0
+                ),
+            }
+        )
+    return {
+        'exam': exam.id,
+        'title': exam.title,
+        'subject': exam.subject,
+        'passing_score': exam.passing_score,
+        'days': days,
+        **_summary(total),
+        'daily': daily,
+    }
+
+
+def subject_stats(days: int = 30) -> list[dict]:
+    totals: dict[str, dict] = {}
+    exams_by_subject: dict[str, set[int]] = {}
+    for stat in _window(days).select_related('exam').only(
+        'exam__subject',
+        'attempts_count',
+        'passed_count',
+        'score_sum',
+        'duration_sum',
+        *SCORE_BUCKET_FIELDS,
+        *DURATION_BUCKET_FIELDS,
+    ):
+        subject = stat.exam.subject
+        _merge(totals.setdefault(subject, _new_total()), stat)
+        exams_by_subject.setdefault(subject, set()).add(stat.exam_id)
+    return [
+        {'subject': subject, 'exams_count': len(exams_by_subject[subject]), **_summary(total)}
+        for subject, total in sorted(totals.items())
+    ]
@@ -0,0 +1,254 @@
+from django.db import connection
+from django.db.models import Q
+
+from .models import Exam, Option, Question
+from .stemmer import stem_text, stem_tokens
+
+# Полнотекстовый индекс вопросов: текст вопроса, варианты ответов, пояснение и тема,
+# название экзамена. PostgreSQL — tsvector ('russian') + GIN, SQLite — FTS5 по основам
+# слов из stemmer.py. Для остальных СУБД остается поиск через icontains.
+PG_TABLE = 'exams_question_search'
+FTS_TABLE = 'exams_question_fts'
+
+PG_CREATE_SQL = (
+    f'CREATE TABLE IF NOT EXISTS {PG_TABLE} ('
+    ' question_id bigint PRIMARY KEY REFERENCES exams_question(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,'
+    ' exam_id bigint NOT NULL,'
+    ' document tsvector NOT NULL'
+    ')',
+    f'CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_gin ON {PG_TABLE} USING gin (document)',
+    f'CREATE INDEX IF NOT EXISTS {PG_TABLE}_exam_idx ON {PG_TABLE} (exam_id)',
+)
+SQLITE_CREATE_SQL = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    'question_id UNINDEXED, exam_id UNINDEXED, prompt, options, explanation, exam_title,'
+    " tokenize = 'unicode61 remove_diacritics 2')",
+)
+
+# Веса полей: вопрос важнее вариантов, варианты важнее пояснения и названия экзамена.
+SQLITE_BM25 = f'bm25({FTS_TABLE}, 0, 0, 10.0, 4.0, 2.0, 1.0)'
+
+PG_UPSERT_SQL = f"""
+    INSERT INTO {PG_TABLE} (question_id, exam_id, document)
+    SELECT
+        q.id,
+        q.exam_id,
+        setweight(to_tsvector('russian', q.prompt), 'A')
+        || setweight(to_tsvector('russian', coalesce(string_agg(o.text, ' '), '')), 'B')
+        || setweight(to_tsvector('russian', q.explanation || ' ' || q.topic), 'C')
+        || setweight(to_tsvector('russian', e.title), 'D')
+    FROM exams_question q
+    JOIN exams_exam e ON e.id = q.exam_id
+    LEFT JOIN exams_option o ON o.question_id = q.id
+    WHERE q.id = ANY(%s)
+    GROUP BY q.id, q.exam_id, q.prompt, q.explanation, q.topic, e.title
+    ON CONFLICT (question_id) DO UPDATE SET exam_id = EXCLUDED.exam_id, document = EXCLUDED.document
+"""
+
+
+def backend() -> str | None:
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        return 'sqlite'
+    return None
+
+
+def create_tables(schema_editor) -> None:
+    vendor = schema_editor.connection.vendor
+    statements = PG_CREATE_SQL if vendor == 'postgresql' else SQLITE_CREATE_SQL if vendor == 'sqlite' else ()
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_tables(schema_editor) -> None:
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {PG_TABLE}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def _models(apps=None):
+    # В миграции — исторические модели: живые читают поля, которых в схеме еще нет.
+    if apps is None:
+        return Option, Question
+    return apps.get_model('exams', 'Option'), apps.get_model('exams', 'Question')
+
+
+def index_questions(question_ids, apps=None) -> None:
+    question_ids = list(question_ids)
+    if not question_ids:
+        return
+    kind = backend()
+    if kind == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(PG_UPSERT_SQL, [question_ids])
+    elif kind == 'sqlite':
+        _index_sqlite(question_ids, apps)
+
+
+def _index_sqlite(question_ids, apps=None) -> None:
+    option_model, question_model = _models(apps)
+    options_by_question: dict[int, list[str]] = {}
+    options = option_model.objects.filter(question_id__in=question_ids).values_list('question_id', 'text')
+    for question_id, text in options:
+        options_by_question.setdefault(question_id, []).append(text)
+
+    rows = []
+    questions = question_model.objects.filter(id__in=question_ids).values_list(
+        'id', 'exam_id', 'prompt', 'explanation', 'topic', 'exam__title'
+    )
+    for question_id, exam_id, prompt, explanation, topic, exam_title in questions:
+        rows.append(
+            (
+                question_id,
+                exam_id,
+                stem_text(prompt),
+                stem_text(' '.join(options_by_question.get(question_id, []))),
+                stem_text(f'{explanation} {topic}'),
+                stem_text(exam_title),
+            )
+        )
+
+    with connection.cursor() as cursor:
+        placeholders = ', '.join(['%s'] * len(question_ids))
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE question_id IN ({placeholders})', question_ids)
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (question_id, exam_id, prompt, options, explanation, exam_title)'
+            ' VALUES (%s, %s, %s, %s, %s, %s)',
+            rows,
+        )
+
+
+def remove_questions(question_ids) -> None:
+    question_ids = list(question_ids)
+    # В PostgreSQL строки индекса удаляет ON DELETE CASCADE.
+    if question_ids and backend() == 'sqlite':
+        placeholders = ', '.join(['%s'] * len(question_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE question_id IN ({placeholders})', question_ids)
+
+
+def remove_exams(exam_ids) -> None:
+    """Строки индекса экзаменов перед массовым удалением вопросов в обход моделей (purge.py)."""
+    exam_ids = list(exam_ids)
+    # В PostgreSQL строки индекса удаляет ON DELETE CASCADE.
+    if exam_ids and backend() == 'sqlite':
+        placeholders = ', '.join(['%s'] * len(exam_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE exam_id IN ({placeholders})', exam_ids)
+
+
+def copy_exam(source_exam_id: int, exam_id: int, question_ids: dict[int, int]) -> None:
+    """Индекс копии экзамена (cloning.py); question_ids — старый id вопроса -> новый."""
+    kind = backend()
+    if kind == 'postgresql':
+        # Документ собирается в самой БД одним запросом, отдельное копирование не быстрее.
+        index_questions(question_ids.values())
+    elif kind == 'sqlite':
+        # Тексты те же: основы слов переносятся из индекса исходного экзамена, заново — только название.
+        exam_title = stem_text(Exam.objects.filter(id=exam_id).values_list('title', flat=True).first())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT question_id, prompt, options, explanation FROM {FTS_TABLE} WHERE exam_id = %s',
+                [source_exam_id],
+            )
+            rows = [
+                (question_ids[int(question_id)], exam_id, prompt, options, explanation, exam_title)
+                for question_id, prompt, options, explanation in cursor.fetchall()
+                if int(question_id) in question_ids
+            ]
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (question_id, exam_id, prompt, options, explanation, exam_title)'
+                ' VALUES (%s, %s, %s, %s, %s, %s)',
+                rows,
+            )
+
+
+def index_exam(exam_id: int) -> None:
+    index_questions(Question.objects.filter(exam_id=exam_id).values_list('id', flat=True))
+
+
+def rebuild(batch_size: int = 1000, apps=None) -> int:
+    """Индекс заново; apps — реестр исторических моделей, когда вызывается из миграции."""
+    question_model = _models(apps)[1]
+    kind = backend()
+    if kind is None:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {PG_TABLE if kind == "postgresql" else FTS_TABLE}')
+
+    total = 0
+    last_id = 0
+    while True:
+        ids = list(
+            question_model.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        index_questions(ids, apps)
+        total += len(ids)
+        last_id = ids[-1]
+    return total
+
+
+def search(query: str, limit: int = 20, exam_id: int | None = None, active_only: bool = True) -> list[tuple[int, float]]:
+    """Пары (question_id, релевантность) по убыванию релевантности."""
+    kind = backend()
+    if kind == 'postgresql':
+        return _search_postgresql(query, limit, exam_id, active_only)
+    if kind == 'sqlite':
+        return _search_sqlite(query, limit, exam_id, active_only)
+
+    qs = Question.objects.filter(
+        Q(prompt__icontains=query) | Q(topic__icontains=query) | Q(exam__title__icontains=query)
+    )
+    if exam_id:
+        qs = qs.filter(exam_id=exam_id)
+    if active_only:
+        qs = qs.filter(exam__is_active=True)
+    return [(question_id, 1.0) for question_id in qs.values_list('id', flat=True)[:limit]]
+
+
+def _search_postgresql(query, limit, exam_id, active_only):
+    sql = (
+        f'SELECT s.question_id, ts_rank(s.document, query) AS rank'
+        f' FROM {PG_TABLE} s JOIN {Exam._meta.db_table} e ON e.id = s.exam_id,'
+        " websearch_to_tsquery('russian', %s) query"
+        ' WHERE s.document @@ query'
+    )
+    params = [query]
+    if exam_id:
+        sql += ' AND s.exam_id = %s'
+        params.append(exam_id)
+    if active_only:
+        sql += ' AND e.is_active'
+    sql += ' ORDER BY rank DESC LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _search_sqlite(query, limit, exam_id, active_only):
+    tokens = [token for token in stem_tokens(query) if token]
+    if not tokens:
+        return []
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    sql = (
+        f'SELECT f.question_id, -{SQLITE_BM25} AS rank'
+        f' FROM {FTS_TABLE} f JOIN {Exam._meta.db_table} e ON e.id = f.exam_id'
+        f' WHERE {FTS_TABLE} MATCH %s'
+    )
+    params = [match]
+    if exam_id:
+        sql += ' AND f.exam_id = %s'
+        params.append(exam_id)
+    if active_only:
+        sql += ' AND e.is_active'
+    sql += ' ORDER BY rank DESC LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
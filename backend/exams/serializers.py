@@ -1,6 +1,6 @@
 ﻿from rest_framework import serializers
 
-from .models import Attempt, AttemptAnswer, Exam, Option, Question
+from .models import Attempt, AttemptAnswer, Exam, Option, Question, SprintResult
 
 
 class OptionSerializer(serializers.ModelSerializer):
@@ -34,6 +34,7 @@ class ExamListSerializer(serializers.ModelSerializer):
             'effective_duration_minutes',
             'effective_duration_seconds',
             'passing_score',
+            'is_adaptive',
             'questions_count',
         )
 
@@ -55,6 +56,7 @@ class ExamDetailSerializer(serializers.ModelSerializer):
             'effective_duration_minutes',
             'effective_duration_seconds',
             'passing_score',
+            'is_adaptive',
             'questions',
         )
 
@@ -77,6 +79,12 @@ class SubmitAttemptSerializer(serializers.Serializer):
     started_at = serializers.DateTimeField(required=False)
     duration_seconds = serializers.IntegerField(required=False, min_value=0)
     answers = serializers.DictField(child=serializers.IntegerField(), allow_empty=True)
+    submission_key = serializers.RegexField(r'^[A-Za-z0-9_-]{8,64}$', required=False, allow_blank=True)
+
+
+class BatchAttemptSerializer(SubmitAttemptSerializer):
+    exam = serializers.IntegerField(min_value=1)
+    finished_at = serializers.DateTimeField(required=False)
 
 
 class AttemptSerializer(serializers.ModelSerializer):
@@ -88,6 +96,7 @@ class AttemptSerializer(serializers.ModelSerializer):
             'id',
             'exam',
             'exam_title',
+            'participant',
             'user_name',
             'started_at',
             'finished_at',
@@ -97,13 +106,64 @@ class AttemptSerializer(serializers.ModelSerializer):
             'correct_count',
             'total_questions',
             'duration_seconds',
+            'ability',
         )
 
 
 class UserStatSerializer(serializers.Serializer):
+    participant_id = serializers.IntegerField()
     user_name = serializers.CharField()
     attempts_count = serializers.IntegerField()
     best_score = serializers.IntegerField()
     avg_score = serializers.FloatField()
     avg_duration_seconds = serializers.FloatField()
 
+
+class ExamCloneSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=200, required=False, allow_blank=True)
+
+
+class AdaptiveStartSerializer(serializers.Serializer):
+    user_name = serializers.CharField(max_length=100)
+
+
+class AdaptiveAnswerSerializer(serializers.Serializer):
+    token = serializers.CharField()
+    question_id = serializers.IntegerField()
+    option_id = serializers.IntegerField(required=False, allow_null=True)
+
+
+class AdaptiveFinishSerializer(serializers.Serializer):
+    token = serializers.CharField()
+
+
+class LearningReviewSerializer(serializers.Serializer):
+    user_name = serializers.CharField(max_length=100)
+    question_id = serializers.IntegerField()
+    option_id = serializers.IntegerField(required=False, allow_null=True)
+
+
+class SprintStartSerializer(serializers.Serializer):
+    user_name = serializers.CharField(max_length=100)
+    subject = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    difficulty = serializers.CharField(max_length=10, required=False, allow_blank=True)
+    topic = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+
+class SprintCheckSerializer(serializers.Serializer):
+    question_id = serializers.IntegerField()
+    option_id = serializers.IntegerField()
+    token = serializers.CharField(required=False)
+
+
+class SprintFinishSerializer(serializers.Serializer):
+    token = serializers.CharField()
+
+
+class SprintResultSerializer(serializers.ModelSerializer):
+    # Только для чтения: результат создает и считает сервер (sprint.py).
+    class Meta:
+        model = SprintResult
+        fields = ('id', 'user_name', 'subject', 'score', 'total', 'started_at', 'finished_at')
+        read_only_fields = fields
+
@@ -0,0 +1,80 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import duplicates, participants, search
+from .catalog import catalog
+from .models import Exam, Option, Participant, Question
+
+
+def touch_exam(exam_id) -> None:
+    # Текущий снимок сбрасывается: следующее чтение или публикация соберет новый.
+    if exam_id:
+        Exam.objects.filter(id=exam_id).update(updated_at=timezone.now(), snapshot=None)
+    catalog.invalidate()
+
+
+@receiver(post_save, sender=Exam)
+@receiver(post_delete, sender=Exam)
+def exam_changed(sender, instance, **kwargs):
+    catalog.invalidate()
+
+
+@receiver(post_save, sender=Exam)
+def exam_snapshot_changed(sender, instance, raw=False, **kwargs):
+    if not raw and instance.snapshot_id:
+        Exam.objects.filter(id=instance.id).update(snapshot=None)
+        instance.snapshot = None
+
+
+@receiver(post_save, sender=Exam)
+def exam_search_changed(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    # Название экзамена входит в документ каждого его вопроса.
+    if raw or created or (update_fields is not None and 'title' not in update_fields):
+        return
+    search.index_exam(instance.id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    touch_exam(instance.exam_id)
+
+
+@receiver(post_save, sender=Question)
+def question_search_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_questions([instance.id])
+
+
+@receiver(post_save, sender=Question)
+def question_duplicates_changed(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    # Полосы MinHash зависят только от текста вопроса.
+    if raw or (not created and update_fields is not None and 'prompt' not in update_fields):
+        return
+    duplicates.index_questions([instance.id])
+
+
+@receiver(post_delete, sender=Question)
+def question_search_deleted(sender, instance, **kwargs):
+    search.remove_questions([instance.id])
+
+
+@receiver(post_save, sender=Option)
+@receiver(post_delete, sender=Option)
+def option_changed(sender, instance, **kwargs):
+    exam_id = Question.objects.filter(id=instance.question_id).values_list('exam_id', flat=True).first()
+    touch_exam(exam_id)
+
+
+@receiver(post_save, sender=Option)
+@receiver(post_delete, sender=Option)
+def option_search_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_questions([instance.question_id])
+
+
+@receiver(post_delete, sender=Participant)
+def participant_deleted(sender, instance, **kwargs):
+    # Кэш имя -> id не должен отдавать удаленного участника (в других воркерах он живет до MAX_CACHED).
+    participants.clear_cache()
@@ -0,0 +1,111 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.db import connection
+
+from .db import run_write
+from .export import attempt_queryset
+from .models import AttemptAnswer, SimilarPair
+from .packing import unpack_answers, unpack_flags
+from .similarity_index import find_pairs
+
+logger = logging.getLogger(__name__)
+
+# Отчет о похожих листах ответов для проверяющих: листы экзамена читаются из БД здесь,
+# поиск пар (similarity_index.find_pairs) — чистые вычисления, которые для нескольких
+# экзаменов идут параллельно в пуле процессов. Отчет экзамена заменяется целиком.
+
+
+def load_sheets(exam_id: int, date_from=None, date_to=None, fixed_form_only: bool = False) -> list[tuple]:
+    """(attempt_id, participant_id, [(question_id, option_id | None, is_correct), ...]) для обоих режимов хранения.
+
+    fixed_form_only — без адаптивных попыток, где у каждого свой набор вопросов.
+    """
+    attempts = attempt_queryset(exam_id, date_from, date_to)
+    if fixed_form_only:
+        attempts = attempts.filter(ability__isnull=True)
+    sheets = {}
+    for attempt_id, participant_id, answers_packed, correct_mask in attempts.values_list(
+        'id', 'participant_id', 'answers_packed', 'correct_mask'
+    ).iterator(chunk_size=2000):
+        answers = []
+        if answers_packed is not None:
+            pairs = unpack_answers(answers_packed)
+            flags = unpack_flags(correct_mask, len(pairs))
+            answers = [(question_id, option_id, flag) for (question_id, option_id), flag in zip(pairs, flags)]
+        sheets[attempt_id] = (attempt_id, participant_id, answers)
+
+    rows = AttemptAnswer.objects.filter(
+        attempt_id__in=attempts.filter(answers_packed__isnull=True).values('id')
+    ).values_list('attempt_id', 'question_id', 'selected_option_id', 'is_correct')
+    for attempt_id, question_id, option_id, is_correct in rows.iterator(chunk_size=5000):
+        sheets[attempt_id][2].append((question_id, option_id, is_correct))
+    return list(sheets.values())
+
+
+def _save(exam_id: int, pairs) -> None:
+    SimilarPair.objects.filter(exam_id=exam_id).delete()
+    SimilarPair.objects.bulk_create(
+        [
+            SimilarPair(
+                exam_id=exam_id,
+                first_attempt_id=pair.first_attempt_id,
+                second_attempt_id=pair.second_attempt_id,
+                shared_wrong=pair.shared_wrong,
+                wrong_similarity=pair.wrong_similarity,
+                agreement=pair.agreement,
+                score=pair.score,
+            )
+            for pair in pairs
+        ],
+        batch_size=1000,
+    )
+
+
+def analyze_exams(exam_ids, jobs: int = 1, date_from=None, date_to=None, progress=None, **options) -> dict[int, list]:
+    """Ищет похожие листы по каждому экзамену и сохраняет отчеты; options — параметры find_pairs.
+
+    progress(exam_id, sheets_count, candidates_count, pairs) вызывается по готовности экзамена.
+    """
+    results = {}
+
+    def done(exam_id, sheets_count, pairs, candidates_count):
+        run_write(_save, exam_id, pairs)
+        results[exam_id] = pairs
+        if progress is not None:
+            progress(exam_id, sheets_count, candidates_count, pairs)
+
+    exam_ids = list(exam_ids)
+    if jobs <= 1 or len(exam_ids) < 2:
+        for exam_id in exam_ids:
+            sheets = load_sheets(exam_id, date_from, date_to)
+            done(exam_id, len(sheets), *find_pairs(sheets, **options))
+        return results
+
+    # spawn: процессы пула не наследуют соединения с БД и не поднимают Django.
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(jobs, len(exam_ids)), mp_context=context) as pool:
+        futures = {}
+        for exam_id in exam_ids:
+            sheets = load_sheets(exam_id, date_from, date_to)
+            futures[pool.submit(find_pairs, sheets, **options)] = (exam_id, len(sheets))
+        for future in as_completed(futures):
+            exam_id, sheets_count = futures[future]
+            done(exam_id, sheets_count, *future.result())
+    return results
+
+
+def analyze_in_background(exam_ids) -> threading.Thread:
+    def target():
+        try:
+            analyze_exams(exam_ids)
+        except Exception:
+            logger.exception('Similarity analysis failed for exams %s', exam_ids)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=target, name='similarity', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,144 @@
+import math
+import random
+from typing import NamedTuple
+
+# Поиск похожих листов ответов внутри экзамена без перебора всех пар.
+# Признак списывания — совпадающие неверные ответы: верные и так совпадают у сильных участников.
+# Неверные ответы листа — множество позиций (вопрос, вариант). Кандидатов в пары находит
+# MinHash LSH по этим множествам, а точная оценка пары — битовые операции над int,
+# где каждая позиция — один бит. Модуль не импортирует Django: find_pairs выполняется
+# в процессах пула (см. similarity.py) и получает только простые данные.
+PRIME = (1 << 61) - 1
+DEFAULT_BANDS = 20
+DEFAULT_ROWS = 4
+DEFAULT_MIN_SHARED_WRONG = 3
+DEFAULT_MIN_SIMILARITY = 0.6
+# Корзина LSH крупнее этого — массовое заблуждение, а не списывание: пары из нее не перебираются.
+MAX_BUCKET_SIZE = 500
+
+
+class Sheet(NamedTuple):
+    attempt_id: int
+    participant_id: int
+    selected: int
+    answered: int
+    wrong: int
+    wrong_positions: tuple[int, ...]
+
+
+class Pair(NamedTuple):
+    first_attempt_id: int
+    second_attempt_id: int
+    shared_wrong: int
+    wrong_similarity: float
+    agreement: float
+    score: float
+
+
+def encode(sheets) -> list[Sheet]:
+    """sheets — (attempt_id, participant_id, [(question_id, option_id | None, is_correct), ...])."""
+    positions = {}
+    questions = {}
+    encoded = []
+    for attempt_id, participant_id, answers in sheets:
+        selected = answered = wrong = 0
+        wrong_positions = []
+        for question_id, option_id, is_correct in answers:
+            if option_id is None:
+                continue
+            position = positions.setdefault((question_id, option_id), len(positions))
+            selected |= 1 << position
+            answered |= 1 << questions.setdefault(question_id, len(questions))
+            if not is_correct:
+                wrong |= 1 << position
+                wrong_positions.append(position)
+        encoded.append(Sheet(attempt_id, participant_id, selected, answered, wrong, tuple(wrong_positions)))
+    return encoded
+
+
+def _bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _rarity_weights(sheets: list[Sheet]) -> dict[int, float]:
+    # Общая редкая ошибка весит больше популярной: -log2 доли листов с этим неверным ответом.
+    counts = {}
+    for sheet in sheets:
+        for position in sheet.wrong_positions:
+            counts[position] = counts.get(position, 0) + 1
+    total = len(sheets)
+    return {position: math.log2(total / count) for position, count in counts.items()}
+
+
+def candidate_pairs(sheets: list[Sheet], min_wrong: int, bands: int, rows: int, seed: int = 0) -> set[tuple[int, int]]:
+    """Индексы листов, у которых совпала хотя бы одна полоса MinHash-подписи."""
+    rng = random.Random(seed)
+    coefficients = [(rng.randrange(1, PRIME), rng.randrange(PRIME)) for _ in range(bands * rows)]
+    position_hashes = {}
+    buckets = {}
+    for index, sheet in enumerate(sheets):
+        if len(sheet.wrong_positions) < min_wrong:
+            continue
+        vectors = []
+        for position in sheet.wrong_positions:
+            vector = position_hashes.get(position)
+            if vector is None:
+                vector = position_hashes[position] = tuple((a * position + b) % PRIME for a, b in coefficients)
+            vectors.append(vector)
+        signature = tuple(map(min, zip(*vectors)))
+        for band in range(bands):
+            buckets.setdefault((band, signature[band * rows : (band + 1) * rows]), []).append(index)
+
+    candidates = set()
+    for members in buckets.values():
+        if len(members) < 2 or len(members) > MAX_BUCKET_SIZE:
+            continue
+        for offset, first in enumerate(members):
+            for second in members[offset + 1 :]:
+                candidates.add((first, second))
+    return candidates
+
+
+def find_pairs(
+    sheets,
+    min_shared_wrong: int = DEFAULT_MIN_SHARED_WRONG,
+    min_similarity: float = DEFAULT_MIN_SIMILARITY,
+    bands: int = DEFAULT_BANDS,
+    rows: int = DEFAULT_ROWS,
+) -> tuple[list[Pair], int]:
+    """Пары похожих листов по убыванию оценки и число проверенных кандидатов."""
+    sheets = encode(sheets)
+    weights = _rarity_weights(sheets)
+    candidates = candidate_pairs(sheets, min_shared_wrong, bands, rows)
+    pairs = []
+    for first_index, second_index in candidates:
+        first, second = sheets[first_index], sheets[second_index]
+        if first.participant_id == second.participant_id:
+            # Пересдача тем же человеком.
+            continue
+        shared = first.wrong & second.wrong
+        shared_wrong = shared.bit_count()
+        if shared_wrong < min_shared_wrong:
+            continue
+        similarity = shared_wrong / (first.wrong | second.wrong).bit_count()
+        if similarity < min_similarity:
+            continue
+        both_answered = (first.answered & second.answered).bit_count()
+        agreement = (first.selected & second.selected).bit_count() / both_answered if both_answered else 0.0
+        if first.attempt_id > second.attempt_id:
+            first, second = second, first
+        pairs.append(
+            Pair(
+                first.attempt_id,
+                second.attempt_id,
+                shared_wrong,
+                round(similarity, 4),
+                round(agreement, 4),
+                round(sum(weights[position] for position in _bits(shared)), 2),
+            )
+        )
+    pairs.sort(key=lambda pair: (-pair.score, pair.first_attempt_id, pair.second_attempt_id))
+    return pairs, len(candidates)
@@ -0,0 +1,44 @@
+import hashlib
+import zlib
+
+from .db import run_write
+from .models import Exam, ExamSnapshot
+from .reviews import encode
+
+# Опубликованный экзамен хранится неизменяемыми версиями: публичная карточка экзамена
+# (как в API) и ключ ответов сжатым JSON в одной строке. Версия — хэш содержимого,
+# поэтому повторная публикация без изменений не создает новый снимок.
+COMPRESSION_LEVEL = 6
+
+
+def build_document(exam: Exam) -> dict:
+    """exam — с prefetch_related('questions__options')."""
+    from .serializers import ExamDetailSerializer
+
+    key = {}
+    for question in exam.questions.all():
+        correct_option = next((option for option in question.options.all() if option.is_correct), None)
+        key[str(question.id)] = correct_option.id if correct_option else None
+    return {'exam': ExamDetailSerializer(exam).data, 'key': key}
+
+
+def _store(exam: Exam, version: str, content: bytes) -> ExamSnapshot:
+    snapshot, _ = ExamSnapshot.objects.get_or_create(exam_id=exam.id, version=version, defaults={'content': content})
+    # Правка во время сборки меняет updated_at: устаревший снимок не становится текущим.
+    Exam.objects.filter(id=exam.id, updated_at=exam.updated_at).update(snapshot=snapshot)
+    return snapshot
+
+
+def publish(exam_id: int) -> ExamSnapshot | None:
+    """Собирает снимок из текущих строк вопросов и делает его текущим для экзамена."""
+    exam = Exam.objects.filter(id=exam_id).prefetch_related('questions__options').first()
+    if exam is None:
+        return None
+    raw = encode(build_document(exam))
+    version = hashlib.sha1(raw).hexdigest()[:16]
+    return run_write(_store, exam, version, zlib.compress(raw, COMPRESSION_LEVEL))
+
+
+def current(exam: Exam) -> ExamSnapshot | None:
+    """exam — с select_related('snapshot'); снимок публикуется, если после правки его еще нет."""
+    return exam.snapshot or publish(exam.id)
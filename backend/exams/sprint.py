@@ -0,0 +1,163 @@
+import random
+import threading
+from array import array
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import F
+from django.utils import timezone
+
+from .catalog import catalog
+from .db import run_write
+from .models import Exam, Option, Question, SprintResult
+
+SESSION_TOKEN_SALT = 'exams.sprint'
+# Токеном можно завершить спринт и позже окончания времени, но не через сутки.
+SESSION_MAX_AGE_SEC = 24 * 3600
+# Запас на сеть: ответ, отправленный в последнюю секунду, еще засчитывается.
+GRACE_SEC = 5
+
+
+@dataclass(frozen=True)
+class QuestionPool:
+    version: tuple
+    # Ключ (subject, difficulty, topic), где None — «любое значение», указывает на массив id вопросов.
+    ids_by_key: dict[tuple, array]
+    payload_by_id: dict[int, dict]
+    answer_by_id: dict[int, tuple[int | None, str]]
+
+    def sample(self, subject=None, difficulty=None, topic=None, exclude=None) -> dict | None:
+        ids = self.ids_by_key.get((subject or None, difficulty or None, topic or None))
+        if not ids:
+            return None
+        question_id = ids[random.randrange(len(ids))]
+        if question_id == exclude and len(ids) > 1:
+            question_id = ids[random.randrange(len(ids))]
+        return self.payload_by_id[question_id]
+
+
+def build_pool(version) -> QuestionPool:
+    exams = dict(Exam.objects.filter(is_active=True).values_list('id', 'subject'))
+    questions = Question.objects.filter(exam_id__in=exams).values_list(
+        'id', 'exam_id', 'prompt', 'explanation', 'topic', 'difficulty'
+    )
+    options_by_question: dict[int, list] = {}
+    correct_by_question: dict[int, int] = {}
+    options = Option.objects.filter(question__exam_id__in=exams).values_list(
+        'question_id', 'id', 'text', 'order', 'is_correct'
+    )
+    for question_id, option_id, text, order, is_correct in options.order_by('question_id', 'order', 'id'):
+        options_by_question.setdefault(question_id, []).append({'id': option_id, 'text': text, 'order': order})
+        if is_correct:
+            correct_by_question[question_id] = option_id
+
+    ids_by_key: dict[tuple, array] = {}
+    payload_by_id = {}
+    answer_by_id = {}
+    for question_id, exam_id, prompt, explanation, topic, difficulty in questions.order_by('id'):
+        question_options = options_by_question.get(question_id)
+        if not question_options:
+            continue
+        subject = exams[exam_id]
+        payload_by_id[question_id] = {
+            'id': question_id,
+            'exam_id': exam_id,
+            'subject': subject,
+            'topic': topic,
+            'difficulty': difficulty,
+            'prompt': prompt,
+            'options': question_options,
+        }
+        answer_by_id[question_id] = (correct_by_question.get(question_id), explanation)
+        for key_subject in (None, subject):
+            for key_difficulty in (None, difficulty):
+                for key_topic in (None, topic):
+                    ids_by_key.setdefault((key_subject, key_difficulty, key_topic), array('q')).append(question_id)
+
+    return QuestionPool(version, ids_by_key, payload_by_id, answer_by_id)
+
+
+class SprintPoolCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool: QuestionPool | None = None
+
+    def get(self) -> QuestionPool:
+        version = catalog.ensure_fresh()
+        pool = self._pool
+        if pool is not None and pool.version == version:
+            return pool
+        with self._lock:
+            if self._pool is None or self._pool.version != version:
+                self._pool = build_pool(version)
+            return self._pool
+
+
+sprint_pool = SprintPoolCache()
+
+
+# Спринт на счет: результат — строка SprintResult, которую сервер создает при старте и обновляет
+# при каждой проверке. В подписанном токене — id результата, выданный вопрос и номер шага;
+# шаг засчитывается условным UPDATE по total, поэтому повтор старого токена (ответ уже известен
+# из проверки) ничего не добавляет, а клиент не присылает ни счет, ни число ответов.
+
+
+def session_token(session: dict) -> str:
+    return signing.TimestampSigner(salt=SESSION_TOKEN_SALT).sign_object(session)
+
+
+def read_session_token(token: str) -> dict | None:
+    try:
+        return signing.TimestampSigner(salt=SESSION_TOKEN_SALT).unsign_object(token, max_age=SESSION_MAX_AGE_SEC)
+    except signing.BadSignature:
+        return None
+
+
+def start(pool: QuestionPool, participant_id: int, user_name: str, filters) -> dict | None:
+    """Создает незавершенный результат и выдает первый вопрос; None — под фильтры нет вопросов."""
+    subject, difficulty, topic = filters
+    question = pool.sample(subject, difficulty, topic)
+    if question is None:
+        return None
+    result = run_write(
+        SprintResult.objects.create,
+        participant_id=participant_id,
+        user_name=user_name,
+        subject=subject or '',
+        started_at=timezone.now(),
+    )
+    session = {
+        'result': result.id,
+        'filters': [subject, difficulty, topic],
+        'started': result.started_at.timestamp(),
+        'question': question['id'],
+        'step': 0,
+    }
+    return {'token': session_token(session), 'question': question, 'duration_seconds': settings.SPRINT_DURATION_SEC}
+
+
+def is_over(session: dict, now) -> bool:
+    return now.timestamp() > session['started'] + settings.SPRINT_DURATION_SEC + GRACE_SEC
+
+
+def record_answer(session: dict, is_correct: bool) -> bool:
+    """Засчитывает ответ на вопрос шага session['step']; False — шаг уже засчитан или спринт завершен."""
+    updated = SprintResult.objects.filter(id=session['result'], total=session['step'], is_finished=False).update(
+        total=F('total') + 1, score=F('score') + int(is_correct)
+    )
+    return updated == 1
+
+
+def advance(pool: QuestionPool, session: dict) -> dict:
+    """Следующий вопрос и токен следующего шага."""
+    question = pool.sample(*session['filters'], exclude=session['question'])
+    session = {**session, 'question': question['id'] if question else None, 'step': session['step'] + 1}
+    return {'token': session_token(session), 'question': question}
+
+
+def finish(session: dict) -> SprintResult | None:
+    SprintResult.objects.filter(id=session['result'], is_finished=False).update(
+        is_finished=True, finished_at=timezone.now()
+    )
+    return SprintResult.objects.filter(id=session['result']).first()
@@ -0,0 +1,113 @@
+import re
+
+# Алгоритм Snowball для русского языка. Нужен для SQLite FTS5, где нет русского
+# стемминга: документы и запросы индексируются уже в виде основ слов.
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND_1 = ('вшись', 'вши', 'в')
+PERFECTIVE_GERUND_2 = ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв')
+ADJECTIVE = (
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое', 'ей', 'ий', 'ый', 'ой',
+    'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE_1 = ('ем', 'нн', 'вш', 'ющ', 'щ')
+PARTICIPLE_2 = ('ивш', 'ывш', 'ующ')
+REFLEXIVE = ('ся', 'сь')
+VERB_1 = ('ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'й', 'л', 'н')
+VERB_2 = (
+    'ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило', 'ыло', 'ено', 'ует', 'уют',
+    'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю',
+)
+NOUN = (
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие', 'ье', 'еи', 'ии', 'ей', 'ой',
+    'ий', 'ям', 'ем', 'ам', 'ом', 'ах', 'ях', 'ию', 'ью', 'ия', 'ья', 'а', 'е', 'и', 'й', 'о', 'у',
+    'ы', 'ь', 'ю', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _regions(word: str) -> tuple[int, int]:
+    """Возвращает начала областей RV и R2."""
+    rv = len(word)
+    for index, char in enumerate(word):
+        if char in VOWELS:
+            rv = index + 1
+            break
+
+    def after_non_vowel_following_vowel(start: int) -> int:
+        for index in range(start + 1, len(word)):
+            if word[index] not in VOWELS and word[index - 1] in VOWELS:
+                return index + 1
+        return len(word)
+
+    r1 = after_non_vowel_following_vowel(0)
+    r2 = after_non_vowel_following_vowel(r1)
+    return rv, r2
+
+
+def _strip(word: str, start: int, endings, preceded_by: str = '') -> str | None:
+    region = word[start:]
+    for ending in endings:
+        if not region.endswith(ending):
+            continue
+        if preceded_by:
+            if len(region) <= len(ending) or region[-len(ending) - 1] not in preceded_by:
+                continue
+        return word[: -len(ending)]
+    return None
+
+
+def _strip_any(word: str, start: int, group_1, group_2) -> str | None:
+    stripped = _strip(word, start, group_2)
+    if stripped is None:
+        stripped = _strip(word, start, group_1, preceded_by='ая')
+    return stripped
+
+
+def stem(word: str) -> str:
+    word = word.lower().replace('ё', 'е')
+    rv, r2 = _regions(word)
+    if rv >= len(word):
+        return word
+
+    # Шаг 1
+    stripped = _strip_any(word, rv, PERFECTIVE_GERUND_1, PERFECTIVE_GERUND_2)
+    if stripped is not None:
+        word = stripped
+    else:
+        word = _strip(word, rv, REFLEXIVE) or word
+        adjective = _strip(word, rv, ADJECTIVE)
+        if adjective is not None:
+            word = _strip_any(adjective, rv, PARTICIPLE_1, PARTICIPLE_2) or adjective
+        else:
+            word = _strip_any(word, rv, VERB_1, VERB_2) or _strip(word, rv, NOUN) or word
+
+    # Шаг 2
+    if word[rv:].endswith('и'):
+        word = word[:-1]
+
+    # Шаг 3
+    word = _strip(word, r2, DERIVATIONAL) or word
+
+    # Шаг 4
+    if word[rv:].endswith('нн'):
+        word = word[:-1]
+    else:
+        superlative = _strip(word, rv, SUPERLATIVE)
+        if superlative is not None:
+            word = superlative[:-1] if superlative[rv:].endswith('нн') else superlative
+        elif word[rv:].endswith('ь'):
+            word = word[:-1]
+    return word
+
+
+def stem_text(text: str) -> str:
+    return ' '.join(stem(token) for token in _WORD_RE.findall(text or ''))
+
+
+def stem_tokens(text: str) -> list[str]:
+    return [stem(token) for token in _WORD_RE.findall(text or '')]
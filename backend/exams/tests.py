@@ -1,3 +1,771 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import multiprocessing
+import tempfile
+import threading
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from exams import duplicates, participants, purge, rollups, search
+from exams.events import EventPoller, Subscription, broadcaster
+from exams.catalog import catalog
+from exams.models import (
+    ArchivedAttemptStat,
+    Attempt,
+    AttemptAnswer,
+    Exam,
+    ExamDailyStat,
+    Option,
+    Participant,
+    Question,
+    SprintResult,
+)
+from exams.ranking import leaderboard
+from exams.rescoring import rescore_exam
+from exams.throttling import limiter
+
+STAT_FIELDS = tuple(
+    field.name for field in ExamDailyStat._meta.concrete_fields if field.name not in ('id', 'created_at', 'updated_at')
+)
+
+PROCESSES = 4
+THREADS = 4
+SUBMITS_PER_THREAD = 5
+
+
+def _submit_worker(exam_id: int, answers: dict, worker: int, results) -> None:
+    # Отдельный процесс: свое соединение с файлом БД, как у воркера gunicorn.
+    outcomes = []
+    lock = threading.Lock()
+
+    def submit(thread: int):
+        client = Client(HTTP_HOST='localhost')
+        try:
+            for index in range(SUBMITS_PER_THREAD):
+                user_name = f'load-{worker}-{thread}-{index}'
+                try:
+                    response = client.post(
+                        f'/api/exams/{exam_id}/submit/',
+                        json.dumps({'user_name': user_name, 'answers': answers, 'duration_seconds': 60}),
+                        content_type='application/json',
+                    )
+                    outcome = (user_name, response.status_code, response.content.decode()[:200])
+                except Exception as exc:
+                    outcome = (user_name, None, repr(exc))
+                with lock:
+                    outcomes.append(outcome)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=submit, args=(thread,)) for thread in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    connections.close_all()
+    results.put(outcomes)
+
+
+def make_exam(title='Экзамен', questions=3, options=4, **fields) -> Exam:
+    """Экзамен с вопросами; верный вариант каждого вопроса — первый."""
+    exam = Exam.objects.create(title=title, subject=fields.pop('subject', 'Тесты'), **fields)
+    for q_order in range(1, questions + 1):
+        question = Question.objects.create(exam=exam, prompt=f'{title}: вопрос {q_order}', topic='Тема', order=q_order)
+        Option.objects.bulk_create(
+            [
+                Option(question=question, text=f'Вариант {o_order}', is_correct=o_order == 1, order=o_order)
+                for o_order in range(1, options + 1)
+            ]
+        )
+    catalog.invalidate()
+    return exam
+
+
+def answers_for(exam: Exam, correct: int) -> dict:
+    """Ответы на все вопросы экзамена: первые correct — верные, остальные — неверные."""
+    answers = {}
+    for index, question in enumerate(exam.questions.order_by('order')):
+        option = question.options.filter(is_correct=index < correct).order_by('order').first()
+        answers[str(question.id)] = option.id
+    return answers
+
+
+def submit(client, exam: Exam, user_name: str, correct: int, duration_seconds: int = 60, **fields):
+    response = client.post(
+        f'/api/exams/{exam.id}/submit/',
+        json.dumps(
+            {
+                'user_name': user_name,
+                'answers': answers_for(exam, correct),
+                'duration_seconds': duration_seconds,
+                **fields,
+            }
+        ),
+        content_type='application/json',
+    )
+    assert response.status_code == 201, response.content
+    return response
+
+
+def daily_stats(exam: Exam) -> list[dict]:
+    return list(ExamDailyStat.objects.filter(exam=exam).order_by('day').values(*STAT_FIELDS))
+
+
+def admin_form_data(response) -> dict:
+    """POST-данные формы админки со всеми inline, заполненные текущими значениями."""
+    data = {}
+    forms = [response.context['adminform'].form]
+    for inline in response.context['inline_admin_formsets']:
+        formset = inline.formset
+        forms.append(formset.management_form)
+        forms.extend(formset.forms)
+    for form in forms:
+        for field in form:
+            value = field.value()
+            if value is True:
+                data[field.html_name] = 'on'
+            elif value is not None and value is not False:
+                data[field.html_name] = value
+    return data
+
+
+class QuestionAdminTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.force_login(user)
+        self.exam = make_exam()
+
+    def test_change_question_publishes_exam_snapshot(self):
+        question = self.exam.questions.order_by('order').first()
+        url = reverse('admin:exams_question_change', args=[question.id])
+        data = admin_form_data(self.client.get(url))
+        data['prompt'] = 'Новая формулировка'
+
+        response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, 302)
+        self.exam.refresh_from_db()
+        self.assertIsNotNone(self.exam.snapshot)
+        prompts = [item['prompt'] for item in self.exam.snapshot.document['exam']['questions']]
+        self.assertIn('Новая формулировка', prompts)
+
+    def test_add_question_with_options(self):
+        url = reverse('admin:exams_question_add')
+        data = admin_form_data(self.client.get(url, {'exam': self.exam.id}))
+        data.update({'topic': 'Тема', 'prompt': 'Добавленный вопрос'})
+        for index, text in enumerate(('Да', 'Нет', 'Не знаю', 'Иногда')):
+            data[f'options-{index}-text'] = text
+            data[f'options-{index}-order'] = index + 1
+        data['options-0-is_correct'] = 'on'
+
+        response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, 302)
+        question = Question.objects.get(prompt='Добавленный вопрос')
+        self.assertEqual(question.options.count(), 4)
+        self.assertEqual(list(question.options.filter(is_correct=True).values_list('text', flat=True)), ['Да'])
+        self.exam.refresh_from_db()
+        self.assertEqual(len(self.exam.snapshot.document['key']), 4)
+
+
+@override_settings(
+    RATE_LIMIT_ENABLED=True,
+    RATE_LIMIT_BACKEND='memory',
+    RATE_LIMIT_RATE=0.001,
+    RATE_LIMIT_BURST=6,
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 2},
+)
+class TokenBucketThrottleTests(TestCase):
+    # /api/leaderboard/ стоит 2 токена: запаса 6 хватает на три запроса.
+    url = '/api/leaderboard/'
+
+    def setUp(self):
+        limiter._store = None
+
+    def get(self, client_ip: str, user_name: str | None = None):
+        params = {'user_name': user_name} if user_name else {}
+        return self.client.get(self.url, params, HTTP_X_FORWARDED_FOR=f'{client_ip}, 10.0.0.1', REMOTE_ADDR='10.0.0.2')
+
+    def test_new_user_name_does_not_reset_ip_bucket(self):
+        for index in range(3):
+            self.assertEqual(self.get('203.0.113.5', f'user-{index}').status_code, 200)
+        response = self.get('203.0.113.5', 'user-new')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_clients_behind_proxies_have_separate_ip_buckets(self):
+        for _ in range(3):
+            self.assertEqual(self.get('203.0.113.5').status_code, 200)
+        self.assertEqual(self.get('203.0.113.5').status_code, 429)
+        self.assertEqual(self.get('203.0.113.6').status_code, 200)
+
+    def test_user_bucket_is_shared_by_name_spellings_across_ips(self):
+        for index, user_name in enumerate(('Иван Петров', 'иван  петров', 'ИВАН ПЕТРОВ')):
+            self.assertEqual(self.get(f'203.0.113.{index + 1}', user_name).status_code, 200)
+        self.assertEqual(self.get('203.0.113.9', 'Иван петров').status_code, 429)
+        self.assertEqual(self.get('203.0.113.9').status_code, 200)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class ParticipantTests(TestCase):
+    def setUp(self):
+        participants.clear_cache()
+        leaderboard.rebuild()
+        self.exam = make_exam()
+
+    def test_name_spellings_resolve_to_one_participant(self):
+        ids = participants.resolve_many(['Иван Петров', '  иван   петров ', 'ИВАН\tПЕТРОВ'])
+
+        self.assertEqual(len(set(ids.values())), 1)
+        self.assertEqual(Participant.objects.get().key, 'иван петров')
+        participants.clear_cache()
+        self.assertEqual(participants.lookup('Иван петров'), ids['Иван Петров'])
+
+    def test_stats_leaderboard_and_learning_queue_follow_participant(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            submit(self.client, self.exam, 'Иван Петров', 3)
+            submit(self.client, self.exam, 'иван  петров', 1)
+            submit(self.client, self.exam, 'Мария', 2)
+        participant_id = participants.lookup('ИВАН ПЕТРОВ')
+
+        attempts = self.client.get('/api/stats/attempts/', {'user_name': 'ИВАН ПЕТРОВ'}).json()
+        self.assertEqual(len(attempts), 2)
+
+        stats = {row['participant_id']: row for row in self.client.get('/api/stats/users/').json()}
+        self.assertEqual(len(stats), 2)
+        self.assertEqual(stats[participant_id]['attempts_count'], 2)
+        self.assertEqual(stats[participant_id]['best_score'], 100)
+
+        rank = self.client.get('/api/leaderboard/rank/', {'user_name': 'Иван петров'}).json()
+        self.assertEqual(rank['total'], 2)
+        [own] = [row for row in rank['entries'] if row['rank'] == rank['rank']]
+        self.assertEqual(own['participant_id'], participant_id)
+
+        # Во второй попытке два неверных ответа: очередь одна на все написания имени.
+        for user_name in ('Иван Петров', 'иван петров'):
+            queue = self.client.get('/api/learning/next/', {'user_name': user_name}).json()
+            self.assertEqual(len(queue), 2)
+        self.assertEqual(self.client.get('/api/learning/next/', {'user_name': 'Мария'}).json()[0]['lapses'], 1)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class SprintSessionTests(TestCase):
+    def setUp(self):
+        # Кэш ключ -> id участника переживает откат транзакции теста.
+        participants.clear_cache()
+        self.exam = make_exam(questions=3)
+        self.correct = dict(Option.objects.filter(is_correct=True).values_list('question_id', 'id'))
+
+    def post(self, url: str, data: dict):
+        return self.client.post(url, json.dumps(data), content_type='application/json')
+
+    def start(self):
+        response = self.post('/api/sprint/start/', {'user_name': 'Иван'})
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def check(self, step: dict, correct: bool = True):
+        question_id = step['question']['id']
+        option_id = self.correct[question_id] if correct else self.correct[question_id] + 1
+        return self.post('/api/sprint/check/', {'token': step['token'], 'question_id': question_id, 'option_id': option_id})
+
+    def test_result_is_counted_by_server(self):
+        step = self.start()
+        for correct in (True, True, False):
+            response = self.check(step, correct)
+            self.assertEqual(response.status_code, 200)
+            step = response.json()
+
+        response = self.post('/api/sprint/results/', {'token': step['token'], 'score': 100, 'total': 100})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['score'], response.json()['total']), (2, 3))
+        self.assertEqual([item['score'] for item in self.client.get('/api/sprint/results/').json()], [2])
+
+    def test_replayed_token_is_not_counted_twice(self):
+        step = self.start()
+        self.assertEqual(self.check(step).status_code, 200)
+
+        self.assertEqual(self.check(step).status_code, 409)
+        result = SprintResult.objects.get()
+        self.assertEqual((result.score, result.total), (1, 1))
+
+    def test_only_current_question_is_accepted(self):
+        step = self.start()
+        other = Question.objects.exclude(id=step['question']['id']).first()
+
+        response = self.post(
+            '/api/sprint/check/', {'token': step['token'], 'question_id': other.id, 'option_id': self.correct[other.id]}
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(SprintResult.objects.get().total, 0)
+
+    def test_answers_after_deadline_are_rejected(self):
+        step = self.start()
+        with override_settings(SPRINT_DURATION_SEC=-60):
+            self.assertEqual(self.check(step).status_code, 409)
+        self.assertEqual(SprintResult.objects.get().total, 0)
+
+    def test_forged_token_is_rejected(self):
+        step = self.start()
+        response = self.post('/api/sprint/results/', {'token': step['token'] + 'x'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_unfinished_sprint_is_not_listed(self):
+        self.check(self.start())
+        self.assertEqual(self.client.get('/api/sprint/results/').json(), [])
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class ArchiveAttemptsTests(TestCase):
+    def setUp(self):
+        participants.clear_cache()
+        self.exam = make_exam()
+        for user_name, correct, duration in (('Иван', 3, 60), ('иван', 1, 90), ('Мария', 2, 30)):
+            submit(self.client, self.exam, user_name, correct, duration)
+        Attempt.objects.update(finished_at=timezone.now() - timedelta(days=400))
+        self.output_dir = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def archive(self):
+        call_command('archive_attempts', days=365, output_dir=str(self.output_dir), batch_size=2, stdout=io.StringIO())
+
+    def test_archive_moves_attempts_to_file_and_stats(self):
+        attempts = {row['id']: row for row in Attempt.objects.values('id', 'user_name', 'score', 'duration_seconds')}
+        ivan = [row for row in attempts.values() if row['user_name'].lower() == 'иван']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.archive()
+
+        [archive] = self.output_dir.iterdir()
+        with gzip.open(archive, 'rt', encoding='utf-8') as source:
+            records = [json.loads(line) for line in source]
+        self.assertEqual(sorted(record['id'] for record in records), sorted(attempts))
+        self.assertTrue(all(len(record['answers']) == 3 for record in records))
+        self.assertFalse(Attempt.objects.exists())
+        self.assertFalse(AttemptAnswer.objects.exists())
+
+        stat = ArchivedAttemptStat.objects.get(participant_id=participants.lookup('ИВАН'))
+        self.assertEqual(stat.attempts_count, 2)
+        self.assertEqual(stat.best_score, max(row['score'] for row in ivan))
+        self.assertEqual(stat.score_sum, sum(row['score'] for row in ivan))
+        self.assertEqual(stat.duration_sum, 150)
+        self.assertEqual(ArchivedAttemptStat.objects.get(participant_id=participants.lookup('Мария')).attempts_count, 1)
+
+    def test_failed_batch_appends_nothing(self):
+        with mock.patch.object(ArchivedAttemptStat.objects, 'get_or_create', side_effect=RuntimeError('boom')):
+            with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+                self.archive()
+
+        self.assertEqual(list(self.output_dir.iterdir()), [])
+        self.assertEqual(Attempt.objects.count(), 3)
+        self.assertFalse(ArchivedAttemptStat.objects.exists())
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class IdempotentSubmitTests(TestCase):
+    def setUp(self):
+        participants.clear_cache()
+        cache.clear()
+        self.exam = make_exam()
+
+    def test_repeated_submission_key_replays_saved_attempt(self):
+        first = submit(self.client, self.exam, 'Иван', 2, submission_key='kiosk-0001')
+
+        replayed = submit(self.client, self.exam, 'Иван', 3, submission_key='kiosk-0001')
+        cache.clear()
+        from_db = submit(self.client, self.exam, 'Иван', 3, submission_key='kiosk-0001')
+
+        self.assertEqual(Attempt.objects.count(), 1)
+        self.assertNotIn('Idempotent-Replayed', first)
+        for response in (replayed, from_db):
+            self.assertEqual(response['Idempotent-Replayed'], 'true')
+            self.assertEqual(response.json()['attempt'], first.json()['attempt'])
+
+    def test_submission_key_of_another_user_is_rejected(self):
+        submit(self.client, self.exam, 'Иван', 2, submission_key='kiosk-0001')
+
+        response = self.client.post(
+            f'/api/exams/{self.exam.id}/submit/',
+            json.dumps({'user_name': 'Мария', 'answers': answers_for(self.exam, 3), 'submission_key': 'kiosk-0001'}),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Attempt.objects.count(), 1)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class RescoreTests(TestCase):
+    def setUp(self):
+        participants.clear_cache()
+        self.exam = make_exam()
+
+    def test_fixed_answer_key_rescores_history(self):
+        submit(self.client, self.exam, 'Иван', 3)
+        question = self.exam.questions.order_by('order').first()
+        first, second = question.options.order_by('order')[:2]
+        first.is_correct = False
+        first.save()
+        second.is_correct = True
+        second.save()
+
+        run = rescore_exam(self.exam.id)
+
+        self.assertEqual(run.changed_attempts, 1)
+        attempt = Attempt.objects.get()
+        self.assertEqual((attempt.correct_count, attempt.score), (2, 67))
+        [stat] = ExamDailyStat.objects.filter(exam=self.exam)
+        self.assertEqual((stat.score_sum, stat.passed_count), (67, 0))
+        self.assertEqual(rescore_exam(self.exam.id).changed_attempts, 0)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class BatchSubmitTests(TestCase):
+    url = '/api/attempts/batch/'
+
+    def setUp(self):
+        participants.clear_cache()
+        self.exam = make_exam()
+        self.client.force_login(get_user_model().objects.create_user('kiosk', password='kiosk', is_staff=True))
+
+    def item(self, user_name: str, **fields) -> dict:
+        return {'exam': self.exam.id, 'user_name': user_name, 'answers': answers_for(self.exam, 2), **fields}
+
+    def test_json_batch_reports_each_item(self):
+        items = [
+            self.item('Иван', submission_key='kiosk-0002'),
+            self.item('Иван', submission_key='kiosk-0002'),
+            {'exam': 999999, 'user_name': 'Петр'},
+            self.item('Мария'),
+        ]
+
+        body = self.client.post(self.url, json.dumps(items), content_type='application/json').json()
+
+        self.assertEqual((body['created'], body['duplicate'], body['error']), (2, 1, 1))
+        self.assertEqual([result['status'] for result in body['results']], ['created', 'duplicate', 'error', 'created'])
+        self.assertEqual(body['results'][1]['attempt_id'], body['results'][0]['attempt_id'])
+        self.assertEqual(Attempt.objects.count(), 2)
+        self.assertEqual(ExamDailyStat.objects.get(exam=self.exam).attempts_count, 2)
+
+        repeated = self.client.post(self.url, json.dumps(items[:1]), content_type='application/json').json()
+        self.assertEqual(repeated['results'][0]['status'], 'duplicate')
+        self.assertEqual(Attempt.objects.count(), 2)
+
+    def test_ndjson_line_errors_do_not_stop_batch(self):
+        lines = [json.dumps(self.item('Иван')), '{broken', json.dumps(self.item('Мария'))]
+
+        body = self.client.post(self.url, '\n'.join(lines), content_type='application/x-ndjson').json()
+
+        self.assertEqual([result['status'] for result in body['results']], ['created', 'error', 'created'])
+        self.assertEqual(Attempt.objects.count(), 2)
+
+    def test_batch_requires_staff(self):
+        self.client.logout()
+        response = self.client.post(self.url, json.dumps([self.item('Иван')]), content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        participants.clear_cache()
+        self.exam = make_exam(passing_score=70)
+
+    def test_incremental_rollups_match_rebuild(self):
+        for user_name, correct, duration in (('Иван', 3, 45), ('Мария', 1, 200), ('Петр', 2, 700)):
+            submit(self.client, self.exam, user_name, correct, duration)
+        incremental = daily_stats(self.exam)
+
+        rollups.rebuild(self.exam.id)
+
+        self.assertEqual(daily_stats(self.exam), incremental)
+        stats = self.client.get(f'/api/stats/exams/{self.exam.id}/').json()
+        self.assertEqual((stats['attempts_count'], stats['passed_count']), (3, 1))
+        self.assertEqual(stats['avg_duration_seconds'], 315)
+        self.assertEqual(sum(bucket['count'] for bucket in stats['score_histogram']), 3)
+        [subject] = self.client.get('/api/stats/subjects/').json()
+        self.assertEqual((subject['subject'], subject['attempts_count']), (self.exam.subject, 3))
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class PurgeTests(TestCase):
+    def setUp(self):
+        participants.clear_cache()
+        self.kept = make_exam('Остается')
+        self.purged = make_exam('Удаляется')
+        for exam in (self.kept, self.purged):
+            submit(self.client, exam, 'Иван', 2)
+
+    def test_purge_exams_removes_exam_with_its_data(self):
+        totals = purge.purge_exams([self.purged.id])
+
+        self.assertEqual(totals[purge.label(Attempt)], 1)
+        self.assertEqual(list(Exam.objects.values_list('id', flat=True)), [self.kept.id])
+        self.assertFalse(Question.all_objects.filter(exam_id=self.purged.id).exists())
+        self.assertFalse(Option.objects.filter(question__exam_id=self.purged.id).exists())
+        self.assertEqual(list(Attempt.objects.values_list('exam_id', flat=True)), [self.kept.id])
+        self.assertEqual(list(ExamDailyStat.objects.values_list('exam_id', flat=True)), [self.kept.id])
+        self.assertEqual(Participant.objects.count(), 1)
+
+    def test_purge_attempts_keeps_exam_and_rebuilds_days(self):
+        purge.purge_attempts(exam_ids=[self.purged.id])
+
+        self.assertTrue(Exam.objects.filter(id=self.purged.id).exists())
+        self.assertEqual(self.purged.questions.count(), 3)
+        self.assertFalse(Attempt.objects.filter(exam=self.purged).exists())
+        self.assertFalse(ExamDailyStat.objects.filter(exam=self.purged).exists())
+        self.assertEqual(ExamDailyStat.objects.get(exam=self.kept).attempts_count, 1)
+
+
+class CloneExamTests(TestCase):
+    def setUp(self):
+        self.exam = make_exam()
+        self.client.force_login(get_user_model().objects.create_user('editor', password='editor', is_staff=True))
+
+    def test_clone_copies_live_questions_as_inactive_exam(self):
+        retired = self.exam.questions.order_by('order').last()
+        Question.all_objects.filter(id=retired.id).update(retired_at=timezone.now())
+
+        response = self.client.post(
+            f'/api/exams/{self.exam.id}/clone/', json.dumps({'title': 'Копия'}), content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(
+            (body['title'], body['is_active'], body['questions_count'], body['options_count']), ('Копия', False, 2, 8)
+        )
+        clone = Exam.objects.get(id=body['id'])
+        source_questions = self.exam.questions.order_by('order')
+        self.assertEqual(
+            list(clone.questions.order_by('order').values_list('prompt', flat=True)),
+            list(source_questions.values_list('prompt', flat=True)),
+        )
+        for question in clone.questions.all():
+            self.assertEqual(question.options.filter(is_correct=True).count(), 1)
+        self.assertEqual(Option.objects.filter(question__exam=self.exam).count(), 12)
+
+    def test_clone_of_missing_exam(self):
+        response = self.client.post('/api/exams/999999/clone/', '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class AdaptiveSessionTests(TestCase):
+    def setUp(self):
+        participants.clear_cache()
+        cache.clear()
+        self.exam = make_exam(questions=5, is_adaptive=True, adaptive_max_questions=3)
+        self.correct = dict(Option.objects.filter(is_correct=True).values_list('question_id', 'id'))
+
+    def post(self, action: str, data: dict):
+        return self.client.post(
+            f'/api/exams/{self.exam.id}/adaptive/{action}/', json.dumps(data), content_type='application/json'
+        )
+
+    def test_session_asks_distinct_questions_and_finishes_once(self):
+        step = self.post('start', {'user_name': 'Иван'})
+        self.assertEqual(step.status_code, 201)
+        step = step.json()
+        asked = []
+        while step['question'] is not None:
+            question_id = step['question']['id']
+            asked.append(question_id)
+            step = self.post(
+                'answer', {'token': step['token'], 'question_id': question_id, 'option_id': self.correct[question_id]}
+            ).json()
+
+        self.assertEqual(len(asked), 3)
+        self.assertEqual(len(set(asked)), 3)
+        finished = self.post('finish', {'token': step['token']})
+        self.assertEqual(finished.status_code, 201)
+        self.assertEqual(finished.json()['attempt']['correct_count'], 3)
+        replayed = self.post('finish', {'token': step['token']})
+        self.assertEqual(replayed['Idempotent-Replayed'], 'true')
+        self.assertEqual(Attempt.objects.count(), 1)
+
+    def test_answer_to_another_question_is_rejected(self):
+        step = self.post('start', {'user_name': 'Иван'}).json()
+        other = Question.objects.exclude(id=step['question']['id']).first()
+
+        response = self.post('answer', {'token': step['token'], 'question_id': other.id, 'option_id': None})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.post('answer', {'token': 'forged', 'question_id': other.id}).status_code, 403)
+
+    def test_start_requires_adaptive_mode(self):
+        Exam.objects.filter(id=self.exam.id).update(is_adaptive=False)
+        catalog.invalidate()
+        self.assertEqual(self.post('start', {'user_name': 'Иван'}).status_code, 400)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class EventStreamTests(TestCase):
+    def setUp(self):
+        participants.clear_cache()
+        leaderboard.rebuild()
+        self.exam = make_exam()
+
+    def test_stream_needs_asgi(self):
+        self.assertEqual(self.client.get('/api/events/').status_code, 501)
+
+    @mock.patch('exams.events.close_old_connections')
+    def test_poller_reports_new_attempts_and_ranks(self, _):
+        poller = EventPoller()
+        self.assertEqual(poller.poll(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submit(self.client, self.exam, 'Иван', 3)
+        events = dict(poller.poll())
+
+        self.assertEqual((events['attempt']['user_name'], events['attempt']['score']), ('Иван', 100))
+        self.assertEqual((events['rank']['rank'], events['rank']['previous_rank']), (1, None))
+        self.assertEqual(poller.poll(), [])
+
+    def test_publish_respects_exam_filter(self):
+        own, other, everything = Subscription(self.exam.id), Subscription(self.exam.id + 1), Subscription()
+        broadcaster._subscribers = {own, other, everything}
+        self.addCleanup(broadcaster._subscribers.clear)
+
+        broadcaster.publish('attempt', {'exam': self.exam.id})
+
+        self.assertEqual((own.queue.qsize(), other.queue.qsize(), everything.queue.qsize()), (1, 0, 1))
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Данные создаются историческими моделями migrate_from, затем схема доводится до migrate_to."""
+
+    migrate_from = None
+    migrate_to = None
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        self.apps = executor.loader.project_state(self.migrate_from).apps
+
+    def tearDown(self):
+        self.migrate(None)
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        targets = targets or executor.loader.graph.leaf_nodes()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+
+class SearchIndexMigrationTests(MigrationTestCase):
+    """Индексы поиска и дубликатов строятся по историческим моделям, а не по живым."""
+
+    migrate_from = [('exams', '0010_review_item')]
+
+    def test_existing_questions_are_indexed(self):
+        Exam = self.apps.get_model('exams', 'Exam')
+        Question = self.apps.get_model('exams', 'Question')
+        Option = self.apps.get_model('exams', 'Option')
+        exam = Exam.objects.create(title='Охрана труда', subject='Тесты')
+        for order, prompt in enumerate(('Как тушить пожар в электроустановке?', 'Когда проводится инструктаж?'), 1):
+            question = Question.objects.create(exam=exam, prompt=prompt, topic='Тема', order=order)
+            Option.objects.create(question=question, text='Порошковым огнетушителем', is_correct=True, order=1)
+
+        apps = self.migrate(None)
+
+        if search.backend() is not None:
+            self.assertEqual(len(search.search('пожар')), 1)
+        self.assertEqual(apps.get_model('exams', 'QuestionBand').objects.count(), 2 * duplicates.BANDS)
+
+
+class ParticipantBackfillMigrationTests(MigrationTestCase):
+    """0018 сводит написания имени в одного участника во всех таблицах с user_name."""
+
+    migrate_from = [('exams', '0017_similar_pair')]
+    migrate_to = [('exams', '0019_participant_required')]
+
+    def test_spellings_are_merged_into_one_participant(self):
+        Exam = self.apps.get_model('exams', 'Exam')
+        Question = self.apps.get_model('exams', 'Question')
+        Attempt = self.apps.get_model('exams', 'Attempt')
+        ReviewItem = self.apps.get_model('exams', 'ReviewItem')
+        SprintResult = self.apps.get_model('exams', 'SprintResult')
+        exam = Exam.objects.create(title='Экзамен', subject='Тесты')
+        question = Question.objects.create(exam=exam, prompt='Вопрос', order=1)
+        now = timezone.now()
+        for user_name in ('Иван Петров', 'иван  петров', 'ИВАН ПЕТРОВ', 'Мария'):
+            Attempt.objects.create(
+                exam=exam, user_name=user_name, started_at=now, score=50, correct_count=1, total_questions=2
+            )
+        ReviewItem.objects.create(
+            user_name='Иван Петров', question=question, due_at=now, last_reviewed_at=now - timedelta(days=1), lapses=2
+        )
+        ReviewItem.objects.create(user_name='иван петров', question=question, due_at=now, last_reviewed_at=now, lapses=1)
+        SprintResult.objects.create(user_name='ИВАН  ПЕТРОВ', score=3, total=4, started_at=now)
+
+        apps = self.migrate(self.migrate_to)
+        Participant = apps.get_model('exams', 'Participant')
+
+        ivan = Participant.objects.get(key='иван петров')
+        self.assertEqual(Participant.objects.count(), 2)
+        attempts = apps.get_model('exams', 'Attempt').objects
+        self.assertEqual(attempts.filter(participant=ivan).count(), 3)
+        self.assertFalse(attempts.filter(participant__isnull=True).exists())
+        item = apps.get_model('exams', 'ReviewItem').objects.get()
+        self.assertEqual((item.participant_id, item.user_name, item.lapses), (ivan.id, 'иван петров', 3))
+        self.assertEqual(apps.get_model('exams', 'SprintResult').objects.get().participant_id, ivan.id)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class ConcurrentSubmitTests(TransactionTestCase):
+    """Одновременные отправки из нескольких процессов и потоков в файловую SQLite."""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Нужна файловая БД SQLite (DATABASES["default"]["TEST"]["NAME"]).')
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            self.skipTest('Нужен fork: дочерние процессы наследуют настройки тестовой БД.')
+        call_command('seed_exams', stdout=io.StringIO())
+        catalog.invalidate()
+
+    def test_concurrent_submits_are_all_persisted(self):
+        exam = Exam.objects.filter(is_active=True).order_by('id').first()
+        entry = catalog.get_entry(exam.id)
+        answers = {str(question.id): question.options.order_by('id').first().id for question in exam.questions.all()}
+        self.assertEqual(len(answers), len(entry.key))
+
+        # Соединения не должны переходить в дочерние процессы через fork.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(target=_submit_worker, args=(exam.id, answers, worker, results))
+            for worker in range(PROCESSES)
+        ]
+        for worker in workers:
+            worker.start()
+        outcomes = [outcome for _ in workers for outcome in results.get(timeout=120)]
+        for worker in workers:
+            worker.join(timeout=30)
+            self.assertEqual(worker.exitcode, 0)
+
+        expected = PROCESSES * THREADS * SUBMITS_PER_THREAD
+        self.assertEqual(len(outcomes), expected)
+        failures = [outcome for outcome in outcomes if outcome[1] not in (200, 201)]
+        self.assertFalse([outcome for outcome in failures if 'locked' in outcome[2].lower()])
+        self.assertEqual(failures, [])
+
+        saved = set(Attempt.objects.filter(exam=exam, user_name__startswith='load-').values_list('user_name', flat=True))
+        self.assertEqual(saved, {user_name for user_name, _, _ in outcomes})
+        self.assertEqual(len(saved), expected)
 
-# Create your tests here.
@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from . import participants
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis необязателен
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Стоимость запроса задается атрибутом throttle_cost у view: дешевые чтения из кэша
+# списывают 1 токен, агрегаты и запись — больше. Запрос всегда списывается с корзины IP
+# клиента (с учетом TRUSTED_PROXY_COUNT), и, если известен пользователь, еще с его корзины
+# (учетная запись или участник по user_name): новый user_name в каждом запросе не дает
+# нового запаса.
+
+
+class MemoryBucketStore:
+    """Корзины в памяти процесса: у каждого воркера свой лимит."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, keys, cost: float, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            levels = []
+            wait = 0.0
+            for key in keys:
+                tokens, updated = self._buckets.get(key, (burst, now))
+                tokens = min(burst, tokens + (now - updated) * rate)
+                levels.append(tokens)
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+            if wait:
+                return wait
+
+            for key, tokens in zip(keys, levels):
+                self._buckets[key] = (tokens - cost, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now, rate, burst)
+        return 0.0
+
+    def _prune(self, now: float, rate: float, burst: float) -> None:
+        # Полная корзина ничем не отличается от отсутствующей.
+        full = [key for key, (tokens, updated) in self._buckets.items() if tokens + (now - updated) * rate >= burst]
+        for key in full:
+            del self._buckets[key]
+
+
+_REDIS_CONSUME_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+  local state = redis.call('HMGET', key, 't', 'u')
+  local tokens = tonumber(state[1]) or burst
+  local updated = tonumber(state[2]) or now
+  tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+  levels[i] = tokens
+  if tokens < cost then
+    wait = math.max(wait, (cost - tokens) / rate)
+  end
+end
+if wait == 0 then
+  for i, key in ipairs(KEYS) do
+    redis.call('HSET', key, 't', levels[i] - cost, 'u', now)
+    redis.call('PEXPIRE', key, ttl)
+  end
+end
+return tostring(wait)
+"""
+
+
+class RedisBucketStore:
+    """Общие для всех воркеров корзины; проверка и списание атомарны в Lua-скрипте."""
+
+    def __init__(self, url: str):
+        self.client = redis.Redis.from_url(url)
+        self._consume = self.client.register_script(_REDIS_CONSUME_SCRIPT)
+
+    def consume(self, keys, cost: float, rate: float, burst: float) -> float:
+        prefix = settings.RATE_LIMIT_REDIS_PREFIX
+        ttl_ms = int(burst / rate * 1000) + 1000
+        try:
+            return float(self._consume(keys=[f'{prefix}:{key}' for key in keys], args=[rate, burst, cost, ttl_ms]))
+        except redis.RedisError:
+            # Лимитер не должен ронять API: при недоступном Redis запросы пропускаются.
+            logger.warning('Rate limit store unavailable, request allowed.', exc_info=True)
+            return 0.0
+
+
+class RateLimiter:
+    def __init__(self):
+        self._store = None
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = self._make_store()
+        return self._store
+
+    @staticmethod
+    def _make_store():
+        if settings.RATE_LIMIT_BACKEND == 'redis':
+            if redis is not None and settings.RATE_LIMIT_REDIS_URL:
+                return RedisBucketStore(settings.RATE_LIMIT_REDIS_URL)
+            logger.warning('RATE_LIMIT_BACKEND=redis, но redis недоступен: используются лимиты в памяти.')
+        return MemoryBucketStore()
+
+    def consume(self, keys, cost: float) -> float:
+        """Списывает cost токенов со всех корзин сразу; возвращает 0 или сколько секунд ждать."""
+        rate = settings.RATE_LIMIT_RATE
+        burst = settings.RATE_LIMIT_BURST
+        return self.store.consume(keys, min(cost, burst), rate, burst)
+
+
+limiter = RateLimiter()
+
+
+def request_user_name(request) -> str:
+    user_name = request.query_params.get('user_name')
+    if not user_name and request.method == 'POST':
+        data = request.data
+        user_name = data.get('user_name') if hasattr(data, 'get') else None
+    return participants.normalize(str(user_name or ''))
+
+
+class TokenBucketThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        cost = getattr(view, 'throttle_cost', 1)
+        if not settings.RATE_LIMIT_ENABLED or cost <= 0:
+            return True
+
+        self._wait = limiter.consume(self.bucket_keys(request), cost)
+        return self._wait == 0
+
+    def bucket_keys(self, request) -> list[str]:
+        keys = [f'ip:{self.get_ident(request)}']
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            keys.append(f'account:{user.pk}')
+        else:
+            user_name = request_user_name(request)
+            if user_name:
+                keys.append(f'user:{user_name}')
+        return keys
+
+    def wait(self):
+        return self._wait
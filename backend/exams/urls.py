@@ -1,17 +1,55 @@
 ﻿from django.urls import path
 
 from .views import (
+    AdaptiveAnswerAPIView,
+    AdaptiveFinishAPIView,
+    AdaptiveStartAPIView,
+    AttemptExportAPIView,
     AttemptListAPIView,
+    BatchSubmitAPIView,
+    ExamCloneAPIView,
     ExamDetailAPIView,
     ExamListAPIView,
+    ExamReviewAPIView,
+    ExamStatsAPIView,
+    LeaderboardAPIView,
+    LeaderboardRankAPIView,
+    LearningNextAPIView,
+    LearningReviewAPIView,
+    QuestionSearchAPIView,
+    SprintCheckAPIView,
+    SprintQuestionAPIView,
+    SprintResultListCreateAPIView,
+    SprintStartAPIView,
+    SubjectStatsAPIView,
     SubmitAttemptAPIView,
     UserStatsAPIView,
+    event_stream,
 )
 
 urlpatterns = [
     path('exams/', ExamListAPIView.as_view(), name='exam-list'),
     path('exams/<int:pk>/', ExamDetailAPIView.as_view(), name='exam-detail'),
+    path('exams/<int:exam_id>/review/', ExamReviewAPIView.as_view(), name='exam-review'),
+    path('exams/<int:exam_id>/clone/', ExamCloneAPIView.as_view(), name='exam-clone'),
     path('exams/<int:exam_id>/submit/', SubmitAttemptAPIView.as_view(), name='exam-submit'),
+    path('exams/<int:exam_id>/adaptive/start/', AdaptiveStartAPIView.as_view(), name='adaptive-start'),
+    path('exams/<int:exam_id>/adaptive/answer/', AdaptiveAnswerAPIView.as_view(), name='adaptive-answer'),
+    path('exams/<int:exam_id>/adaptive/finish/', AdaptiveFinishAPIView.as_view(), name='adaptive-finish'),
+    path('attempts/batch/', BatchSubmitAPIView.as_view(), name='attempt-batch'),
     path('stats/users/', UserStatsAPIView.as_view(), name='user-stats'),
+    path('stats/exams/<int:exam_id>/', ExamStatsAPIView.as_view(), name='exam-stats'),
+    path('stats/subjects/', SubjectStatsAPIView.as_view(), name='subject-stats'),
     path('stats/attempts/', AttemptListAPIView.as_view(), name='attempt-list'),
+    path('stats/attempts/export/', AttemptExportAPIView.as_view(), name='attempt-export'),
+    path('events/', event_stream, name='event-stream'),
+    path('leaderboard/', LeaderboardAPIView.as_view(), name='leaderboard'),
+    path('leaderboard/rank/', LeaderboardRankAPIView.as_view(), name='leaderboard-rank'),
+    path('learning/next/', LearningNextAPIView.as_view(), name='learning-next'),
+    path('learning/review/', LearningReviewAPIView.as_view(), name='learning-review'),
+    path('search/', QuestionSearchAPIView.as_view(), name='question-search'),
+    path('sprint/question/', SprintQuestionAPIView.as_view(), name='sprint-question'),
+    path('sprint/start/', SprintStartAPIView.as_view(), name='sprint-start'),
+    path('sprint/check/', SprintCheckAPIView.as_view(), name='sprint-check'),
+    path('sprint/results/', SprintResultListCreateAPIView.as_view(), name='sprint-results'),
 ]
@@ -1,14 +1,41 @@
-﻿from django.db.models import Avg, Count, Max
+﻿import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
 from rest_framework import generics, status
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Attempt, AttemptAnswer, Exam, Option
+from .attempts import build_attempt, save_attempts
+from .catalog import build_entry, catalog
+from .db import run_write
+from . import adaptive, batch, cloning, export, participants, rollups, snapshots, sprint
+from .events import broadcaster, stream_events
+from .learning import due_items, record_answers
+from .ranking import leaderboard
+from .reviews import encode, read_review_token, review_token
+from .search import search
+from .sprint import sprint_pool
+from .models import Attempt, Exam, Question, SprintResult
 from .serializers import (
+    AdaptiveAnswerSerializer,
+    AdaptiveFinishSerializer,
+    AdaptiveStartSerializer,
     AttemptSerializer,
+    ExamCloneSerializer,
     ExamDetailSerializer,
     ExamListSerializer,
+    LearningReviewSerializer,
+    SprintCheckSerializer,
+    SprintFinishSerializer,
+    SprintResultSerializer,
+    SprintStartSerializer,
     SubmitAttemptSerializer,
     UserStatSerializer,
 )
@@ -18,130 +45,652 @@ class ExamListAPIView(generics.ListAPIView):
     queryset = Exam.objects.filter(is_active=True).prefetch_related('questions')
     serializer_class = ExamListSerializer
 
+    def list(self, request, *args, **kwargs):
+        return HttpResponse(catalog.exam_list_json(), content_type='application/json')
+
 
 class ExamDetailAPIView(generics.RetrieveAPIView):
     queryset = Exam.objects.filter(is_active=True).prefetch_related('questions__options')
     serializer_class = ExamDetailSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        entry = catalog.get_entry(kwargs['pk'])
+        if entry is None:
+            raise Http404
+        return HttpResponse(entry.detail, content_type='application/json')
+
+
+class ExamReviewAPIView(APIView):
+    def get(self, request, exam_id: int):
+        # Токен выдается в ответе на отправку с ?review=lazy и привязан к снимку экзамена,
+        # поэтому разбор старой версии отдается и после правки вопросов.
+        token = read_review_token(request.query_params.get('token', ''))
+        if token is None or token.get('exam') != exam_id:
+            return Response({'detail': 'Invalid review token.'}, status=status.HTTP_403_FORBIDDEN)
+
+        entry = catalog.get_snapshot_entry(token['snapshot']) if token.get('snapshot') else None
+        if entry is None or entry.exam.id != exam_id or entry.reviews.version != token.get('version'):
+            return Response({'detail': 'Exam version is no longer available.'}, status=status.HTTP_410_GONE)
+        fragments = entry.reviews
+
+        etag = f'"{fragments.version}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(fragments.document, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
+
+
+class ExamCloneAPIView(APIView):
+    throttle_cost = 0
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, exam_id: int):
+        serializer = ExamCloneSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = cloning.clone_exam(exam_id, serializer.validated_data.get('title', '').strip() or None)
+        if result is None:
+            return Response({'detail': 'Exam not found.'}, status=status.HTTP_404_NOT_FOUND)
+        exam, questions_count, options_count = result
+        return Response(
+            {
+                'id': exam.id,
+                'title': exam.title,
+                'is_active': exam.is_active,
+                'questions_count': questions_count,
+                'options_count': options_count,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
 
 class SubmitAttemptAPIView(APIView):
+    throttle_cost = 5
+
     def post(self, request, exam_id: int):
         serializer = SubmitAttemptSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        payload = serializer.validated_data
+        user_name = payload['user_name'].strip() or 'Student'
+        submission_key = payload.get('submission_key') or ''
+        # lazy: вместо разбора только id ответов, документ разбора клиент берет отдельно и кэширует.
+        lazy = request.query_params.get('review') == 'lazy'
 
-        try:
-            exam = Exam.objects.prefetch_related('questions__options').get(id=exam_id, is_active=True)
-        except Exam.DoesNotExist:
+        if submission_key:
+            replay = self.replay(submission_key, exam_id, user_name, lazy)
+            if replay is not None:
+                return replay
+
+        entry = catalog.get_entry(exam_id)
+        if entry is None:
             return Response({'detail': 'Exam not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        payload = serializer.validated_data
         answers = payload.get('answers', {})
-        questions = list(exam.questions.all())
-
-        if not questions:
+        if not entry.key:
             return Response({'detail': 'Exam has no questions.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        option_by_id = {
-            option.id: option for question in questions for option in question.options.all()
-        }
-
-        reviews = []
-        correct_count = 0
-        scoring_points = 0
-        max_scoring_points = sum(question.score_value for question in questions)
-
         started_at = payload.get('started_at') or timezone.now()
         duration_seconds = payload.get('duration_seconds', 0)
+        participant_id = participants.resolve(user_name)
+
+        try:
+            attempt, results = run_write(
+                self.create_attempt,
+                entry,
+                answers,
+                participant_id=participant_id,
+                user_name=user_name,
+                started_at=started_at,
+                duration_seconds=duration_seconds,
+                submission_key=submission_key,
+            )
+        except IntegrityError:
+            # Параллельный повтор с тем же ключом успел записать попытку первым.
+            replay = self.replay(submission_key, exam_id, user_name, lazy) if submission_key else None
+            if replay is None:
+                raise
+            return replay
+
+        body = self.response_body(entry, attempt, results, lazy)
+        if submission_key:
+            cache.set(
+                self.cache_key(submission_key, lazy),
+                {'exam_id': entry.exam.id, 'user_name': user_name, 'body': body},
+                settings.SUBMISSION_CACHE_TTL_SEC,
+            )
+        return HttpResponse(body, content_type='application/json', status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def cache_key(submission_key: str, lazy: bool) -> str:
+        return f'exams:submission:{submission_key}:{"lazy" if lazy else "full"}'
 
-        attempt = Attempt.objects.create(
-            exam=exam,
-            user_name=payload['user_name'].strip() or 'Student',
+    @staticmethod
+    def response_body(entry, attempt, results, lazy: bool) -> bytes:
+        fragments = entry.reviews
+        head = (
+            b'{"attempt":'
+            + encode(AttemptSerializer(attempt).data)
+            + b',"exam_title":'
+            + encode(entry.exam.title)
+            + b',"passing_score":'
+            + encode(entry.exam.passing_score)
+        )
+        if not lazy:
+            return head + b',"reviews":' + fragments.reviews(results) + b'}'
+
+        review_url = reverse('exam-review', args=[entry.exam.id])
+        token = review_token(entry.exam.id, fragments.version, entry.snapshot_id)
+        answers = ','.join(
+            f'{{"question_id":{question_id},"selected_option_id":{option_id or "null"},'
+            f'"is_correct":{"true" if is_correct else "false"}}}'
+            for question_id, option_id, is_correct in results
+        )
+        return (
+            head
+            + b',"review_version":'
+            + encode(fragments.version)
+            + b',"review_url":'
+            + encode(f'{review_url}?token={token}')
+            + b',"answers":['
+            + answers.encode()
+            + b']}'
+        )
+
+    def replay(self, submission_key, exam_id, user_name, lazy):
+        # Сначала кэш, затем уникальный индекс: повтор — это чтение, а не новая запись.
+        cached = cache.get(self.cache_key(submission_key, lazy))
+        if cached is None:
+            attempt = Attempt.objects.select_related('exam').filter(submission_key=submission_key).first()
+            if attempt is None:
+                return None
+            # Разбор строится по той версии экзамена, на которой прошла попытка.
+            entry = catalog.get_snapshot_entry(attempt.snapshot_id) if attempt.snapshot_id else None
+            if entry is None:
+                entry = catalog.get_entry(attempt.exam_id) or build_entry(snapshots.publish(attempt.exam_id))
+            records = {record.question_id: record for record in attempt.answer_records()}
+            results = [
+                (question_id, records[question_id].selected_option_id, records[question_id].is_correct)
+                for question_id, _, _ in entry.key
+                if question_id in records
+            ]
+            cached = {
+                'exam_id': attempt.exam_id,
+                'user_name': attempt.user_name,
+                'body': self.response_body(entry, attempt, results, lazy),
+            }
+            cache.set(self.cache_key(submission_key, lazy), cached, settings.SUBMISSION_CACHE_TTL_SEC)
+
+        if cached['exam_id'] != exam_id or cached['user_name'] != user_name:
+            return Response(
+                {'detail': 'submission_key was already used for another submission.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        response = HttpResponse(cached['body'], content_type='application/json', status=status.HTTP_201_CREATED)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    @staticmethod
+    def create_attempt(entry, answers, *, participant_id, user_name, started_at, duration_seconds, submission_key=None):
+        attempt, attempt_answers, results = build_attempt(
+            entry,
+            answers,
+            participant_id=participant_id,
+            user_name=user_name,
             started_at=started_at,
-            score=0,
-            scoring_points=0,
-            max_scoring_points=max_scoring_points,
-            correct_count=0,
-            total_questions=len(questions),
             duration_seconds=duration_seconds,
+            submission_key=submission_key or None,
         )
+        save_attempts([(attempt, attempt_answers)], {entry.exam.id: entry.exam.passing_score})
+        return attempt, results
 
-        attempt_answers = []
-        for question in questions:
-            correct_option = next((opt for opt in question.options.all() if opt.is_correct), None)
-            selected_option_id = answers.get(str(question.id)) or answers.get(question.id)
-            selected_option = option_by_id.get(selected_option_id)
-
-            is_correct = bool(correct_option and selected_option and selected_option.id == correct_option.id)
-            if is_correct:
-                correct_count += 1
-                scoring_points += question.score_value
-
-            attempt_answers.append(
-                AttemptAnswer(
-                    attempt=attempt,
-                    question=question,
-                    selected_option=selected_option,
-                    is_correct=is_correct,
-                )
-            )
 
-            reviews.append(
-                {
-                    'question_id': question.id,
-                    'prompt': question.prompt,
-                    'topic': question.topic,
-                    'explanation': question.explanation,
-                    'score_value': question.score_value,
-                    'selected_option_id': selected_option.id if selected_option else None,
-                    'selected_text': selected_option.text if selected_option else 'Не выбран',
-                    'correct_option_id': correct_option.id if correct_option else None,
-                    'correct_text': correct_option.text if correct_option else 'Не задан',
-                    'is_correct': is_correct,
-                }
+class AdaptiveStartAPIView(APIView):
+    throttle_cost = 2
+
+    def post(self, request, exam_id: int):
+        serializer = AdaptiveStartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        entry = catalog.get_entry(exam_id)
+        if entry is None:
+            return Response({'detail': 'Exam not found.'}, status=status.HTTP_404_NOT_FOUND)
+        bank = adaptive.item_banks.get(entry)
+        if bank is None:
+            return Response({'detail': 'Exam is not in adaptive mode.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not bank.question_ids:
+            return Response({'detail': 'Exam has no questions.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_name = serializer.validated_data['user_name'].strip() or 'Student'
+        session = adaptive.start_session(bank, exam_id, user_name)
+        return Response(adaptive.advance(bank, session), status=status.HTTP_201_CREATED)
+
+
+def adaptive_session_error(session, exam_id: int) -> Response | None:
+    if session is None or session.get('exam') != exam_id:
+        return Response({'detail': 'Invalid or expired session token.'}, status=status.HTTP_403_FORBIDDEN)
+    return None
+
+
+def adaptive_bank(session, exam_id: int):
+    """(entry, bank) версии экзамена, на которой идет сессия, или Response с ошибкой."""
+    entry = catalog.get_entry(exam_id)
+    bank = adaptive.item_banks.get(entry) if entry is not None else None
+    if bank is None:
+        return Response({'detail': 'Exam not found.'}, status=status.HTTP_404_NOT_FOUND)
+    if bank.snapshot_id != session['snapshot']:
+        # Выданные вопросы могли измениться: сессия начинается заново на новой версии.
+        return Response({'detail': 'Exam was updated, start a new session.'}, status=status.HTTP_409_CONFLICT)
+    return entry, bank
+
+
+class AdaptiveAnswerAPIView(APIView):
+    throttle_cost = 2
+
+    def post(self, request, exam_id: int):
+        serializer = AdaptiveAnswerSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        payload = serializer.validated_data
+        session = adaptive.read_session_token(payload['token'])
+        error = adaptive_session_error(session, exam_id)
+        if error is not None:
+            return error
+        result = adaptive_bank(session, exam_id)
+        if isinstance(result, Response):
+            return result
+        entry, bank = result
+
+        if session['next'] is None or payload['question_id'] != session['next']:
+            return Response(
+                {'detail': 'Answer the current question of the session.'}, status=status.HTTP_409_CONFLICT
             )
+        option_id = payload.get('option_id')
+        session['responses'].append([payload['question_id'], option_id if entry.has_option(option_id) else None])
+        return Response(adaptive.advance(bank, session))
 
-        AttemptAnswer.objects.bulk_create(attempt_answers)
 
-        score = round((correct_count / len(questions)) * 100)
-        attempt.score = score
-        attempt.scoring_points = scoring_points
-        attempt.max_scoring_points = max_scoring_points
-        attempt.correct_count = correct_count
-        attempt.save(update_fields=['score', 'scoring_points', 'max_scoring_points', 'correct_count'])
+class AdaptiveFinishAPIView(SubmitAttemptAPIView):
+    # Ответ как у обычной отправки (в том числе ?review=lazy); ключ сессии — submission_key попытки.
+    throttle_cost = 5
 
-        return Response(
-            {
-                'attempt': AttemptSerializer(attempt).data,
-                'exam_title': exam.title,
-                'passing_score': exam.passing_score,
-                'reviews': reviews,
-            },
-            status=status.HTTP_201_CREATED,
+    def post(self, request, exam_id: int):
+        serializer = AdaptiveFinishSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = adaptive.read_session_token(serializer.validated_data['token'])
+        error = adaptive_session_error(session, exam_id)
+        if error is not None:
+            return error
+        lazy = request.query_params.get('review') == 'lazy'
+        # Повторное завершение той же сессии отдает уже сохраненную попытку.
+        replay = self.replay(session['key'], exam_id, session['user_name'], lazy)
+        if replay is not None:
+            return replay
+
+        result = adaptive_bank(session, exam_id)
+        if isinstance(result, Response):
+            return result
+        entry, bank = result
+        if not session['responses']:
+            return Response({'detail': 'Answer at least one question.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        participant_id = participants.resolve(session['user_name'])
+        try:
+            attempt, results = run_write(adaptive.create_attempt, entry, bank, session, participant_id)
+        except IntegrityError:
+            replay = self.replay(session['key'], exam_id, session['user_name'], lazy)
+            if replay is None:
+                raise
+            return replay
+
+        body = self.response_body(entry, attempt, results, lazy)
+        cache.set(
+            self.cache_key(session['key'], lazy),
+            {'exam_id': entry.exam.id, 'user_name': session['user_name'], 'body': body},
+            settings.SUBMISSION_CACHE_TTL_SEC,
         )
+        return HttpResponse(body, content_type='application/json', status=status.HTTP_201_CREATED)
+
+
+class BatchSubmitAPIView(APIView):
+    # Загрузка с киосков идет от staff-учетной записи и не расходует клиентские лимиты.
+    throttle_cost = 0
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        # Тело читается из потока запроса мимо парсеров DRF: лимит DATA_UPLOAD_MAX_MEMORY_SIZE
+        # рассчитан на обычные запросы, а размер пачки ограничивает BATCH_SUBMIT_MAX_ITEMS.
+        content_type = request.content_type.split(';')[0].strip().lower()
+        try:
+            if content_type in batch.NDJSON_CONTENT_TYPES:
+                items = list(batch.read_ndjson(request._request))
+            else:
+                items = batch.read_json(json.load(request._request))
+        except ValueError as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BATCH_SUBMIT_MAX_ITEMS:
+            return Response(
+                {'detail': f'At most {settings.BATCH_SUBMIT_MAX_ITEMS} attempts per request.'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        importer = batch.BatchImport()
+        results = list(importer.run(items))
+        return Response({**importer.counts, 'results': results})
 
 
 class UserStatsAPIView(APIView):
+    throttle_cost = 10
+
     def get(self, request):
-        stats = (
-            Attempt.objects.values('user_name')
-            .annotate(
-                attempts_count=Count('id'),
-                best_score=Max('score'),
-                avg_score=Avg('score'),
-                avg_duration_seconds=Avg('duration_seconds'),
-            )
-            .order_by('-best_score', '-avg_score')
-        )
+        # Рейтинг уже отсортирован в ranking.leaderboard (с учетом архива), без агрегата по всем попыткам.
+        return Response(UserStatSerializer(leaderboard.entries(), many=True).data)
+
+
+class ExamStatsAPIView(APIView):
+    throttle_cost = 2
+
+    def get(self, request, exam_id: int):
+        exam = Exam.objects.filter(id=exam_id).first()
+        if exam is None:
+            return Response({'detail': 'Exam not found.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 0), 3650)
+        except ValueError:
+            return Response({'detail': 'days must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(rollups.exam_stats(exam, days))
+
+
+class SubjectStatsAPIView(APIView):
+    throttle_cost = 2
+
+    def get(self, request):
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 0), 3650)
+        except ValueError:
+            return Response({'detail': 'days must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(rollups.subject_stats(days))
+
+
+class LeaderboardAPIView(APIView):
+    throttle_cost = 2
+
+    def get(self, request):
+        try:
+            exam_id = int(request.query_params.get('exam') or 0) or None
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response({'detail': 'exam and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(leaderboard.top(exam_id, limit))
 
-        return Response(UserStatSerializer(stats, many=True).data)
+
+class LeaderboardRankAPIView(APIView):
+    throttle_cost = 2
+
+    def get(self, request):
+        user_name = (request.query_params.get('user_name') or '').strip()
+        if not user_name:
+            return Response({'detail': 'user_name is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            exam_id = int(request.query_params.get('exam') or 0) or None
+            window = min(max(int(request.query_params.get('window', 5)), 0), 50)
+        except ValueError:
+            return Response({'detail': 'exam and window must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        participant_id = participants.lookup(user_name)
+        result = leaderboard.around(participant_id, exam_id, window) if participant_id else None
+        if result is None:
+            return Response({'detail': 'User has no attempts.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(result)
 
 
 class AttemptListAPIView(generics.ListAPIView):
+    throttle_cost = 5
     serializer_class = AttemptSerializer
 
     def get_queryset(self):
         qs = Attempt.objects.select_related('exam').order_by('-finished_at')
-        user_name = self.request.query_params.get('user_name')
+        user_name = (self.request.query_params.get('user_name') or '').strip()
         if user_name:
-            qs = qs.filter(user_name=user_name)
+            # Любое написание имени того же участника: фильтр по целому ключу.
+            qs = qs.filter(participant_id=participants.lookup(user_name) or 0)
         return qs[:100]
+
+
+class AttemptExportAPIView(APIView):
+    # Выгрузка только для staff и не расходует клиентские лимиты.
+    throttle_cost = 0
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        kind = request.query_params.get('kind', 'attempts')
+        file_format = request.query_params.get('export_format', 'csv')
+        if kind not in export.KINDS or file_format not in export.FORMATS:
+            return Response(
+                {'detail': 'kind must be attempts|answers and export_format must be csv|xlsx.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            exam_id = int(request.query_params.get('exam') or 0) or None
+            date_from = export.parse_day(request.query_params.get('date_from'))
+            date_to = export.parse_day(request.query_params.get('date_to'))
+        except ValueError:
+            return Response(
+                {'detail': 'exam must be an integer, date_from and date_to must be YYYY-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        header, rows = export.export_rows(kind, exam_id, date_from, date_to)
+        content = export.render(file_format, header, rows)
+        if isinstance(request._request, ASGIRequest):
+            content = export.iterate_in_thread(content)
+        response = StreamingHttpResponse(content, content_type=export.CONTENT_TYPES[file_format])
+        name = export.filename(kind, file_format, exam_id, date_from, date_to)
+        response['Content-Disposition'] = f'attachment; filename="{name}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class SprintQuestionAPIView(APIView):
+    def get(self, request):
+        params = request.query_params
+        exclude = params.get('exclude')
+        question = sprint_pool.get().sample(
+            subject=params.get('subject'),
+            difficulty=params.get('difficulty'),
+            topic=params.get('topic'),
+            exclude=int(exclude) if exclude and exclude.isdigit() else None,
+        )
+        if question is None:
+            return Response({'detail': 'No questions match the filters.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(question)
+
+
+class SprintStartAPIView(APIView):
+    throttle_cost = 2
+
+    def post(self, request):
+        serializer = SprintStartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        payload = serializer.validated_data
+        user_name = payload['user_name'].strip() or 'Student'
+        filters = (payload.get('subject') or None, payload.get('difficulty') or None, payload.get('topic') or None)
+        pool = sprint_pool.get()
+        # Участник создается до транзакции записи результата (см. participants.resolve).
+        started = sprint.start(pool, participants.resolve(user_name), user_name, filters)
+        if started is None:
+            return Response({'detail': 'No questions match the filters.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(started, status=status.HTTP_201_CREATED)
+
+
+class SprintCheckAPIView(APIView):
+    def post(self, request):
+        serializer = SprintCheckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        payload = serializer.validated_data
+
+        session = None
+        if 'token' in payload:
+            session = sprint.read_session_token(payload['token'])
+            if session is None:
+                return Response({'detail': 'Invalid or expired session token.'}, status=status.HTTP_403_FORBIDDEN)
+            if payload['question_id'] != session['question']:
+                return Response(
+                    {'detail': 'Answer the current question of the session.'}, status=status.HTTP_409_CONFLICT
+                )
+            if sprint.is_over(session, timezone.now()):
+                return Response({'detail': 'Sprint time is over.'}, status=status.HTTP_409_CONFLICT)
+
+        pool = sprint_pool.get()
+        answer = pool.answer_by_id.get(payload['question_id'])
+        if answer is None:
+            return Response({'detail': 'Question not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        correct_option_id, explanation = answer
+        is_correct = correct_option_id is not None and payload['option_id'] == correct_option_id
+        data = {'is_correct': is_correct, 'correct_option_id': correct_option_id, 'explanation': explanation}
+        if session is not None:
+            # Без токена проверка — тренировка без счета; с токеном ответ засчитывается ровно один раз.
+            if not run_write(sprint.record_answer, session, is_correct):
+                return Response({'detail': 'This answer is already recorded.'}, status=status.HTTP_409_CONFLICT)
+            data.update(sprint.advance(pool, session))
+        return Response(data)
+
+
+class SprintResultListCreateAPIView(generics.ListCreateAPIView):
+    throttle_cost = 3
+    serializer_class = SprintResultSerializer
+
+    def get_queryset(self):
+        qs = SprintResult.objects.filter(is_finished=True).order_by('-score', '-total', 'finished_at')
+        subject = self.request.query_params.get('subject')
+        if subject:
+            qs = qs.filter(subject=subject)
+        return qs[:20]
+
+    def create(self, request, *args, **kwargs):
+        # Счет берется из результата, который вел сервер; клиент присылает только токен сессии.
+        serializer = SprintFinishSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = sprint.read_session_token(serializer.validated_data['token'])
+        result = run_write(sprint.finish, session) if session is not None else None
+        if result is None:
+            return Response({'detail': 'Invalid or expired session token.'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(SprintResultSerializer(result).data, status=status.HTTP_201_CREATED)
+
+
+class QuestionSearchAPIView(APIView):
+    throttle_cost = 3
+
+    def get(self, request):
+        query = (request.query_params.get('q') or '').strip()
+        if not query:
+            return Response({'detail': 'q is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+            exam_id = int(request.query_params.get('exam') or 0) or None
+        except ValueError:
+            return Response({'detail': 'limit and exam must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranked = search(query, limit, exam_id)
+        questions = Question.objects.filter(id__in=[question_id for question_id, _ in ranked]).values(
+            'id', 'exam_id', 'exam__title', 'prompt', 'topic'
+        )
+        by_id = {question['id']: question for question in questions}
+        results = []
+        for question_id, rank in ranked:
+            question = by_id.get(question_id)
+            if question is None:
+                continue
+            results.append(
+                {
+                    'question_id': question_id,
+                    'exam_id': question['exam_id'],
+                    'exam_title': question['exam__title'],
+                    'prompt': question['prompt'],
+                    'topic': question['topic'],
+                    'rank': round(float(rank), 4),
+                }
+            )
+        return Response(results)
+
+
+class LearningNextAPIView(APIView):
+    throttle_cost = 2
+
+    def get(self, request):
+        user_name = (request.query_params.get('user_name') or '').strip()
+        if not user_name:
+            return Response({'detail': 'user_name is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+            exam_id = int(request.query_params.get('exam') or 0) or None
+        except ValueError:
+            return Response({'detail': 'limit and exam must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        participant_id = participants.lookup(user_name)
+        if participant_id is None:
+            return Response([])
+
+        pool = sprint_pool.get()
+        items = []
+        for item in due_items(participant_id, timezone.now(), limit, exam_id):
+            question = pool.payload_by_id.get(item.question_id)
+            if question is None:
+                continue
+            items.append(
+                {
+                    'question': question,
+                    'due_at': item.due_at,
+                    'repetitions': item.repetitions,
+                    'lapses': item.lapses,
+                }
+            )
+        return Response(items)
+
+
+class LearningReviewAPIView(APIView):
+    throttle_cost = 2
+
+    def post(self, request):
+        serializer = LearningReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        payload = serializer.validated_data
+
+        answer = sprint_pool.get().answer_by_id.get(payload['question_id'])
+        if answer is None:
+            return Response({'detail': 'Question not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        correct_option_id, explanation = answer
+        is_correct = correct_option_id is not None and payload.get('option_id') == correct_option_id
+        user_name = payload['user_name'].strip() or 'Student'
+        run_write(
+            record_answers,
+            participants.resolve(user_name),
+            user_name,
+            [(payload['question_id'], is_correct)],
+            timezone.now(),
+        )
+        return Response(
+            {
+                'is_correct': is_correct,
+                'correct_option_id': correct_option_id,
+                'explanation': explanation,
+            }
+        )
+
+
+async def event_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'detail': 'Event stream requires the ASGI server (GUNICORN_PROFILE=async).'},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+
+    exam = request.GET.get('exam')
+    subscription = broadcaster.subscribe(int(exam) if exam and exam.isdigit() else None)
+    response = StreamingHttpResponse(stream_events(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,15 @@
+import time
+
+from .catalog import catalog
+from .ranking import leaderboard
+from .sprint import sprint_pool
+
+
+def warm_caches() -> str:
+    """Заполняет кэши процесса до приема трафика; возвращает краткий отчет для лога."""
+    started = time.perf_counter()
+    exams_count = catalog.warm()
+    questions_count = len(sprint_pool.get().payload_by_id)
+    ranked_users = len(leaderboard.entries())
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return f'exams={exams_count} sprint_questions={questions_count} ranked_users={ranked_users} in {elapsed_ms:.0f} ms'
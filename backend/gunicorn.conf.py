@@ -0,0 +1,64 @@
+import multiprocessing
+import os
+
+# Профили запуска: sync (по умолчанию), gthread (потоки внутри воркера), async (uvicorn, ASGI).
+profile = os.getenv('GUNICORN_PROFILE', 'sync').lower()
+cpu_count = multiprocessing.cpu_count()
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name, '').strip().lower()
+    if not value or value == 'auto':
+        return default
+    return int(value)
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+timeout = env_int('GUNICORN_TIMEOUT', 60)
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = env_int('GUNICORN_KEEPALIVE', 5)
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 2000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+
+if profile == 'gthread':
+    worker_class = 'gthread'
+    workers = env_int('GUNICORN_WORKERS', cpu_count + 1)
+    threads = env_int('GUNICORN_THREADS', 4)
+    wsgi_app = 'backend.wsgi:application'
+elif profile == 'async':
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    workers = env_int('GUNICORN_WORKERS', cpu_count)
+    wsgi_app = 'backend.asgi:application'
+else:
+    worker_class = 'sync'
+    workers = env_int('GUNICORN_WORKERS', min(cpu_count * 2 + 1, 12))
+    wsgi_app = 'backend.wsgi:application'
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG') or None
+errorlog = '-'
+
+
+def warm_up(log):
+    from django.db import connections
+
+    from exams.warmup import warm_caches
+
+    try:
+        log.info('Warm-up: %s', warm_caches())
+    except Exception:
+        log.exception('Warm-up failed, caches will be filled lazily.')
+    finally:
+        # Соединения мастера не должны наследоваться воркерами после fork.
+        connections.close_all()
+
+
+def when_ready(server):
+    # С preload кэши прогреваются один раз в мастере и делятся с воркерами через copy-on-write.
+    if preload_app:
+        warm_up(server.log)
+
+
+def post_worker_init(worker):
+    if not preload_app:
+        warm_up(worker.log)
@@ -30,6 +30,7 @@ interface SubmitPayload {
   started_at?: string
   duration_seconds: number
   answers: Record<string, number>
+  submission_key?: string
 }
 
 export interface SubmitResponse {
@@ -161,5 +162,56 @@ export const fetchUserStats = async (): Promise<
   Array<{ user_name: string; attempts_count: number; best_score: number; avg_score: number }>
 > => get('/stats/users/')
 
-export const fetchSprintResults = async (): Promise<SprintResult[]> => []
+interface ApiSprintResult {
+  id: number
+  user_name: string
+  score: number
+  total: number
+  started_at: string
+  finished_at: string
+}
+
+const mapSprintResult = (item: ApiSprintResult): SprintResult => ({
+  id: String(item.id),
+  userName: item.user_name,
+  score: item.score,
+  total: item.total,
+  startedAt: item.started_at,
+  finishedAt: item.finished_at,
+})
+
+export const fetchSprintResults = async (): Promise<SprintResult[]> =>
+  (await get<ApiSprintResult[]>('/sprint/results/')).map(mapSprintResult)
+
+export interface SprintQuestion {
+  id: number
+  exam_id: number
+  subject: string
+  topic: string
+  difficulty: string
+  prompt: string
+  options: Array<{ id: number; text: string }>
+}
+
+export interface SprintStep {
+  token: string
+  question: SprintQuestion | null
+}
+
+export interface SprintCheck extends SprintStep {
+  is_correct: boolean
+  correct_option_id: number | null
+  explanation: string
+}
+
+// Счет спринта ведет сервер: каждый ответ проверяется с токеном сессии, результат создается из нее.
+export const startSprint = async (
+  userName: string,
+  filters: { subject?: string; difficulty?: string; topic?: string } = {},
+): Promise<SprintStep & { duration_seconds: number }> => post('/sprint/start/', { user_name: userName, ...filters })
+
+export const checkSprintAnswer = async (token: string, questionId: number, optionId: number): Promise<SprintCheck> =>
+  post('/sprint/check/', { token, question_id: questionId, option_id: optionId })
 
+export const finishSprint = async (token: string): Promise<SprintResult> =>
+  mapSprintResult(await post<ApiSprintResult>('/sprint/results/', { token }))